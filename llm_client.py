@@ -1,54 +1,445 @@
 """
 Local LLM Integration for Metaproject
 Provides easy access to Ollama and LM Studio APIs
+
+Each client keeps a pooled keep-alive HTTP session, so repeated queries reuse
+connections instead of paying a TCP handshake each time. Use get_client() to
+share one client per service and base URL across a script.
+
+AsyncLocalLLMClient offers the same calls for asyncio code (requires httpx),
+plus query_many() for running batches of prompts concurrently.
+
+Whether each server is up is remembered for a few seconds (see health), from
+probes and from real requests, so a query to a server known to be down
+returns None at once instead of waiting for a connection timeout.
+
+query(..., hedge=other_client) hedges a latency-critical call: if this
+server hasn't answered within its p90 latency (HEDGE_DELAY until enough
+latencies are known), the same prompt goes to the other server too and the
+first answer wins. If this server is down or fails first, the other server
+is asked at once (see hedge_stats).
 """
 
+import asyncio
+import os
+import threading
+import time
 import requests
 import json
-from typing import Optional, Dict, Any
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from requests.adapters import HTTPAdapter
+from typing import (Optional, Dict, Any, AsyncIterator, Callable, Iterable, Iterator,
+                    Tuple)
+
+DEFAULT_URLS = {
+    "ollama": "http://localhost:11434",
+    "lmstudio": "http://localhost:1234",
+}
+
+# Connection pool size per client, and (connect, read) timeouts in seconds
+POOL_SIZE = int(os.environ.get("LLM_POOL_SIZE", "10"))
+CONNECT_TIMEOUT = float(os.environ.get("LLM_CONNECT_TIMEOUT_SECONDS", "5"))
+READ_TIMEOUT = float(os.environ.get("LLM_TIMEOUT_SECONDS", "120"))
+# Idle keep-alive connections are dropped after this many seconds (httpx)
+KEEPALIVE_EXPIRY = float(os.environ.get("LLM_KEEPALIVE_SECONDS", "30"))
+# How long discovered model lists and model metadata are trusted
+MODEL_CACHE_TTL = float(os.environ.get("LLM_MODEL_CACHE_SECONDS", "300"))
+# How long a server's up/down state is trusted, and the probe timeout
+HEALTH_TTL = float(os.environ.get("LLM_HEALTH_TTL_SECONDS", "15"))
+PROBE_TIMEOUT = float(os.environ.get("LLM_PROBE_TIMEOUT_SECONDS", "2"))
+# Hedged queries wait for this percentile of the primary's recent latencies,
+# once at least HEDGE_MIN_SAMPLES of them are known, and HEDGE_DELAY before
+HEDGE_PERCENTILE = 0.9
+HEDGE_MIN_SAMPLES = 5
+HEDGE_DELAY = float(os.environ.get("LLM_HEDGE_DELAY_SECONDS", "5"))
+LATENCY_WINDOW = 50
+
+
+def make_session(pool_size: int = POOL_SIZE) -> requests.Session:
+    """A requests session with a keep-alive connection pool of pool_size"""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def make_httpx_client(pool_size: int = POOL_SIZE,
+                      keepalive_expiry: float = KEEPALIVE_EXPIRY,
+                      connect_timeout: float = CONNECT_TIMEOUT,
+                      read_timeout: float = READ_TIMEOUT,
+                      asynchronous: bool = False):
+    """The httpx equivalent of make_session (httpx.Client or httpx.AsyncClient)"""
+    import httpx
+
+    cls = httpx.AsyncClient if asynchronous else httpx.Client
+    return cls(
+        timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+        limits=httpx.Limits(
+            max_connections=pool_size,
+            max_keepalive_connections=pool_size,
+            keepalive_expiry=keepalive_expiry,
+        ),
+    )
+
+
+class ModelCatalog:
+    """Discovered models and their metadata for one server, with a TTL
+
+    Shared by every client (sync or async) for the same service and base URL,
+    so a process does one discovery per server rather than one per query.
+    Only successful lookups are stored; failures are retried next time, and
+    a 404 for a model drops everything (the server's models have changed).
+    """
+
+    def __init__(self, ttl: float = MODEL_CACHE_TTL,
+                 clock: Callable[[], float] = time.monotonic):
+        self.ttl = ttl
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._models: Optional[Tuple[float, list]] = None
+        self._info: Dict[str, Tuple[float, Dict[str, Any]]] = {}
+
+    def _fresh(self, entry):
+        if entry is None or self.clock() - entry[0] > self.ttl:
+            return None
+        return entry[1]
+
+    def get_models(self) -> Optional[list]:
+        with self._lock:
+            return self._fresh(self._models)
+
+    def set_models(self, models: list):
+        with self._lock:
+            self._models = (self.clock(), list(models))
+
+    def get_info(self, model: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            return self._fresh(self._info.get(model))
+
+    def set_info(self, model: str, info: Dict[str, Any]):
+        with self._lock:
+            self._info[model] = (self.clock(), info)
+
+    def invalidate(self):
+        """Forget everything, e.g. after pulling or loading a model"""
+        with self._lock:
+            self._models = None
+            self._info.clear()
+
+
+_catalogs: Dict[Tuple[str, str], ModelCatalog] = {}
+_catalogs_lock = threading.Lock()
+
 
+def get_catalog(service: str, base_url: str) -> ModelCatalog:
+    """The shared ModelCatalog for a service and base URL"""
+    key = (service, base_url.rstrip('/'))
+    with _catalogs_lock:
+        catalog = _catalogs.get(key)
+        if catalog is None:
+            catalog = _catalogs[key] = ModelCatalog()
+        return catalog
+
+
+class HealthRegistry:
+    """Last known up/down state of each server, trusted for `ttl` seconds
+
+    Filled in by availability probes and by the outcome of real requests.
+    After the TTL a server is unknown again and the next call tries it.
+    """
+
+    def __init__(self, ttl: float = HEALTH_TTL):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._status: Dict[str, Tuple[float, bool, Optional[str]]] = {}
+        self._latencies: Dict[str, deque] = {}
+
+    def get(self, base_url: str) -> Optional[bool]:
+        """True (up), False (down) or None (unknown or expired)"""
+        with self._lock:
+            entry = self._status.get(base_url)
+        if entry is None or time.monotonic() - entry[0] > self.ttl:
+            return None
+        return entry[1]
+
+    def record(self, base_url: str, up: bool, error: Optional[str] = None):
+        with self._lock:
+            self._status[base_url] = (time.monotonic(), up, error)
+
+    def is_down(self, base_url: str) -> bool:
+        return self.get(base_url) is False
+
+    def record_latency(self, base_url: str, seconds: float):
+        with self._lock:
+            window = self._latencies.setdefault(base_url, deque(maxlen=LATENCY_WINDOW))
+            window.append(seconds)
+
+    def percentile(self, base_url: str, q: float,
+                   min_samples: int = 1) -> Optional[float]:
+        """Latency percentile of recent successful queries, if enough are known"""
+        with self._lock:
+            ordered = sorted(self._latencies.get(base_url, ()))
+        if len(ordered) < max(1, min_samples):
+            return None
+        return ordered[min(len(ordered) - 1, max(0, int(q * len(ordered) + 0.5) - 1))]
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """{base_url: {"up", "error", "age"}} for every server seen"""
+        now = time.monotonic()
+        with self._lock:
+            return {url: {"up": up, "error": error, "age": now - checked}
+                    for url, (checked, up, error) in self._status.items()}
+
+
+# Shared by every client in the process
+health = HealthRegistry()
+
+
+class HedgeStats:
+    """Counters and recent records of hedged queries"""
+
+    def __init__(self, keep: int = 100):
+        self._lock = threading.Lock()
+        self.counts = {"calls": 0, "hedged": 0, "hedge_won": 0, "no_history": 0,
+                       "failover": 0}
+        self.recent = deque(maxlen=keep)
+
+    def record(self, primary: str, hedge: str, delay: float, no_history: bool,
+               hedged: bool, failover: bool, winner: Optional[str],
+               latency: float):
+        with self._lock:
+            self.counts["calls"] += 1
+            if no_history:
+                self.counts["no_history"] += 1
+            if failover:
+                self.counts["failover"] += 1
+            if hedged:
+                self.counts["hedged"] += 1
+                if winner == hedge:
+                    self.counts["hedge_won"] += 1
+            self.recent.append({
+                "primary": primary,
+                "hedge": hedge if hedged else None,
+                "delay_ms": round(delay * 1000, 1),
+                "failover": failover,
+                "winner": winner,
+                "latency_ms": round(latency * 1000, 1),
+            })
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {**self.counts, "recent": list(self.recent)}
+
+
+hedge_stats = HedgeStats()
+
+
+class _ServiceProtocol:
+    """Endpoints and payload formats shared by the sync and async clients"""
+
+    def __init__(self, service: str, base_url: Optional[str]):
+        self.service = service.lower()
 
-class LocalLLMClient:
+        if self.service not in DEFAULT_URLS:
+            raise ValueError("Service must be 'ollama' or 'lmstudio'")
+        self.base_url = (base_url or DEFAULT_URLS[self.service]).rstrip('/')
+        self.catalog = get_catalog(self.service, self.base_url)
+
+    def invalidate_models(self):
+        """Drop cached model lists and metadata for this server (all clients)"""
+        self.catalog.invalidate()
+
+    def _check_model_found(self, status_code: int):
+        """Drop the cached models after a 404: the model was removed, or the
+        cached list named one the server never had"""
+        if status_code == 404:
+            self.invalidate_models()
+
+    def _known_down(self) -> bool:
+        """True (after printing why) if a recent check found the server down"""
+        if not health.is_down(self.base_url):
+            return False
+        print(f"Skipping {self.service}: {self.base_url} is down")
+        return True
+
+    def _record(self, up: bool, error: Optional[Exception] = None):
+        health.record(self.base_url, up, str(error) if error else None)
+
+    def _hedge_delay(self) -> Tuple[float, bool]:
+        """(seconds to wait before hedging, whether that is HEDGE_DELAY for
+        lack of latency history)"""
+        delay = health.percentile(self.base_url, HEDGE_PERCENTILE, HEDGE_MIN_SAMPLES)
+        if delay is None:
+            return HEDGE_DELAY, True
+        return delay, False
+
+    def _models_url(self) -> str:
+        if self.service == "ollama":
+            return f"{self.base_url}/api/tags"
+        return f"{self.base_url}/v1/models"
+
+    def _parse_models(self, data: Dict[str, Any]) -> list:
+        if self.service == "ollama":
+            return [model['name'] for model in data.get('models', [])]
+        return [model['id'] for model in data.get('data', [])]
+
+    def _info_request(self, model: str) -> Tuple[str, str, Optional[Dict[str, Any]]]:
+        """(method, url, json body) of the model metadata request"""
+        if self.service == "ollama":
+            return "POST", f"{self.base_url}/api/show", {"model": model}
+        # LM Studio's REST API reports the context length; /v1/models does not
+        return "GET", f"{self.base_url}/api/v0/models/{model}", None
+
+    def _parse_info(self, model: str, data: Dict[str, Any]) -> Dict[str, Any]:
+        """Normalised metadata: name, context_length (or None) and details"""
+        context_length = None
+        if self.service == "ollama":
+            for key, value in data.get('model_info', {}).items():
+                if key.endswith(".context_length"):
+                    context_length = int(value)
+            details = data.get('details', {})
+        else:
+            context_length = data.get('max_context_length')
+            details = {k: v for k, v in data.items() if k != 'id'}
+        return {"name": model, "context_length": context_length, "details": details}
+
+    def _request(self, prompt: str, model: str, temperature: float,
+                 max_tokens: int, stream: bool) -> Tuple[str, Dict[str, Any]]:
+        """URL and JSON payload for a generation request"""
+        if self.service == "ollama":
+            return f"{self.base_url}/api/generate", {
+                "model": model,
+                "prompt": prompt,
+                "stream": stream,
+                "options": {
+                    "temperature": temperature,
+                    "num_predict": max_tokens
+                }
+            }
+        return f"{self.base_url}/v1/chat/completions", {
+            "model": model,
+            "messages": [{"role": "user", "content": prompt}],
+            "temperature": temperature,
+            "max_tokens": max_tokens,
+            "stream": stream
+        }
+
+    def _parse_reply(self, data: Dict[str, Any]) -> str:
+        if self.service == "ollama":
+            return data.get('response', '')
+        return data.get('choices', [{}])[0].get('message', {}).get('content', '')
+
+    def _parse_stream_line(self, line: str) -> Tuple[Optional[str], bool]:
+        """(text, finished) for one line of a streamed reply
+
+        Ollama sends one JSON object per line; LM Studio sends Server-Sent
+        Events ("data: {...}" lines ending with "data: [DONE]").
+        """
+        if not line:
+            return None, False
+        if self.service == "ollama":
+            data = json.loads(line)
+            return data.get('response') or None, bool(data.get('done'))
+        if not line.startswith("data:"):
+            return None, False
+        data = line[len("data:"):].strip()
+        if data == "[DONE]":
+            return None, True
+        delta = json.loads(data).get('choices', [{}])[0].get('delta', {})
+        return delta.get('content') or None, False
+
+
+class LocalLLMClient(_ServiceProtocol):
     """Client for interacting with local LLM services (Ollama and LM Studio)"""
 
-    def __init__(self, service: str = "ollama", base_url: Optional[str] = None):
+    def __init__(self, service: str = "ollama", base_url: Optional[str] = None,
+                 session: Optional[requests.Session] = None,
+                 pool_size: int = POOL_SIZE,
+                 timeout: Tuple[float, float] = (CONNECT_TIMEOUT, READ_TIMEOUT)):
         """
         Initialize the client
 
         Args:
             service: 'ollama' or 'lmstudio'
             base_url: Custom base URL (optional)
+            session: requests.Session to use (optional; a pooled one is created)
+            pool_size: Keep-alive connections kept open when creating the session
+            timeout: (connect, read) timeout in seconds for generation requests
         """
-        self.service = service.lower()
+        super().__init__(service, base_url)
+        self.session = session or make_session(pool_size)
+        self.timeout = timeout
 
-        if base_url:
-            self.base_url = base_url.rstrip('/')
-        elif self.service == "ollama":
-            self.base_url = "http://localhost:11434"
-        elif self.service == "lmstudio":
-            self.base_url = "http://localhost:1234"
-        else:
-            raise ValueError("Service must be 'ollama' or 'lmstudio'")
+    def close(self):
+        """Close pooled connections"""
+        self.session.close()
+
+    def __enter__(self):
+        return self
 
-    def list_models(self) -> list:
-        """List available models"""
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def list_models(self, refresh: bool = False) -> list:
+        """List available models (cached for MODEL_CACHE_TTL unless refresh)"""
+        models = None if refresh else self.catalog.get_models()
+        if models is not None:
+            return models
+        if self._known_down():
+            return []
         try:
-            if self.service == "ollama":
-                response = requests.get(f"{self.base_url}/api/tags")
-                response.raise_for_status()
-                data = response.json()
-                return [model['name'] for model in data.get('models', [])]
-            elif self.service == "lmstudio":
-                response = requests.get(f"{self.base_url}/v1/models")
-                response.raise_for_status()
-                data = response.json()
-                return [model['id'] for model in data.get('data', [])]
+            response = self.session.get(self._models_url(), timeout=self.timeout)
+            response.raise_for_status()
+            models = self._parse_models(response.json())
+        except requests.exceptions.ConnectionError as e:
+            self._record(False, e)
+            print(f"Error connecting to {self.service}: {e}")
+            return []
         except requests.exceptions.RequestException as e:
             print(f"Error connecting to {self.service}: {e}")
             return []
+        self._record(True)
+        self.catalog.set_models(models)
+        return models
+
+    def model_info(self, model: str, refresh: bool = False) -> Optional[Dict[str, Any]]:
+        """Metadata such as context_length for a model (cached), or None if unavailable"""
+        info = None if refresh else self.catalog.get_info(model)
+        if info is not None:
+            return info
+        method, url, body = self._info_request(model)
+        try:
+            response = self.session.request(method, url, json=body, timeout=self.timeout)
+            self._check_model_found(response.status_code)
+            response.raise_for_status()
+            info = self._parse_info(model, response.json())
+        except (requests.exceptions.RequestException, ValueError) as e:
+            print(f"Error getting {model} info from {self.service}: {e}")
+            return None
+        self.catalog.set_info(model, info)
+        return info
+
+    def default_model(self) -> Optional[str]:
+        """The model used when none is given (first available for Ollama)"""
+        if self.service != "ollama":
+            return "local-model"
+        models = self.list_models()
+        return models[0] if models else None
+
+    def _resolve_model(self, model: str) -> Optional[str]:
+        """Return the model to use, picking the default model if none given"""
+        if model:
+            return model
+        model = self.default_model()
+        if model is None:
+            print("No models available")
+        return model
 
     def query(self, prompt: str, model: str = "", temperature: float = 0.7,
-              max_tokens: int = 1000) -> Optional[str]:
+              max_tokens: int = 1000,
+              hedge: Optional["LocalLLMClient"] = None) -> Optional[str]:
         """
         Send a query to the LLM
 
@@ -57,88 +448,557 @@ class LocalLLMClient:
             model: Model name (required for Ollama, optional for LM Studio)
             temperature: Sampling temperature (0.0 to 1.0)
             max_tokens: Maximum tokens to generate
+            hedge: Another client serving the same model. If this server
+                hasn't answered within its p90 latency (or HEDGE_DELAY), the
+                query is sent there too and the first answer is returned; if
+                this server is down or fails, it is sent there right away.
+                (The slower request can't be interrupted; its answer is
+                discarded.)
 
         Returns:
             Generated response text or None if error
         """
+        if hedge is not None:
+            return self._hedged_query(hedge, prompt, model, temperature, max_tokens)
+        if self._known_down():
+            return None
         try:
-            if self.service == "ollama":
-                if not model:
-                    # Use first available model if none specified
-                    models = self.list_models()
-                    if not models:
-                        print("No models available")
-                        return None
-                    model = models[0]
-                    print(f"Using model: {model}")
-
-                payload = {
-                    "model": model,
-                    "prompt": prompt,
-                    "stream": False,
-                    "options": {
-                        "temperature": temperature,
-                        "num_predict": max_tokens
-                    }
-                }
-                response = requests.post(f"{self.base_url}/api/generate", json=payload)
-                response.raise_for_status()
-                data = response.json()
-                return data.get('response', '')
+            model = self._resolve_model(model)
+            if model is None:
+                return None
+            url, payload = self._request(prompt, model, temperature, max_tokens, stream=False)
+            started = time.perf_counter()
+            response = self.session.post(url, json=payload, timeout=self.timeout)
+            self._record(True)
+            self._check_model_found(response.status_code)
+            response.raise_for_status()
+            reply = self._parse_reply(response.json())
+            health.record_latency(self.base_url, time.perf_counter() - started)
+            return reply
 
-            elif self.service == "lmstudio":
-                payload = {
-                    "model": model or "local-model",
-                    "messages": [{"role": "user", "content": prompt}],
-                    "temperature": temperature,
-                    "max_tokens": max_tokens,
-                    "stream": False
-                }
-                response = requests.post(f"{self.base_url}/v1/chat/completions", json=payload)
+        except requests.exceptions.ConnectionError as e:
+            self._record(False, e)
+            print(f"Error querying {self.service}: {e}")
+            return None
+        except requests.exceptions.RequestException as e:
+            print(f"Error querying {self.service}: {e}")
+            return None
+        except json.JSONDecodeError as e:
+            print(f"Error parsing response from {self.service}: {e}")
+            return None
+
+    def _hedged_query(self, hedge: "LocalLLMClient", prompt: str, model: str,
+                      temperature: float, max_tokens: int) -> Optional[str]:
+        started = time.perf_counter()
+        delay, no_history = self._hedge_delay()
+        resolved = None if health.is_down(self.base_url) else self._resolve_model(model)
+        args = (prompt, resolved or model, temperature, max_tokens)
+        futures = {}
+        if resolved is not None:
+            futures[_hedge_pool().submit(self.query, *args)] = self.base_url
+        hedged = failover = False
+        winner = None
+        error = None
+
+        def send_hedge() -> set:
+            if health.is_down(hedge.base_url):
+                return set()
+            future = _hedge_pool().submit(hedge.query, *args)
+            futures[future] = hedge.base_url
+            return {future}
+
+        try:
+            pending = set(futures)
+            if not pending:
+                # This server is down: ask the other one straight away
+                pending = send_hedge()
+                hedged = failover = bool(pending)
+            elif not wait(pending, timeout=delay).done:
+                pending |= send_hedge()
+                hedged = len(pending) > 1
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    try:
+                        reply = future.result()
+                    except Exception as e:
+                        reply, error = None, e
+                    if reply is not None:
+                        winner = futures[future]
+                        return reply
+                if not pending and not hedged:
+                    # This server failed before the hedge delay was up
+                    pending = send_hedge()
+                    hedged = failover = bool(pending)
+            if error is not None:
+                raise error
+            return None
+        finally:
+            hedge_stats.record(self.base_url, hedge.base_url, delay, no_history,
+                               hedged, failover, winner,
+                               time.perf_counter() - started)
+
+    def stream(self, prompt: str, model: str = "", temperature: float = 0.7,
+               max_tokens: int = 1000) -> Iterator[str]:
+        """
+        Stream the response as it is generated
+
+        Args:
+            Same as query()
+
+        Yields:
+            Pieces of generated text. Stops early (after printing the error)
+            if the request fails.
+        """
+        if self._known_down():
+            return
+        try:
+            model = self._resolve_model(model)
+            if model is None:
+                return
+            url, payload = self._request(prompt, model, temperature, max_tokens, stream=True)
+            with self.session.post(url, json=payload, stream=True,
+                                   timeout=self.timeout) as response:
+                self._record(True)
+                self._check_model_found(response.status_code)
                 response.raise_for_status()
-                data = response.json()
-                return data.get('choices', [{}])[0].get('message', {}).get('content', '')
+                for line in response.iter_lines(decode_unicode=True):
+                    text, finished = self._parse_stream_line(line)
+                    if text:
+                        yield text
+                    if finished:
+                        return
 
+        except requests.exceptions.ConnectionError as e:
+            self._record(False, e)
+            print(f"Error streaming from {self.service}: {e}")
         except requests.exceptions.RequestException as e:
+            print(f"Error streaming from {self.service}: {e}")
+        except json.JSONDecodeError as e:
+            print(f"Error parsing stream from {self.service}: {e}")
+
+    def is_available(self, refresh: bool = False) -> bool:
+        """Check if the service is available (cached for HEALTH_TTL unless refresh)"""
+        known = None if refresh else health.get(self.base_url)
+        if known is not None:
+            return known
+        try:
+            response = self.session.get(self._models_url(), timeout=PROBE_TIMEOUT)
+            up = response.status_code == 200
+            self._record(up, None if up else Exception(f"HTTP {response.status_code}"))
+        except requests.exceptions.RequestException as e:
+            up = False
+            self._record(False, e)
+        return up
+
+
+class AsyncLocalLLMClient(_ServiceProtocol):
+    """asyncio client for Ollama and LM Studio, built on a pooled httpx.AsyncClient
+
+    Use it as an async context manager (or call aclose()) to release its
+    connections. query_many() runs many prompts with bounded concurrency.
+    """
+
+    def __init__(self, service: str = "ollama", base_url: Optional[str] = None,
+                 client=None, pool_size: int = POOL_SIZE,
+                 timeout: float = READ_TIMEOUT):
+        """
+        Initialize the client
+
+        Args:
+            service: 'ollama' or 'lmstudio'
+            base_url: Custom base URL (optional)
+            client: httpx.AsyncClient to use (optional; a pooled one is created)
+            pool_size: Connection pool size when creating the client
+            timeout: Default per-request timeout in seconds (whole request)
+        """
+        super().__init__(service, base_url)
+        self.client = client or make_httpx_client(pool_size, asynchronous=True)
+        self.timeout = timeout
+
+    async def aclose(self):
+        """Close pooled connections"""
+        await self.client.aclose()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+    async def list_models(self, refresh: bool = False) -> list:
+        """List available models (shares the sync client's cache)"""
+        import httpx
+
+        models = None if refresh else self.catalog.get_models()
+        if models is not None:
+            return models
+        if self._known_down():
+            return []
+        try:
+            response = await self.client.get(self._models_url())
+            response.raise_for_status()
+            models = self._parse_models(response.json())
+        except (httpx.ConnectError, httpx.ConnectTimeout) as e:
+            self._record(False, e)
+            print(f"Error connecting to {self.service}: {e}")
+            return []
+        except httpx.HTTPError as e:
+            print(f"Error connecting to {self.service}: {e}")
+            return []
+        self._record(True)
+        self.catalog.set_models(models)
+        return models
+
+    async def model_info(self, model: str,
+                         refresh: bool = False) -> Optional[Dict[str, Any]]:
+        """Metadata such as context_length for a model (cached), or None if unavailable"""
+        import httpx
+
+        info = None if refresh else self.catalog.get_info(model)
+        if info is not None:
+            return info
+        method, url, body = self._info_request(model)
+        try:
+            response = await self.client.request(method, url, json=body)
+            self._check_model_found(response.status_code)
+            response.raise_for_status()
+            info = self._parse_info(model, response.json())
+        except (httpx.HTTPError, ValueError) as e:
+            print(f"Error getting {model} info from {self.service}: {e}")
+            return None
+        self.catalog.set_info(model, info)
+        return info
+
+    async def default_model(self) -> Optional[str]:
+        """The model used when none is given (first available for Ollama)"""
+        if self.service != "ollama":
+            return "local-model"
+        models = await self.list_models()
+        return models[0] if models else None
+
+    async def _resolve_model(self, model: str) -> Optional[str]:
+        if model:
+            return model
+        model = await self.default_model()
+        if model is None:
+            print("No models available")
+        return model
+
+    async def is_available(self, refresh: bool = False) -> bool:
+        """Check if the service is available (cached for HEALTH_TTL unless refresh)"""
+        import httpx
+
+        known = None if refresh else health.get(self.base_url)
+        if known is not None:
+            return known
+        try:
+            response = await self.client.get(self._models_url(), timeout=PROBE_TIMEOUT)
+            up = response.status_code == 200
+            self._record(up, None if up else Exception(f"HTTP {response.status_code}"))
+        except httpx.HTTPError as e:
+            up = False
+            self._record(False, e)
+        return up
+
+    async def _generate(self, prompt: str, model: str, temperature: float,
+                        max_tokens: int) -> str:
+        url, payload = self._request(prompt, model, temperature, max_tokens, stream=False)
+        started = time.perf_counter()
+        response = await self.client.post(url, json=payload)
+        self._record(True)
+        self._check_model_found(response.status_code)
+        response.raise_for_status()
+        reply = self._parse_reply(response.json())
+        health.record_latency(self.base_url, time.perf_counter() - started)
+        return reply
+
+    async def query(self, prompt: str, model: str = "", temperature: float = 0.7,
+                    max_tokens: int = 1000,
+                    timeout: Optional[float] = None,
+                    hedge: Optional["AsyncLocalLLMClient"] = None) -> Optional[str]:
+        """
+        Send a query to the LLM
+
+        Args:
+            Same as LocalLLMClient.query(), plus
+            timeout: Seconds before giving up (defaults to the client's timeout)
+            hedge: Another client serving the same model, asked when this
+                one is slow, down or failing; the slower of the two requests
+                is cancelled
+
+        Returns:
+            Generated response text or None if error or timeout
+        """
+        import httpx
+
+        if hedge is not None:
+            return await self._hedged_query(hedge, prompt, model, temperature,
+                                            max_tokens, timeout)
+        if self._known_down():
+            return None
+        try:
+            model = await self._resolve_model(model)
+            if model is None:
+                return None
+            return await asyncio.wait_for(
+                self._generate(prompt, model, temperature, max_tokens),
+                timeout if timeout is not None else self.timeout,
+            )
+        except asyncio.TimeoutError:
+            print(f"Timed out querying {self.service}")
+            return None
+        except (httpx.ConnectError, httpx.ConnectTimeout) as e:
+            self._record(False, e)
+            print(f"Error querying {self.service}: {e}")
+            return None
+        except httpx.HTTPError as e:
             print(f"Error querying {self.service}: {e}")
             return None
         except json.JSONDecodeError as e:
             print(f"Error parsing response from {self.service}: {e}")
             return None
 
-    def is_available(self) -> bool:
-        """Check if the service is available"""
+    async def _hedged_query(self, hedge: "AsyncLocalLLMClient", prompt: str,
+                            model: str, temperature: float, max_tokens: int,
+                            timeout: Optional[float]) -> Optional[str]:
+        started = time.perf_counter()
+        delay, no_history = self._hedge_delay()
+        resolved = (None if health.is_down(self.base_url)
+                    else await self._resolve_model(model))
+        args = (prompt, resolved or model, temperature, max_tokens, timeout)
+        tasks = {}
+        if resolved is not None:
+            tasks[asyncio.ensure_future(self.query(*args))] = self.base_url
+        hedged = failover = False
+        winner = None
+        error = None
+
+        def send_hedge() -> set:
+            if health.is_down(hedge.base_url):
+                return set()
+            task = asyncio.ensure_future(hedge.query(*args))
+            tasks[task] = hedge.base_url
+            return {task}
+
         try:
-            if self.service == "ollama":
-                response = requests.get(f"{self.base_url}/api/tags", timeout=5)
-            elif self.service == "lmstudio":
-                response = requests.get(f"{self.base_url}/v1/models", timeout=5)
-            return response.status_code == 200
-        except:
-            return False
+            pending = set(tasks)
+            if not pending:
+                # This server is down: ask the other one straight away
+                pending = send_hedge()
+                hedged = failover = bool(pending)
+            else:
+                done, _ = await asyncio.wait(pending, timeout=delay)
+                if not done:
+                    pending |= send_hedge()
+                    hedged = len(pending) > 1
+            while pending:
+                done, pending = await asyncio.wait(pending,
+                                                   return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is not None:
+                        error = task.exception()
+                        continue
+                    if task.result() is not None:
+                        winner = tasks[task]
+                        return task.result()
+                if not pending and not hedged:
+                    # This server failed before the hedge delay was up
+                    pending = send_hedge()
+                    hedged = failover = bool(pending)
+            if error is not None:
+                raise error
+            return None
+        finally:
+            for task in tasks:
+                task.cancel()
+            hedge_stats.record(self.base_url, hedge.base_url, delay, no_history,
+                               hedged, failover, winner,
+                               time.perf_counter() - started)
+
+    async def stream(self, prompt: str, model: str = "", temperature: float = 0.7,
+                     max_tokens: int = 1000) -> AsyncIterator[str]:
+        """
+        Stream the response as it is generated
+
+        Yields:
+            Pieces of generated text. Stops early (after printing the error)
+            if the request fails.
+        """
+        import httpx
+
+        if self._known_down():
+            return
+        try:
+            model = await self._resolve_model(model)
+            if model is None:
+                return
+            url, payload = self._request(prompt, model, temperature, max_tokens, stream=True)
+            async with self.client.stream("POST", url, json=payload) as response:
+                self._record(True)
+                self._check_model_found(response.status_code)
+                response.raise_for_status()
+                async for line in response.aiter_lines():
+                    text, finished = self._parse_stream_line(line)
+                    if text:
+                        yield text
+                    if finished:
+                        return
+        except (httpx.ConnectError, httpx.ConnectTimeout) as e:
+            self._record(False, e)
+            print(f"Error streaming from {self.service}: {e}")
+        except httpx.HTTPError as e:
+            print(f"Error streaming from {self.service}: {e}")
+        except json.JSONDecodeError as e:
+            print(f"Error parsing stream from {self.service}: {e}")
+
+    async def query_many(self, prompts: Iterable[str], model: str = "",
+                         concurrency: int = 4, ordered: bool = True,
+                         timeout: Optional[float] = None,
+                         **kwargs) -> AsyncIterator[Tuple[int, Optional[str]]]:
+        """
+        Run many prompts with at most `concurrency` requests in flight
+
+        Prompts are pulled from the iterable only as slots free up, so a
+        generator of prompts is consumed lazily. With ordered=True results
+        come back in prompt order, and at most 2 * concurrency finished
+        results are held back waiting for a slow earlier prompt.
+
+        Args:
+            prompts: Prompts to run
+            model: Model name (resolved once for the whole batch)
+            concurrency: Maximum simultaneous requests
+            ordered: Yield in prompt order (True) or as completed (False)
+            timeout: Per-request timeout in seconds
+            **kwargs: temperature / max_tokens, as for query()
+
+        Yields:
+            (index, response text or None) for each prompt
+        """
+        model = await self._resolve_model(model)
+        if model is None:
+            return
+        concurrency = max(1, concurrency)
+        window = 2 * concurrency
+        source = iter(enumerate(prompts))
+        pending: Dict[asyncio.Task, int] = {}
+        finished: Dict[int, Optional[str]] = {}
+        next_index = 0
+        exhausted = False
+
+        def launch():
+            nonlocal exhausted
+            while not exhausted and len(pending) < concurrency:
+                if ordered and len(pending) + len(finished) >= window:
+                    break
+                try:
+                    index, prompt = next(source)
+                except StopIteration:
+                    exhausted = True
+                    break
+                task = asyncio.ensure_future(
+                    self.query(prompt, model, timeout=timeout, **kwargs))
+                pending[task] = index
+
+        try:
+            launch()
+            while pending:
+                done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    index = pending.pop(task)
+                    if ordered:
+                        finished[index] = task.result()
+                    else:
+                        yield index, task.result()
+                while ordered and next_index in finished:
+                    yield next_index, finished.pop(next_index)
+                    next_index += 1
+                launch()
+        finally:
+            # Consumer stopped early: cancel what is still running
+            for task in pending:
+                task.cancel()
+
+
+_hedge_executor: Optional[ThreadPoolExecutor] = None
+_hedge_executor_lock = threading.Lock()
+
+
+def _hedge_pool() -> ThreadPoolExecutor:
+    """Threads for the sync client's hedged queries, created on first use"""
+    global _hedge_executor
+    with _hedge_executor_lock:
+        if _hedge_executor is None:
+            _hedge_executor = ThreadPoolExecutor(max_workers=2 * POOL_SIZE,
+                                                 thread_name_prefix="llm-hedge")
+        return _hedge_executor
+
+
+# Shared clients, one per (service, base_url)
+_clients: Dict[Tuple[str, str], LocalLLMClient] = {}
+_clients_lock = threading.Lock()
+
+
+def get_client(service: str = "ollama", base_url: Optional[str] = None) -> LocalLLMClient:
+    """Return the shared client for a service and base URL, creating it once"""
+    service = service.lower()
+    if service not in DEFAULT_URLS:
+        raise ValueError("Service must be 'ollama' or 'lmstudio'")
+    key = (service, (base_url or DEFAULT_URLS[service]).rstrip('/'))
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            client = _clients[key] = LocalLLMClient(service, key[1])
+        return client
+
+
+def close_clients():
+    """Close and forget all shared clients"""
+    with _clients_lock:
+        for client in _clients.values():
+            client.close()
+        _clients.clear()
 
 
 # Convenience functions
 def query_ollama(prompt: str, model: str = "", **kwargs) -> Optional[str]:
     """Quick function to query Ollama"""
-    client = LocalLLMClient("ollama")
-    return client.query(prompt, model, **kwargs)
+    return get_client("ollama").query(prompt, model, **kwargs)
 
 
 def query_lmstudio(prompt: str, model: str = "", **kwargs) -> Optional[str]:
     """Quick function to query LM Studio"""
-    client = LocalLLMClient("lmstudio")
-    return client.query(prompt, model, **kwargs)
+    return get_client("lmstudio").query(prompt, model, **kwargs)
+
+
+def get_available_services(refresh: bool = False) -> Dict[str, bool]:
+    """Check which services are available, probing them in parallel"""
+    services = list(DEFAULT_URLS)
+    with ThreadPoolExecutor(max_workers=len(services)) as pool:
+        results = pool.map(lambda s: get_client(s).is_available(refresh), services)
+        return dict(zip(services, results))
+
+
+def watch_services(interval: float = HEALTH_TTL / 2) -> threading.Event:
+    """Re-probe every shared client's server in the background
+
+    Keeps the health state fresh so queries never wait on a dead server.
+    Runs in a daemon thread until the returned event is set.
+    """
+    stop = threading.Event()
 
+    def loop():
+        while not stop.is_set():
+            with _clients_lock:
+                clients = list(_clients.values())
+            if not clients:
+                clients = [get_client(service) for service in DEFAULT_URLS]
+            with ThreadPoolExecutor(max_workers=len(clients)) as pool:
+                list(pool.map(lambda c: c.is_available(refresh=True), clients))
+            stop.wait(interval)
 
-def get_available_services() -> Dict[str, bool]:
-    """Check which services are available"""
-    ollama = LocalLLMClient("ollama").is_available()
-    lmstudio = LocalLLMClient("lmstudio").is_available()
-    return {
-        "ollama": ollama,
-        "lmstudio": lmstudio
-    }
+    threading.Thread(target=loop, name="llm-health", daemon=True).start()
+    return stop
 
 
 if __name__ == "__main__":
@@ -150,7 +1010,7 @@ if __name__ == "__main__":
 
     if services['ollama']:
         print("\nOllama models:")
-        client = LocalLLMClient("ollama")
+        client = get_client("ollama")
         models = client.list_models()
         for model in models:
             print(f"  - {model}")
@@ -162,7 +1022,7 @@ if __name__ == "__main__":
 
     if services['lmstudio']:
         print("\nLM Studio models:")
-        client = LocalLLMClient("lmstudio")
+        client = get_client("lmstudio")
         models = client.list_models()
         for model in models:
             print(f"  - {model}")
@@ -3,7 +3,10 @@ Simple LLM Query Examples for Metaproject
 Add this to your existing Python files to integrate LLM queries
 """
 
-from llm_client import query_ollama, query_lmstudio, LocalLLMClient, get_available_services
+import asyncio
+
+from llm_client import (query_ollama, query_lmstudio, get_client, get_available_services,
+                        AsyncLocalLLMClient)
 
 # Example 1: Quick one-off queries
 
@@ -19,9 +22,9 @@ if response:
 
 # Example 2: Using the client class for more control
 
-# Initialize clients
-ollama_client = LocalLLMClient("ollama")
-lm_client = LocalLLMClient("lmstudio")
+# Shared clients keep their connections open between queries
+ollama_client = get_client("ollama")
+lm_client = get_client("lmstudio")
 
 # Check what's available
 services = get_available_services()
@@ -67,4 +70,19 @@ Keep response under 100 words."""
 # Example usage in your question interface
 # question = "how do computers work?"
 # enhanced = enhance_question_with_llm(question)
-# print(enhanced)
\ No newline at end of file
+# print(enhanced)
+
+# Example 4: Enhancing many questions concurrently
+
+async def enhance_questions(questions, concurrency=4):
+    """Enhance a batch of questions, keeping up to `concurrency` requests in flight"""
+    prompts = [f"Suggest a clearer version of this question: {q}" for q in questions]
+    enhanced = list(questions)
+    async with AsyncLocalLLMClient("ollama") as client:
+        async for i, response in client.query_many(prompts, concurrency=concurrency,
+                                                   timeout=60, max_tokens=100):
+            if response:
+                enhanced[i] = response
+    return enhanced
+
+# enhanced = asyncio.run(enhance_questions(["how do computers work?", "what is dns"]))
@@ -3,42 +3,48 @@
 Usage:
   python3 manager.py add "My question?" --category "life" --notes "context"
   python3 manager.py list --status open
+  python3 manager.py migrate   # copy questions.csv into questions.db
+  python3 manager.py export    # write questions.db back to questions.csv
+
+Set METAPROJECT_STORAGE=sqlite to use questions.db instead of the CSV.
 """
-import csv
 import os
 import argparse
 from datetime import datetime
 
-BASE_DIR = os.path.dirname(__file__)
-DATA_DIR = os.path.join(BASE_DIR, "data")
-CSV_PATH = os.path.join(DATA_DIR, "questions.csv")
-HEADER = ["id", "question", "category", "created_at", "status", "notes"]
-
+from question_storage import (
+    DEFAULT_CSV_PATH,
+    DEFAULT_DB_PATH,
+    export_csv,
+    import_csv,
+    open_storage,
+)
 
-def ensure_data():
-    os.makedirs(DATA_DIR, exist_ok=True)
-    if not os.path.exists(CSV_PATH):
-        with open(CSV_PATH, "w", newline="", encoding="utf-8") as f:
-            writer = csv.writer(f)
-            writer.writerow(HEADER)
+CSV_PATH = os.environ.get("METAPROJECT_CSV", DEFAULT_CSV_PATH)
+DB_PATH = os.environ.get("METAPROJECT_DB", DEFAULT_DB_PATH)
 
 
 def add(question, category="", notes="", status="open"):
-    ensure_data()
+    storage = open_storage()
     uid = str(int(datetime.utcnow().timestamp() * 1000))
     created_at = datetime.utcnow().isoformat() + "Z"
-    row = [uid, question, category, created_at, status, notes]
-    with open(CSV_PATH, "a", newline="", encoding="utf-8") as f:
-        writer = csv.writer(f)
-        writer.writerow(row)
+    row = {
+        "id": uid,
+        "question": question,
+        "category": category,
+        "created_at": created_at,
+        "status": status,
+        "notes": notes,
+        "type": "note",
+    }
+    storage.append_row(row)
     print(uid)
 
 
 def list_entries(status=None, limit=None):
-    ensure_data()
-    with open(CSV_PATH, "r", newline="") as f:
-        reader = csv.DictReader(f)
-        rows = list(reader)
+    storage = open_storage()
+    storage.ensure()
+    rows = storage.read_rows()
     if status:
         rows = [r for r in rows if r.get("status") == status]
     if limit:
@@ -62,11 +68,20 @@ def main():
     p_list.add_argument("--status", "-s", default=None)
     p_list.add_argument("--limit", "-l", default=None)
 
+    sub.add_parser("migrate", help="import questions.csv into questions.db")
+    sub.add_parser("export", help="export questions.db to questions.csv")
+
     args = parser.parse_args()
     if args.cmd == "add":
         add(args.question, args.category, args.notes)
     elif args.cmd == "list":
         list_entries(args.status, args.limit)
+    elif args.cmd == "migrate":
+        count = import_csv(CSV_PATH, DB_PATH)
+        print(f"Imported {count} rows into {DB_PATH}")
+    elif args.cmd == "export":
+        count = export_csv(DB_PATH, CSV_PATH)
+        print(f"Exported {count} rows to {CSV_PATH}")
     else:
         parser.print_help()
 
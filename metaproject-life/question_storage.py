@@ -0,0 +1,248 @@
+"""Storage engines for the metaproject question list.
+
+Two interchangeable engines share one row format (a dict keyed by FIELDS):
+
+  csv     data/questions.csv, the original format (default)
+  sqlite  data/questions.db, WAL mode with indexed lookup columns
+
+Select the engine with METAPROJECT_STORAGE=csv|sqlite. METAPROJECT_CSV and
+METAPROJECT_DB override the file locations. Use import_csv/export_csv (or
+`manager.py migrate` / `manager.py export`) to move data between them.
+
+Only the standard library is used so manager.py stays dependency-free.
+"""
+
+import csv
+import os
+import sqlite3
+import threading
+from typing import Dict, Iterable, List, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows: appends fall back to unlocked writes
+    fcntl = None
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.join(BASE_DIR, "data")
+DEFAULT_CSV_PATH = os.path.join(DATA_DIR, "questions.csv")
+DEFAULT_DB_PATH = os.path.join(DATA_DIR, "questions.db")
+
+FIELDS = [
+    "id",
+    "question",
+    "category",
+    "created_at",
+    "status",
+    "notes",
+    "type",
+    "repository",
+    "priority",
+    "assignee",
+    "due_date",
+    "google_sheet_id",
+]
+
+Row = Dict[str, Optional[str]]
+
+
+class CsvStorage:
+    """questions.csv as a storage engine."""
+
+    name = "csv"
+
+    def __init__(self, path: str = DEFAULT_CSV_PATH):
+        self.path = path
+
+    def signature(self):
+        """Cheap change token: (mtime, size, inode), or None if missing."""
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+    def modified_at(self) -> Optional[float]:
+        """Last modification time (epoch seconds), or None if missing."""
+        try:
+            return os.stat(self.path).st_mtime
+        except FileNotFoundError:
+            return None
+
+    def ensure(self) -> None:
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        if not os.path.exists(self.path):
+            with open(self.path, "w", newline="", encoding="utf-8") as f:
+                csv.writer(f).writerow(FIELDS)
+
+    def read_rows(self) -> List[Row]:
+        try:
+            with open(self.path, "r", newline="", encoding="utf-8") as f:
+                return [
+                    {str(k): v for k, v in row.items()} for row in csv.DictReader(f)
+                ]
+        except FileNotFoundError:
+            return []
+
+    def get_row(self, row_id: str) -> Optional[Row]:
+        for row in self.read_rows():
+            if row.get("id") == row_id:
+                return row
+        return None
+
+    def append_row(self, row: Row) -> None:
+        self.ensure()
+        with open(self.path, "a", newline="", encoding="utf-8") as f:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                csv.writer(f).writerow([row.get(k) or "" for k in FIELDS])
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+
+class SqliteStorage:
+    """SQLite storage engine (WAL mode, one connection per thread)."""
+
+    name = "sqlite"
+
+    _SCHEMA = [
+        "CREATE TABLE IF NOT EXISTS questions ("
+        + ", ".join(
+            f"{k} TEXT PRIMARY KEY" if k == "id" else f"{k} TEXT" for k in FIELDS
+        )
+        + ")",
+        "CREATE INDEX IF NOT EXISTS idx_questions_category ON questions(category)",
+        "CREATE INDEX IF NOT EXISTS idx_questions_type ON questions(type)",
+        "CREATE INDEX IF NOT EXISTS idx_questions_status ON questions(status)",
+        "CREATE INDEX IF NOT EXISTS idx_questions_due_date ON questions(due_date)",
+        # Monotonic version bumped by triggers, used as the change token
+        "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER)",
+        "INSERT OR IGNORE INTO meta (key, value) VALUES ('version', 0)",
+    ] + [
+        f"CREATE TRIGGER IF NOT EXISTS questions_version_{op.lower()} "
+        f"AFTER {op} ON questions BEGIN "
+        "UPDATE meta SET value = value + 1 WHERE key = 'version'; END"
+        for op in ("INSERT", "UPDATE", "DELETE")
+    ]
+
+    # Constant statement text so sqlite3's per-connection cache reuses the
+    # compiled statements
+    _SELECT_ALL = f"SELECT {', '.join(FIELDS)} FROM questions ORDER BY rowid"
+    _SELECT_ONE = f"SELECT {', '.join(FIELDS)} FROM questions WHERE id = ?"
+    _SELECT_VERSION = "SELECT value FROM meta WHERE key = 'version'"
+    # An upsert rather than INSERT OR REPLACE, which deletes the old row and
+    # so would move an updated question to the end of the ORDER BY rowid
+    _INSERT = (
+        f"INSERT INTO questions ({', '.join(FIELDS)}) "
+        f"VALUES ({', '.join('?' for _ in FIELDS)}) "
+        "ON CONFLICT(id) DO UPDATE SET "
+        + ", ".join(f"{k} = excluded.{k}" for k in FIELDS if k != "id")
+    )
+
+    def __init__(self, path: str = DEFAULT_DB_PATH):
+        self.path = path
+        self._local = threading.local()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = sqlite3.connect(self.path, cached_statements=64)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=5000")
+            with conn:
+                for statement in self._SCHEMA:
+                    conn.execute(statement)
+            self._local.conn = conn
+        return conn
+
+    def close(self) -> None:
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    def signature(self):
+        """Change token: (inode, version), or None if the database is missing."""
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        (version,) = self._connect().execute(self._SELECT_VERSION).fetchone()
+        return (st.st_ino, version)
+
+    def modified_at(self) -> Optional[float]:
+        """Last modification time of the database or its WAL, or None if missing."""
+        times = []
+        for path in (self.path, self.path + "-wal"):
+            try:
+                times.append(os.stat(path).st_mtime)
+            except FileNotFoundError:
+                pass
+        return max(times) if times else None
+
+    def ensure(self) -> None:
+        self._connect()
+
+    def read_rows(self) -> List[Row]:
+        if not os.path.exists(self.path):
+            return []
+        cursor = self._connect().execute(self._SELECT_ALL)
+        return [dict(zip(FIELDS, values)) for values in cursor]
+
+    def get_row(self, row_id: str) -> Optional[Row]:
+        if not os.path.exists(self.path):
+            return None
+        values = self._connect().execute(self._SELECT_ONE, (row_id,)).fetchone()
+        return dict(zip(FIELDS, values)) if values else None
+
+    def append_row(self, row: Row) -> None:
+        self.write_rows([row])
+
+    def write_rows(self, rows: Iterable[Row]) -> int:
+        conn = self._connect()
+        with conn:
+            cursor = conn.executemany(
+                self._INSERT, ([row.get(k) for k in FIELDS] for row in rows)
+            )
+        return cursor.rowcount
+
+
+def open_storage(engine: Optional[str] = None):
+    """Return the configured storage engine (METAPROJECT_STORAGE, default csv)."""
+    engine = (engine or os.environ.get("METAPROJECT_STORAGE") or "csv").lower()
+    if engine == "csv":
+        return CsvStorage(os.environ.get("METAPROJECT_CSV", DEFAULT_CSV_PATH))
+    if engine == "sqlite":
+        return SqliteStorage(os.environ.get("METAPROJECT_DB", DEFAULT_DB_PATH))
+    raise ValueError("Storage engine must be 'csv' or 'sqlite'")
+
+
+def import_csv(csv_path: str, db_path: str) -> int:
+    """One-shot migration of a questions CSV into SQLite. Returns rows written."""
+    rows = CsvStorage(csv_path).read_rows()
+    db = SqliteStorage(db_path)
+    try:
+        return db.write_rows(rows)
+    finally:
+        db.close()
+
+
+def export_csv(db_path: str, csv_path: str) -> int:
+    """Export the SQLite store back to the CSV schema. Returns rows written."""
+    db = SqliteStorage(db_path)
+    try:
+        rows = db.read_rows()
+    finally:
+        db.close()
+    tmp_path = csv_path + ".tmp"
+    with open(tmp_path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(FIELDS)
+        for row in rows:
+            writer.writerow([row.get(k) or "" for k in FIELDS])
+    os.replace(tmp_path, csv_path)
+    return len(rows)
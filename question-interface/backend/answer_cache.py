@@ -0,0 +1,125 @@
+"""
+In-memory LRU cache of markdown answer files.
+
+Questions reference their answer through the notes column
+(``answer:answers/<id>.md``, relative to the data directory). Files are
+loaded lazily on first use, kept in memory up to a byte budget with
+least-recently-used eviction, and re-read only when their mtime or size
+changes. Each entry carries a SHA-256 of its content, which the API uses
+for ETags.
+"""
+
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from typing import NamedTuple, Optional, Tuple
+
+ANSWER_PREFIX = "answer:"
+
+# Default memory budget for cached answer text (bytes of UTF-8 content)
+DEFAULT_MAX_BYTES = int(os.environ.get("ANSWER_CACHE_BYTES", 16 * 1024 * 1024))
+
+
+def answer_reference(notes: Optional[str]) -> Optional[str]:
+    """Return the answer path from a notes value, or None if there is none."""
+    if not notes or not notes.startswith(ANSWER_PREFIX):
+        return None
+    return notes[len(ANSWER_PREFIX) :].strip()
+
+
+class AnswerEntry(NamedTuple):
+    content: str
+    digest: str  # SHA-256 hex of the file bytes
+    size: int
+    signature: Tuple[int, int]  # (mtime_ns, size) at load time
+
+    @property
+    def modified_at(self) -> float:
+        return self.signature[0] / 1e9
+
+
+class AnswerCache:
+    """Caches answer files keyed by path, validated on mtime/size, LRU-evicted."""
+
+    def __init__(self, base_dir: str, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.base_dir = base_dir
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, AnswerEntry]" = OrderedDict()
+        self._total_bytes = 0
+
+    @property
+    def total_bytes(self) -> int:
+        return self._total_bytes
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _discard(self, path: str) -> None:
+        entry = self._entries.pop(path, None)
+        if entry is not None:
+            self._total_bytes -= entry.size
+
+    def _store(self, path: str, entry: AnswerEntry) -> None:
+        self._discard(path)
+        if entry.size > self.max_bytes:
+            # Too large to keep; served but never cached
+            return
+        self._entries[path] = entry
+        self._total_bytes += entry.size
+        while self._total_bytes > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._total_bytes -= evicted.size
+
+    def get_entry(self, reference: str) -> Optional[AnswerEntry]:
+        """Return the cached entry for an answer file, loading it if needed."""
+        path = os.path.join(self.base_dir, reference)
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            with self._lock:
+                self._discard(path)
+            return None
+        signature = (st.st_mtime_ns, st.st_size)
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None and entry.signature == signature:
+                self._entries.move_to_end(path)
+                return entry
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            return None
+        entry = AnswerEntry(
+            content=data.decode("utf-8"),
+            digest=hashlib.sha256(data).hexdigest(),
+            size=len(data),
+            signature=signature,
+        )
+        with self._lock:
+            self._store(path, entry)
+        return entry
+
+    def get(self, reference: str) -> Optional[str]:
+        """Return the content of the answer file, or None if it is missing."""
+        entry = self.get_entry(reference)
+        return entry.content if entry is not None else None
+
+    def entry_for_notes(self, notes: Optional[str]) -> Optional[AnswerEntry]:
+        """Resolve and load the answer referenced by a question's notes."""
+        reference = answer_reference(notes)
+        if reference is None:
+            return None
+        return self.get_entry(reference)
+
+    def for_notes(self, notes: Optional[str]) -> Optional[str]:
+        """Resolve and read the answer referenced by a question's notes."""
+        entry = self.entry_for_notes(notes)
+        return entry.content if entry is not None else None
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._total_bytes = 0
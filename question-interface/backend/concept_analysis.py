@@ -0,0 +1,758 @@
+"""
+Concept analysis of questions and answers with local LLMs.
+
+Answers are compacted for the prompt (markdown stripped, token-limited,
+near-duplicate questions folded together; see prompt_builder) and the Q&A
+set is split into batches that fit each model's context, one prompt per
+batch (map). Every configured model runs its batches concurrently, bounded by
+ANALYSIS_CONCURRENCY per model, and all models run at once under an
+overall deadline. Each model's per-batch JSON replies are then merged into
+one ModelAnalysis (reduce). When no model produces anything usable, a basic
+grouping by category is returned instead.
+
+With a ConceptStore, analysis is incremental: only questions that are new or
+whose text changed since they were last analysed are sent to the model,
+together with the concepts of their previously related questions and of the
+unchanged questions most similar in content (TF-IDF), so the relationships
+around them can be recomputed and new questions can be linked to old ones.
+
+stream_models() is the streaming variant: it yields the generated text and
+each concept, relationship and cluster as soon as the model has written it.
+
+Given a ModelRouter, calls are spread over each model's pool of servers
+and fail over between them, and models whose servers are all known to be
+down (or have an open circuit breaker) are skipped straight away, reported
+with status "skipped".
+
+Callers can pass `on_progress` to receive events as batches and models
+finish: {"type": "batch", "model", "done", "total"} and
+{"type": "model", "model", "status", "error", "cached"}.
+"""
+
+import asyncio
+import json
+import os
+import re
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional
+
+import httpx
+
+from llm_backends import LMSTUDIO_URLS, OLLAMA_URLS, generate, stream_generate
+from json_stream import ConceptStreamParser
+from concept_store import ConceptStore, model_key, pair_hash
+from llm_cache import LLMResponseCache, cache_key
+from llm_router import ModelRouter
+from local_concepts import similar_to
+from models import ModelAnalysis
+from prompt_builder import compact_pair, count_tokens, dedupe_pairs
+
+# Define available models
+MODELS = [
+    {
+        "name": "Ollama (gpt-oss:20b)",
+        "url": OLLAMA_URLS[0],
+        "urls": OLLAMA_URLS,
+        "model": "gpt-oss:20b",
+        "context_tokens": int(os.environ.get("OLLAMA_CONTEXT_TOKENS", "8192")),
+    },
+    {
+        "name": "LMStudio",
+        "url": LMSTUDIO_URLS[0],
+        "urls": LMSTUDIO_URLS,
+        "model": "local-model",
+        "api": "openai",
+        "context_tokens": int(os.environ.get("LMSTUDIO_CONTEXT_TOKENS", "4096")),
+    },
+]
+
+# Overall budget for the whole fan-out; slower models are cancelled
+ANALYSIS_DEADLINE = float(os.environ.get("ANALYSIS_DEADLINE_SECONDS", "90"))
+Progress = Callable[[Dict[str, Any]], None]
+
+# Approximate prompt tokens of Q&A content per batch, at most; models with a
+# smaller "context_tokens" get smaller batches
+BATCH_TOKEN_BUDGET = int(os.environ.get("ANALYSIS_BATCH_TOKENS", "3000"))
+# Context kept free for the model's JSON reply, and allowed for listing
+# previously analysed questions
+OUTPUT_TOKENS = int(os.environ.get("ANALYSIS_OUTPUT_TOKENS", "1500"))
+CONTEXT_LIST_TOKENS = 500
+MIN_BATCH_TOKENS = 256
+# Batches in flight per model
+ANALYSIS_CONCURRENCY = int(os.environ.get("ANALYSIS_CONCURRENCY", "2"))
+
+PROMPT_TEMPLATE = """Analyze these questions and answers to identify key concepts, themes, and relationships.
+Focus on finding meaningful connections between questions, even if they seem unrelated at first glance.
+
+{pairs}{context}
+
+Please provide a detailed analysis:
+1. Key concepts and themes extracted from each Q&A pair
+2. Semantic relationships between questions (similar, explains, contrasts, builds-upon, etc.)
+3. Suggested concept clusters that group related questions by theme or topic
+
+Format your response as JSON:
+{{
+  "concepts": [
+    {{"question_id": "id", "concepts": ["concept1", "concept2", "theme1"]}}
+  ],
+  "relationships": [
+    {{"question1_id": "id1", "question2_id": "id2", "relationship": "similar/explains/contrasts", "strength": 0.8, "reasoning": "brief explanation"}}
+  ],
+  "suggested_clusters": [
+    {{"name": "cluster_name", "description": "detailed description of what this cluster represents", "question_ids": ["id1", "id2"], "themes": ["theme1", "theme2"]}}
+  ]
+}}"""
+
+
+def prepare_qa_pairs(questions: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Keep the questions that have an answer, compacted for the LLM."""
+    return [compact_pair(q) for q in questions if q.get("answer")]
+
+
+def format_pair(i: int, qa: Dict[str, Any]) -> str:
+    return f"Q{i+1} (id: {qa['id']}): {qa['question']}\nA{i+1}: {qa['answer']}"
+
+
+def batch_budget(model_config: Dict[str, Any]) -> int:
+    """Q&A tokens per prompt that fit the model's context with its reply."""
+    context = model_config.get("context_tokens")
+    if not context:
+        return BATCH_TOKEN_BUDGET
+    template = count_tokens(PROMPT_TEMPLATE.format(pairs="", context=""))
+    room = context - template - CONTEXT_LIST_TOKENS - OUTPUT_TOKENS
+    return max(MIN_BATCH_TOKENS, min(BATCH_TOKEN_BUDGET, room))
+
+
+def make_batches(
+    qa_pairs: List[Dict[str, Any]], budget: int = BATCH_TOKEN_BUDGET
+) -> List[List[Dict[str, Any]]]:
+    """Greedily pack Q&A pairs into batches of at most `budget` tokens.
+
+    A single pair larger than the budget gets a batch of its own.
+    """
+    batches: List[List[Dict[str, Any]]] = []
+    current: List[Dict[str, Any]] = []
+    used = 0
+    for qa in qa_pairs:
+        cost = count_tokens(format_pair(len(current), qa))
+        if current and used + cost > budget:
+            batches.append(current)
+            current, used = [], 0
+        current.append(qa)
+        used += cost
+    if current:
+        batches.append(current)
+    return batches
+
+
+def build_prompt(
+    qa_pairs: List[Dict[str, Any]], context: Optional[Dict[str, List[str]]] = None
+) -> str:
+    """Render the analysis prompt.
+
+    `context` maps ids of already analysed questions to their concepts; they
+    are listed (in id order, up to CONTEXT_LIST_TOKENS) so the model can
+    relate the new pairs to them.
+    """
+    pairs = "\n".join(format_pair(i, qa) for i, qa in enumerate(qa_pairs))
+    extra = ""
+    listed = []
+    used = 0
+    for qid in sorted(context or {}):
+        line = f"- id {qid}: {', '.join(context[qid])}"
+        used += count_tokens(line)
+        if used > CONTEXT_LIST_TOKENS:
+            break
+        listed.append(line)
+    if listed:
+        lines = "\n".join(listed)
+        extra = (
+            "\n\nPreviously analyzed questions (use their ids in relationships "
+            f"and clusters, but do not list their concepts):\n{lines}"
+        )
+    return PROMPT_TEMPLATE.format(pairs=pairs, context=extra)
+
+
+def expand_duplicates(
+    analysis: ModelAnalysis, duplicates: Dict[str, List[str]]
+) -> ModelAnalysis:
+    """Give questions folded by dedupe_pairs() the concepts of the one kept.
+
+    Each is also linked to it by a "duplicate" relationship and added to
+    the clusters it is in.
+    """
+    if not duplicates:
+        return analysis
+    concepts = list(analysis.concepts)
+    for entry in analysis.concepts:
+        for dup in duplicates.get(str(entry.get("question_id")), []):
+            concepts.append({**entry, "question_id": dup})
+    relationships = list(analysis.relationships) + [
+        {
+            "question1_id": kept,
+            "question2_id": dup,
+            "relationship": "duplicate",
+            "strength": 1.0,
+            "reasoning": "Near-identical question",
+        }
+        for kept, dups in duplicates.items()
+        for dup in dups
+    ]
+    clusters = []
+    for cluster in analysis.suggested_clusters:
+        ids = list(cluster.get("question_ids", []))
+        ids += [dup for qid in ids for dup in duplicates.get(str(qid), [])]
+        clusters.append({**cluster, "question_ids": ids})
+    return analysis.model_copy(
+        update={
+            "concepts": concepts,
+            "relationships": relationships,
+            "suggested_clusters": clusters,
+        }
+    )
+
+
+def error_analysis(
+    model_name: str, error: str, raw_response: Optional[str] = None
+) -> ModelAnalysis:
+    return ModelAnalysis(
+        model_name=model_name,
+        concepts=[],
+        relationships=[],
+        suggested_clusters=[],
+        raw_response=raw_response,
+        error=error,
+    )
+
+
+def parse_model_response(model_name: str, llm_response: str) -> ModelAnalysis:
+    """Parse a model's reply, accepting bare JSON or a fenced ```json block."""
+    try:
+        analysis_data = json.loads(llm_response)
+    except json.JSONDecodeError:
+        # Try to extract JSON from markdown
+        json_match = re.search(r"```(?:json)?\s*\n(.*?)\n```", llm_response, re.DOTALL)
+        if not json_match:
+            return error_analysis(model_name, "No JSON found in response", llm_response)
+        try:
+            analysis_data = json.loads(json_match.group(1).strip())
+        except json.JSONDecodeError:
+            return error_analysis(model_name, "JSON parsing failed", llm_response)
+    return ModelAnalysis(
+        model_name=model_name,
+        concepts=analysis_data.get("concepts", []),
+        relationships=analysis_data.get("relationships", []),
+        suggested_clusters=analysis_data.get("suggested_clusters", []),
+        raw_response=llm_response,
+    )
+
+
+async def analyze_with_model(
+    client: httpx.AsyncClient,
+    model_config: Dict[str, str],
+    prompt: str,
+    cache: Optional[LLMResponseCache] = None,
+    refresh: bool = False,
+    router: Optional[ModelRouter] = None,
+) -> ModelAnalysis:
+    """Run the prompt against one model. Never raises; errors are reported.
+
+    With a cache, an identical earlier analysis (same model config and
+    prompt) is returned without calling the model unless refresh is set.
+    Only responses that parse cleanly are cached.
+    """
+    key = cache_key(model_config, prompt) if cache is not None else None
+    if key is not None and not refresh:
+        # SQLite lookups run in a worker thread, off the event loop
+        cached = await asyncio.to_thread(cache.get, key)
+        if cached is not None:
+            analysis = parse_model_response(model_config["name"], cached)
+            analysis.cached = True
+            return analysis
+    try:
+        if router is not None:
+            llm_response = await router.generate(client, model_config, prompt)
+        else:
+            llm_response = await generate(client, model_config, prompt)
+        analysis = parse_model_response(model_config["name"], llm_response)
+        if key is not None and analysis.error is None:
+            await asyncio.to_thread(cache.put, key, model_config["model"], llm_response)
+        return analysis
+    except Exception as e:
+        return error_analysis(model_config["name"], str(e) or type(e).__name__)
+
+
+def merge_analyses(model_name: str, parts: List[ModelAnalysis]) -> ModelAnalysis:
+    """Reduce per-batch analyses from one model into a single analysis.
+
+    Concepts are unioned per question, relationships deduplicated per
+    question pair and type (keeping the strongest), and clusters with the
+    same name merged.
+    """
+    concepts: Dict[str, List[str]] = {}
+    relationships: Dict[tuple, Dict[str, Any]] = {}
+    clusters: Dict[str, Dict[str, Any]] = {}
+
+    for part in parts:
+        for entry in part.concepts:
+            merged = concepts.setdefault(str(entry.get("question_id")), [])
+            for concept in entry.get("concepts", []):
+                if concept not in merged:
+                    merged.append(concept)
+        for rel in part.relationships:
+            pair = sorted([str(rel.get("question1_id")), str(rel.get("question2_id"))])
+            key = (pair[0], pair[1], rel.get("relationship"))
+            existing = relationships.get(key)
+            if existing is None or (rel.get("strength") or 0) > (
+                existing.get("strength") or 0
+            ):
+                relationships[key] = rel
+        for cluster in part.suggested_clusters:
+            key = str(cluster.get("name", "")).strip().lower()
+            merged_cluster = clusters.get(key)
+            if merged_cluster is None:
+                clusters[key] = {
+                    **cluster,
+                    "question_ids": list(cluster.get("question_ids", [])),
+                    "themes": list(cluster.get("themes", [])),
+                }
+                continue
+            for field in ("question_ids", "themes"):
+                for value in cluster.get(field, []):
+                    if value not in merged_cluster[field]:
+                        merged_cluster[field].append(value)
+
+    failed = [part.error for part in parts if part.error]
+    error = None
+    if failed:
+        error = f"{len(failed)} of {len(parts)} batches failed: {failed[0]}"
+    return ModelAnalysis(
+        model_name=model_name,
+        concepts=[
+            {"question_id": qid, "concepts": values} for qid, values in concepts.items()
+        ],
+        relationships=list(relationships.values()),
+        suggested_clusters=list(clusters.values()),
+        raw_response="\n\n".join(p.raw_response for p in parts if p.raw_response)
+        or None,
+        error=error,
+        cached=all(part.cached for part in parts),
+    )
+
+
+async def analyze_batches(
+    client: httpx.AsyncClient,
+    model_config: Dict[str, str],
+    prompts: List[str],
+    cache: Optional[LLMResponseCache] = None,
+    refresh: bool = False,
+    concurrency: int = ANALYSIS_CONCURRENCY,
+    on_progress: Optional[Progress] = None,
+    router: Optional[ModelRouter] = None,
+) -> ModelAnalysis:
+    """Map the batch prompts over one model and reduce the results.
+
+    With a router, as many batches run at once as the model's server pool
+    can take, if that is more than `concurrency`.
+    """
+    if router is not None:
+        concurrency = max(concurrency, router.capacity(model_config))
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    done = 0
+
+    def report() -> None:
+        if on_progress is not None:
+            on_progress(
+                {
+                    "type": "batch",
+                    "model": model_config["name"],
+                    "done": done,
+                    "total": len(prompts),
+                }
+            )
+
+    async def one(prompt: str) -> ModelAnalysis:
+        nonlocal done
+        async with semaphore:
+            analysis = await analyze_with_model(
+                client, model_config, prompt, cache, refresh, router
+            )
+        done += 1
+        report()
+        return analysis
+
+    report()
+
+    parts = await asyncio.gather(*(one(prompt) for prompt in prompts))
+    if len(parts) == 1:
+        return parts[0]
+    return merge_analyses(model_config["name"], list(parts))
+
+
+async def analyze_incremental(
+    client: httpx.AsyncClient,
+    model_config: Dict[str, str],
+    qa_pairs: List[Dict[str, Any]],
+    store: ConceptStore,
+    cache: Optional[LLMResponseCache] = None,
+    refresh: bool = False,
+    concurrency: int = ANALYSIS_CONCURRENCY,
+    on_progress: Optional[Progress] = None,
+    router: Optional[ModelRouter] = None,
+) -> ModelAnalysis:
+    """Analyse only new or changed pairs and merge them into the stored graph.
+
+    Each batch carries the stored concepts of the questions previously
+    related to its pairs and of the unchanged questions most similar to
+    them, so relationships are recomputed for that neighbourhood only. With
+    refresh, every pair is re-analysed. The result covers all of `qa_pairs`
+    and is marked cached when nothing was sent; changed pairs the model
+    left out are omitted (and sent again next time) rather than served
+    with their outdated concepts.
+    """
+    model = model_key(model_config)
+    hashes = {qa["id"]: pair_hash(qa) for qa in qa_pairs}
+    # Store I/O and TF-IDF run in worker threads to keep the event loop free
+    graph = await asyncio.to_thread(store.load, model)
+    changed = [
+        qa
+        for qa in qa_pairs
+        if refresh or graph.hashes.get(qa["id"]) != hashes[qa["id"]]
+    ]
+
+    error = None
+    if changed:
+        changed_ids = {qa["id"] for qa in changed}
+        unique, duplicates = dedupe_pairs(changed)
+        # New questions have no stored edges yet; content finds their peers
+        similar = (
+            await asyncio.to_thread(similar_to, qa_pairs, changed_ids)
+            if graph.concepts
+            else {}
+        )
+        prompts = []
+        for batch in make_batches(unique, batch_budget(model_config)):
+            ids = [qa["id"] for qa in batch]
+            neighbors = graph.neighbors(ids).union(
+                *(similar.get(qid, ()) for qid in ids)
+            )
+            neighbors -= changed_ids
+            context = {
+                qid: graph.concepts[qid] for qid in neighbors if qid in graph.concepts
+            }
+            prompts.append(build_prompt(batch, context))
+        fresh = await analyze_batches(
+            client,
+            model_config,
+            prompts,
+            cache,
+            refresh,
+            concurrency,
+            on_progress,
+            router,
+        )
+        fresh = expand_duplicates(fresh, duplicates)
+        error = fresh.error
+        await asyncio.to_thread(
+            store.apply,
+            model,
+            {qid: hashes[qid] for qid in changed_ids},
+            fresh.concepts,
+            fresh.relationships,
+            fresh.suggested_clusters,
+        )
+        graph = await asyncio.to_thread(store.load, model)
+        if not graph.restrict(hashes).concepts:
+            return fresh
+
+    current = graph.restrict(
+        qid for qid, digest in hashes.items() if graph.hashes.get(qid) == digest
+    )
+    return ModelAnalysis(
+        model_name=model_config["name"],
+        concepts=[
+            {"question_id": qa["id"], "concepts": current.concepts[qa["id"]]}
+            for qa in qa_pairs
+            if qa["id"] in current.concepts
+        ],
+        relationships=current.relationships,
+        suggested_clusters=current.clusters,
+        error=error,
+        cached=not changed,
+    )
+
+
+def unavailable_analysis(model_config: Dict[str, str]) -> ModelAnalysis:
+    return error_analysis(
+        model_config["name"], f"Backend unavailable: {model_config['url']}"
+    )
+
+
+async def gather_models(
+    models: List[Dict[str, str]],
+    analyze: Callable[[Dict[str, str]], Awaitable[ModelAnalysis]],
+    deadline: float = ANALYSIS_DEADLINE,
+    on_progress: Optional[Progress] = None,
+    router: Optional[ModelRouter] = None,
+) -> List[ModelAnalysis]:
+    """Run `analyze` for all models concurrently under an overall deadline.
+
+    Models still running when the deadline passes are cancelled and reported
+    as timed out; models whose servers `router` knows to be down are not run.
+    Results keep the order of `models`.
+    """
+
+    async def indexed(i: int, config: Dict[str, str]):
+        return i, await analyze(config)
+
+    results: Dict[int, ModelAnalysis] = {}
+
+    def finished(i: int, analysis: ModelAnalysis, status: str = "") -> None:
+        results[i] = analysis
+        if on_progress is not None:
+            on_progress(
+                {
+                    "type": "model",
+                    "model": analysis.model_name,
+                    "status": status or ("failed" if analysis.error else "done"),
+                    "error": analysis.error,
+                    "cached": analysis.cached,
+                }
+            )
+
+    tasks = []
+    for i, config in enumerate(models):
+        if router is not None and router.is_down(config):
+            finished(i, unavailable_analysis(config), "skipped")
+        else:
+            tasks.append((i, asyncio.ensure_future(indexed(i, config))))
+
+    try:
+        for next_done in asyncio.as_completed(
+            [task for _, task in tasks], timeout=deadline
+        ):
+            finished(*await next_done)
+    except asyncio.TimeoutError:
+        for i, task in tasks:
+            if not task.done():
+                finished(
+                    i,
+                    error_analysis(models[i]["name"], f"Timed out after {deadline:g}s"),
+                )
+    finally:
+        # Also on cancellation or an error, so no model call is left running
+        for _, task in tasks:
+            if not task.done():
+                task.cancel()
+    return [results[i] for i in range(len(models))]
+
+
+async def run_models(
+    client: httpx.AsyncClient,
+    models: List[Dict[str, str]],
+    prompts: List[str],
+    deadline: float = ANALYSIS_DEADLINE,
+    cache: Optional[LLMResponseCache] = None,
+    refresh: bool = False,
+    concurrency: int = ANALYSIS_CONCURRENCY,
+    on_progress: Optional[Progress] = None,
+    router: Optional[ModelRouter] = None,
+) -> List[ModelAnalysis]:
+    """Run every batch prompt on every model concurrently."""
+    return await gather_models(
+        models,
+        lambda config: analyze_batches(
+            client,
+            config,
+            prompts,
+            cache,
+            refresh,
+            concurrency,
+            on_progress,
+            router,
+        ),
+        deadline,
+        on_progress,
+        router,
+    )
+
+
+async def run_incremental(
+    client: httpx.AsyncClient,
+    models: List[Dict[str, str]],
+    qa_pairs: List[Dict[str, Any]],
+    store: ConceptStore,
+    deadline: float = ANALYSIS_DEADLINE,
+    cache: Optional[LLMResponseCache] = None,
+    refresh: bool = False,
+    concurrency: int = ANALYSIS_CONCURRENCY,
+    on_progress: Optional[Progress] = None,
+    router: Optional[ModelRouter] = None,
+) -> List[ModelAnalysis]:
+    """Incrementally analyse the pairs on every model concurrently."""
+    return await gather_models(
+        models,
+        lambda config: analyze_incremental(
+            client,
+            config,
+            qa_pairs,
+            store,
+            cache,
+            refresh,
+            concurrency,
+            on_progress,
+            router,
+        ),
+        deadline,
+        on_progress,
+        router,
+    )
+
+
+# stream_models() event "type" for each section of the analysis JSON
+ITEM_EVENTS = {
+    "concepts": "concept",
+    "relationships": "relationship",
+    "suggested_clusters": "cluster",
+}
+
+
+async def stream_model(
+    client: httpx.AsyncClient,
+    model_config: Dict[str, str],
+    prompts: List[str],
+    cache: Optional[LLMResponseCache] = None,
+    refresh: bool = False,
+    router: Optional[ModelRouter] = None,
+) -> AsyncIterator[Dict[str, Any]]:
+    """Stream one model's analysis of the batch prompts, one batch at a time.
+
+    Yields {"type": "delta", "text"} for generated text, an item event per
+    completed concept/relationship/cluster, and finally {"type": "done",
+    "analysis"} with the merged ModelAnalysis. Cached batches are replayed
+    without deltas.
+    """
+    name = model_config["name"]
+    parts: List[ModelAnalysis] = []
+    for batch, prompt in enumerate(prompts):
+        key = cache_key(model_config, prompt) if cache is not None else None
+        cached = (
+            await asyncio.to_thread(cache.get, key)
+            if key is not None and not refresh
+            else None
+        )
+        chunks: List[str] = []
+        parser = ConceptStreamParser()
+        try:
+            if cached is not None:
+                pieces: AsyncIterator[str] = _replay(cached)
+            else:
+                pieces = (
+                    router.stream(client, model_config, prompt)
+                    if router is not None
+                    else stream_generate(client, model_config, prompt)
+                )
+            async for text in pieces:
+                chunks.append(text)
+                if cached is None:
+                    yield {"type": "delta", "model": name, "batch": batch, "text": text}
+                for section, item in parser.feed(text):
+                    yield {
+                        "type": ITEM_EVENTS[section],
+                        "model": name,
+                        "batch": batch,
+                        "item": item,
+                    }
+        except Exception as e:
+            parts.append(error_analysis(name, str(e) or type(e).__name__))
+            continue
+        analysis = parse_model_response(name, "".join(chunks))
+        analysis.cached = cached is not None
+        if key is not None and cached is None and analysis.error is None:
+            await asyncio.to_thread(
+                cache.put, key, model_config["model"], analysis.raw_response
+            )
+        parts.append(analysis)
+    merged = parts[0] if len(parts) == 1 else merge_analyses(name, parts)
+    yield {"type": "done", "model": name, "analysis": merged.model_dump()}
+
+
+async def _replay(text: str) -> AsyncIterator[str]:
+    yield text
+
+
+async def stream_models(
+    client: httpx.AsyncClient,
+    models: List[Dict[str, str]],
+    prompts: List[str],
+    cache: Optional[LLMResponseCache] = None,
+    refresh: bool = False,
+    router: Optional[ModelRouter] = None,
+) -> AsyncIterator[Dict[str, Any]]:
+    """Stream all models concurrently, interleaving their events.
+
+    Models on a server known to be down just get a failed "done" event.
+    """
+    queue: "asyncio.Queue[Optional[Dict[str, Any]]]" = asyncio.Queue()
+    if router is not None:
+        down = [config for config in models if router.is_down(config)]
+        models = [config for config in models if config not in down]
+        for config in down:
+            yield {
+                "type": "done",
+                "model": config["name"],
+                "analysis": unavailable_analysis(config).model_dump(),
+            }
+
+    async def pump(config: Dict[str, str]) -> None:
+        try:
+            async for event in stream_model(
+                client, config, prompts, cache, refresh, router
+            ):
+                await queue.put(event)
+        finally:
+            await queue.put(None)
+
+    tasks = [asyncio.ensure_future(pump(config)) for config in models]
+    try:
+        remaining = len(tasks)
+        while remaining:
+            event = await queue.get()
+            if event is None:
+                remaining -= 1
+            else:
+                yield event
+    finally:
+        # Client went away or we are done; stop any generation still running
+        for task in tasks:
+            task.cancel()
+
+
+def category_fallback(
+    qa_pairs: List[Dict[str, Any]],
+    model_name: str = "Fallback Analysis",
+    describe: str = "Questions categorized as '{cat}' - basic grouping by category",
+    error: Optional[str] = None,
+) -> ModelAnalysis:
+    """Create basic category-based clusters."""
+    categories: Dict[str, List[str]] = {}
+    for qa in qa_pairs:
+        categories.setdefault(qa["category"], []).append(qa["id"])
+
+    return ModelAnalysis(
+        model_name=model_name,
+        concepts=[
+            {"question_id": qa["id"], "concepts": [qa["category"]]} for qa in qa_pairs
+        ],
+        relationships=[],
+        suggested_clusters=[
+            {
+                "name": cat,
+                "description": describe.format(cat=cat),
+                "question_ids": ids,
+                "themes": [cat],
+            }
+            for cat, ids in categories.items()
+        ],
+        error=error,
+    )
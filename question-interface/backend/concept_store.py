@@ -0,0 +1,237 @@
+"""
+Persistent concept graph built up from incremental analyses.
+
+For each model configuration the store keeps the concepts extracted per
+question (with a hash of the question and answer text they came from), the
+relationships between questions and the suggested clusters. Analyses of
+new or changed questions are merged in with apply(): relationships touching
+those questions are replaced and they are moved between clusters, while
+everything else is left as it was.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Set
+
+from llm_cache import reply_settings
+
+DEFAULT_STORE_PATH = os.path.join(os.path.dirname(__file__), "cache", "concepts.db")
+
+
+def pair_hash(qa: Dict[str, Any]) -> str:
+    """Hash of the question and answer text sent to the model."""
+    text = f"{qa['question']}\0{qa['answer']}"
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def model_key(model_config: Dict[str, Any]) -> str:
+    """Key for a model configuration, ignoring its display name, pool and context."""
+    material = json.dumps(reply_settings(model_config), sort_keys=True)
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()[:16]
+
+
+def relationship_key(rel: Dict[str, Any]) -> tuple:
+    pair = sorted([str(rel.get("question1_id")), str(rel.get("question2_id"))])
+    return pair[0], pair[1], str(rel.get("relationship"))
+
+
+class ConceptGraph(NamedTuple):
+    hashes: Dict[str, str]  # question id -> pair_hash at extraction time
+    concepts: Dict[str, List[str]]
+    relationships: List[Dict[str, Any]]
+    clusters: List[Dict[str, Any]]
+
+    def neighbors(self, ids: Iterable[str]) -> Set[str]:
+        """Questions directly related to any of `ids`, excluding `ids`."""
+        ids = set(ids)
+        found = set()
+        for rel in self.relationships:
+            q1, q2 = str(rel.get("question1_id")), str(rel.get("question2_id"))
+            if q1 in ids:
+                found.add(q2)
+            if q2 in ids:
+                found.add(q1)
+        return found - ids
+
+    def restrict(self, ids: Iterable[str]) -> "ConceptGraph":
+        """The part of the graph about the given questions."""
+        ids = set(ids)
+        clusters = []
+        for cluster in self.clusters:
+            members = [qid for qid in cluster.get("question_ids", []) if qid in ids]
+            if members:
+                clusters.append({**cluster, "question_ids": members})
+        return ConceptGraph(
+            hashes={k: v for k, v in self.hashes.items() if k in ids},
+            concepts={k: v for k, v in self.concepts.items() if k in ids},
+            relationships=[
+                rel
+                for rel in self.relationships
+                if str(rel.get("question1_id")) in ids
+                and str(rel.get("question2_id")) in ids
+            ],
+            clusters=clusters,
+        )
+
+
+class ConceptStore:
+    """SQLite-backed concept graphs, one per model configuration."""
+
+    _SCHEMA = [
+        "CREATE TABLE IF NOT EXISTS extractions ("
+        "model TEXT, question_id TEXT, content_hash TEXT, concepts TEXT, "
+        "updated_at REAL, PRIMARY KEY (model, question_id))",
+        "CREATE TABLE IF NOT EXISTS relationships ("
+        "model TEXT, question1_id TEXT, question2_id TEXT, relationship TEXT, "
+        "body TEXT, PRIMARY KEY (model, question1_id, question2_id, relationship))",
+        "CREATE TABLE IF NOT EXISTS clusters ("
+        "model TEXT, name TEXT, body TEXT, PRIMARY KEY (model, name))",
+    ]
+
+    def __init__(self, path: str = DEFAULT_STORE_PATH):
+        self.path = path
+        self._local = threading.local()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = sqlite3.connect(self.path)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA busy_timeout=5000")
+            with conn:
+                for statement in self._SCHEMA:
+                    conn.execute(statement)
+            self._local.conn = conn
+        return conn
+
+    def load(self, model: str) -> ConceptGraph:
+        conn = self._connect()
+        hashes, concepts = {}, {}
+        for qid, content_hash, values in conn.execute(
+            "SELECT question_id, content_hash, concepts FROM extractions "
+            "WHERE model = ? ORDER BY rowid",
+            (model,),
+        ):
+            hashes[qid] = content_hash
+            concepts[qid] = json.loads(values)
+        relationships = [
+            json.loads(body)
+            for (body,) in conn.execute(
+                "SELECT body FROM relationships WHERE model = ? ORDER BY rowid",
+                (model,),
+            )
+        ]
+        clusters = [
+            json.loads(body)
+            for (body,) in conn.execute(
+                "SELECT body FROM clusters WHERE model = ? ORDER BY rowid", (model,)
+            )
+        ]
+        return ConceptGraph(hashes, concepts, relationships, clusters)
+
+    def apply(
+        self,
+        model: str,
+        hashes: Dict[str, str],
+        concepts: List[Dict[str, Any]],
+        relationships: List[Dict[str, Any]],
+        clusters: List[Dict[str, Any]],
+    ) -> Set[str]:
+        """Merge a fresh analysis of some questions into the stored graph.
+
+        `hashes` maps each analysed question id to its pair_hash. Only the
+        questions the analysis returned concepts for are updated (the rest
+        are retried next time); their old relationships and cluster
+        memberships are replaced. Returns the updated ids.
+        """
+        extracted = {
+            str(entry.get("question_id")): list(entry.get("concepts", []))
+            for entry in concepts
+        }
+        updated = {qid for qid in hashes if qid in extracted}
+        if not updated:
+            return updated
+
+        now = time.time()
+        conn = self._connect()
+        with conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO extractions "
+                "(model, question_id, content_hash, concepts, updated_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                [
+                    (model, qid, hashes[qid], json.dumps(extracted[qid]), now)
+                    for qid in updated
+                ],
+            )
+
+            for qid in updated:
+                conn.execute(
+                    "DELETE FROM relationships WHERE model = ? "
+                    "AND (question1_id = ? OR question2_id = ?)",
+                    (model, qid, qid),
+                )
+            rows = []
+            for rel in relationships:
+                key = relationship_key(rel)
+                if key[0] in updated or key[1] in updated:
+                    rows.append((model, *key, json.dumps(rel)))
+            conn.executemany(
+                "INSERT OR REPLACE INTO relationships "
+                "(model, question1_id, question2_id, relationship, body) "
+                "VALUES (?, ?, ?, ?, ?)",
+                rows,
+            )
+
+            merged: Dict[str, Dict[str, Any]] = {}
+            for (body,) in conn.execute(
+                "SELECT body FROM clusters WHERE model = ? ORDER BY rowid", (model,)
+            ):
+                cluster = json.loads(body)
+                cluster["question_ids"] = [
+                    qid for qid in cluster.get("question_ids", []) if qid not in updated
+                ]
+                merged[str(cluster.get("name", "")).strip().lower()] = cluster
+            for cluster in clusters:
+                members = [
+                    str(qid)
+                    for qid in cluster.get("question_ids", [])
+                    if str(qid) in updated
+                ]
+                if not members:
+                    continue
+                key = str(cluster.get("name", "")).strip().lower()
+                existing = merged.get(key)
+                if existing is None:
+                    merged[key] = {**cluster, "question_ids": members}
+                    continue
+                existing["question_ids"].extend(
+                    qid for qid in members if qid not in existing["question_ids"]
+                )
+                for theme in cluster.get("themes", []):
+                    if theme not in existing.setdefault("themes", []):
+                        existing["themes"].append(theme)
+            conn.execute("DELETE FROM clusters WHERE model = ?", (model,))
+            conn.executemany(
+                "INSERT INTO clusters (model, name, body) VALUES (?, ?, ?)",
+                [
+                    (model, key, json.dumps(cluster))
+                    for key, cluster in merged.items()
+                    if cluster["question_ids"]
+                ],
+            )
+        return updated
+
+    def clear(self, model: Optional[str] = None) -> None:
+        conn = self._connect()
+        with conn:
+            for table in ("extractions", "relationships", "clusters"):
+                if model is None:
+                    conn.execute(f"DELETE FROM {table}")
+                else:
+                    conn.execute(f"DELETE FROM {table} WHERE model = ?", (model,))
@@ -0,0 +1,78 @@
+"""
+Conditional GET support (ETag / If-None-Match, Last-Modified / If-Modified-Since).
+
+Endpoints compute a strong ETag from the data version before doing any
+serialization work and call ``check_conditional``. When the client already
+has that representation, NotModified is raised and turned into an empty 304
+by the handler registered in main.py.
+"""
+
+import hashlib
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Optional
+
+from fastapi import Request, Response
+
+
+class NotModified(Exception):
+    """Raised by endpoints when the client's cached copy is still current."""
+
+    def __init__(self, headers: dict):
+        self.headers = headers
+
+
+def make_etag(*parts) -> str:
+    """Strong ETag from the given version parts."""
+    digest = hashlib.sha256("\x1f".join(str(p) for p in parts).encode("utf-8"))
+    return f'"{digest.hexdigest()[:32]}"'
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    if header.strip() == "*":
+        return True
+    candidates = (c.strip() for c in header.split(","))
+    # Weak comparison is fine for GET/HEAD revalidation
+    return any(c.removeprefix("W/") == etag for c in candidates)
+
+
+def _not_modified_since(header: str, last_modified: float) -> bool:
+    try:
+        since = parsedate_to_datetime(header).timestamp()
+    except (TypeError, ValueError):
+        return False
+    # HTTP dates have one-second resolution
+    return int(last_modified) <= since
+
+
+def not_modified_response(exc: NotModified) -> Response:
+    return Response(status_code=304, headers=exc.headers)
+
+
+def check_conditional(
+    request: Request,
+    response: Response,
+    *version_parts,
+    last_modified: Optional[float] = None,
+) -> str:
+    """Set ETag/Last-Modified on the response or raise NotModified.
+
+    The ETag covers the request path and query string, so each variant of an
+    endpoint (filters, include=answers, ...) revalidates independently.
+    """
+    etag = make_etag(request.url.path, request.url.query, *version_parts)
+    headers = {"ETag": etag}
+    if last_modified is not None:
+        headers["Last-Modified"] = formatdate(last_modified, usegmt=True)
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        if _etag_matches(if_none_match, etag):
+            raise NotModified(headers)
+    elif last_modified is not None:
+        # If-Modified-Since is only consulted without If-None-Match (RFC 9110)
+        if_modified_since = request.headers.get("if-modified-since")
+        if if_modified_since and _not_modified_since(if_modified_since, last_modified):
+            raise NotModified(headers)
+
+    response.headers.update(headers)
+    return etag
@@ -0,0 +1,450 @@
+"""
+In-process background jobs for long-running analyses.
+
+Submitted jobs run as asyncio tasks on the server's event loop, at most
+JOB_CONCURRENCY at a time; the rest wait in submission order. Each job keeps
+a list of progress events that clients can poll or follow as Server-Sent
+Events. Jobs, their events and results are persisted in SQLite, so a client
+reconnecting later (or after a restart) gets the stored result, and
+resubmitting an identical payload reuses the existing job instead of
+recomputing it, unless its result was judged not reusable (a degraded
+result, say).
+
+The payload is written once on submission, each event is appended as its own
+row and the result is written once on completion. Store reads and writes run
+in order on a single worker thread, off the event loop.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+
+DEFAULT_JOBS_PATH = os.path.join(os.path.dirname(__file__), "cache", "jobs.db")
+JOB_CONCURRENCY = int(os.environ.get("JOB_CONCURRENCY", "1"))
+# Idle SSE streams send a comment this often to keep proxies from closing them
+KEEPALIVE_SECONDS = 15.0
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+FINISHED = (DONE, FAILED)
+
+Emit = Callable[[Dict[str, Any]], None]
+Runner = Callable[[Dict[str, Any], Emit], Awaitable[Dict[str, Any]]]
+Reusable = Callable[[Dict[str, Any]], bool]
+
+
+def job_key(payload: Dict[str, Any]) -> str:
+    """Identity of a job's input, used to reuse identical submissions."""
+    material = json.dumps(payload, sort_keys=True, default=str)
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+class Job:
+    def __init__(
+        self,
+        id: str,
+        key: str,
+        payload: Dict[str, Any],
+        status: str = QUEUED,
+        events: Optional[List[Dict[str, Any]]] = None,
+        result: Optional[Dict[str, Any]] = None,
+        error: Optional[str] = None,
+        created_at: Optional[float] = None,
+        updated_at: Optional[float] = None,
+    ):
+        self.id = id
+        self.key = key
+        self.payload = payload
+        self.status = status
+        self.events = events or []
+        self.result = result
+        self.error = error
+        self.created_at = created_at or time.time()
+        self.updated_at = updated_at or self.created_at
+        self._waiters: List[asyncio.Event] = []
+
+    @property
+    def finished(self) -> bool:
+        return self.status in FINISHED
+
+    def emit(self, event: Dict[str, Any]) -> None:
+        self.events.append(event)
+        self.updated_at = time.time()
+        for waiter in self._waiters:
+            waiter.set()
+        self._waiters.clear()
+
+    async def wait(self, timeout: float) -> bool:
+        """Wait for the next event; False if none arrived within timeout."""
+        waiter = asyncio.Event()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(waiter.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    def progress(self) -> Dict[str, Dict[str, Any]]:
+        """Latest batch counts and status per model."""
+        models: Dict[str, Dict[str, Any]] = {}
+        for event in self.events:
+            if event.get("type") == "batch":
+                state = models.setdefault(event["model"], {"status": RUNNING})
+                state["batches_done"] = event["done"]
+                state["batches"] = event["total"]
+            elif event.get("type") == "model":
+                state = models.setdefault(event["model"], {})
+                state["status"] = event["status"]
+                if event.get("error"):
+                    state["error"] = event["error"]
+        return models
+
+    def to_dict(self, include_result: bool = True) -> Dict[str, Any]:
+        data = {
+            "id": self.id,
+            "status": self.status,
+            "created_at": self.created_at,
+            "updated_at": self.updated_at,
+            "progress": self.progress(),
+            "error": self.error,
+        }
+        if include_result:
+            data["result"] = self.result
+        return data
+
+
+class JobStore:
+    """Persists jobs in SQLite, with their events in a separate table."""
+
+    _SCHEMA = [
+        "CREATE TABLE IF NOT EXISTS jobs ("
+        "id TEXT PRIMARY KEY, key TEXT, status TEXT, created_at REAL, "
+        "updated_at REAL, payload TEXT, result TEXT, error TEXT, "
+        "reusable INTEGER NOT NULL DEFAULT 0)",
+        "CREATE INDEX IF NOT EXISTS idx_jobs_key ON jobs(key, status, reusable)",
+        "CREATE TABLE IF NOT EXISTS job_events ("
+        "job_id TEXT, seq INTEGER, event TEXT, PRIMARY KEY (job_id, seq))",
+    ]
+    _COLUMNS = "id, key, status, created_at, updated_at, payload, result, error"
+
+    def __init__(self, path: str = DEFAULT_JOBS_PATH):
+        self.path = path
+        self._local = threading.local()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = sqlite3.connect(self.path)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA busy_timeout=5000")
+            with conn:
+                columns = [row[1] for row in conn.execute("PRAGMA table_info(jobs)")]
+                if "events" in columns:
+                    # Older layout with events inlined in the job row
+                    conn.execute("DROP TABLE jobs")
+                for statement in self._SCHEMA:
+                    conn.execute(statement)
+            self._local.conn = conn
+        return conn
+
+    def insert(self, job: Job) -> None:
+        """Write a new job with its payload and the events it has so far."""
+        conn = self._connect()
+        with conn:
+            conn.execute(
+                f"INSERT OR REPLACE INTO jobs ({self._COLUMNS}) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    job.id,
+                    job.key,
+                    job.status,
+                    job.created_at,
+                    job.updated_at,
+                    json.dumps(job.payload),
+                    json.dumps(job.result) if job.result is not None else None,
+                    job.error,
+                ),
+            )
+            conn.executemany(
+                "INSERT OR REPLACE INTO job_events (job_id, seq, event) "
+                "VALUES (?, ?, ?)",
+                [(job.id, seq, json.dumps(e)) for seq, e in enumerate(job.events)],
+            )
+
+    def append_event(
+        self,
+        job_id: str,
+        seq: int,
+        event: Dict[str, Any],
+        status: str,
+        updated_at: float,
+        error: Optional[str] = None,
+    ) -> None:
+        conn = self._connect()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO job_events (job_id, seq, event) "
+                "VALUES (?, ?, ?)",
+                (job_id, seq, json.dumps(event)),
+            )
+            conn.execute(
+                "UPDATE jobs SET status = ?, updated_at = ?, error = ? WHERE id = ?",
+                (status, updated_at, error, job_id),
+            )
+
+    def finish(
+        self,
+        job: Job,
+        event: Dict[str, Any],
+        status: str,
+        error: Optional[str],
+        reusable: bool,
+    ) -> None:
+        """Write a job's final status event and result in one transaction.
+
+        Only reusable results are returned by find_done().
+        """
+        conn = self._connect()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO job_events (job_id, seq, event) "
+                "VALUES (?, ?, ?)",
+                (job.id, len(job.events), json.dumps(event)),
+            )
+            conn.execute(
+                "UPDATE jobs SET status = ?, updated_at = ?, result = ?, error = ?, "
+                "reusable = ? WHERE id = ?",
+                (
+                    status,
+                    time.time(),
+                    json.dumps(job.result) if job.result is not None else None,
+                    error,
+                    int(reusable),
+                    job.id,
+                ),
+            )
+
+    def _row_to_job(self, conn: sqlite3.Connection, row: Tuple) -> Job:
+        id, key, status, created_at, updated_at, payload, result, error = row
+        events = [
+            json.loads(event)
+            for (event,) in conn.execute(
+                "SELECT event FROM job_events WHERE job_id = ? ORDER BY seq", (id,)
+            )
+        ]
+        return Job(
+            id,
+            key,
+            json.loads(payload),
+            status,
+            events,
+            json.loads(result) if result is not None else None,
+            error,
+            created_at,
+            updated_at,
+        )
+
+    def load(self, job_id: str) -> Optional[Job]:
+        conn = self._connect()
+        row = conn.execute(
+            f"SELECT {self._COLUMNS} FROM jobs WHERE id = ?", (job_id,)
+        ).fetchone()
+        return self._row_to_job(conn, row) if row is not None else None
+
+    def find_done(self, key: str) -> Optional[Job]:
+        """Most recent successful, reusable job for the same input."""
+        conn = self._connect()
+        row = conn.execute(
+            f"SELECT {self._COLUMNS} FROM jobs "
+            "WHERE key = ? AND status = ? AND reusable = 1 "
+            "ORDER BY updated_at DESC LIMIT 1",
+            (key, DONE),
+        ).fetchone()
+        return self._row_to_job(conn, row) if row is not None else None
+
+
+class JobQueue:
+    """Runs jobs in the background with bounded concurrency."""
+
+    def __init__(
+        self,
+        runner: Runner,
+        store: JobStore,
+        concurrency: int = JOB_CONCURRENCY,
+        reusable: Optional[Reusable] = None,
+    ):
+        self.runner = runner
+        self.store = store
+        self.concurrency = max(1, concurrency)
+        # Whether a finished job's result may be served to later submissions
+        self.reusable = reusable or (lambda result: True)
+        self._active: Dict[str, Job] = {}  # queued or running in this process
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        # One store thread keeps writes in submission order, and reads see them
+        self._writer = ThreadPoolExecutor(1, thread_name_prefix="job-store")
+        self._last_write: Optional[asyncio.Future] = None
+
+    def _slots(self) -> asyncio.Semaphore:
+        # Like the HTTP client, asyncio primitives belong to one event loop
+        loop = asyncio.get_running_loop()
+        if self._semaphore is None or self._loop is not loop:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+            self._loop = loop
+        return self._semaphore
+
+    def _write(self, fn: Callable[..., None], *args: Any) -> asyncio.Future:
+        """Run a store write on the writer thread."""
+        future = asyncio.get_running_loop().run_in_executor(self._writer, fn, *args)
+        self._last_write = future
+        return future
+
+    def _read(self, fn: Callable[..., Any], *args: Any) -> asyncio.Future:
+        """Run a store read on the writer thread, after earlier writes."""
+        return asyncio.get_running_loop().run_in_executor(self._writer, fn, *args)
+
+    async def submit(self, payload: Dict[str, Any], reuse: bool = True) -> Job:
+        """Queue a job, or return an existing one for the same payload.
+
+        With reuse, a queued or running job with an identical payload, or the
+        latest successful and reusable one, is returned instead of starting a
+        new job.
+        """
+        key = job_key(payload)
+        if reuse:
+            job = self._find_active(key)
+            if job is not None:
+                return job
+            done = await self._read(self.store.find_done, key)
+            if done is not None:
+                return done
+            # The same payload may have been submitted while we looked
+            job = self._find_active(key)
+            if job is not None:
+                return job
+        job = Job(uuid.uuid4().hex, key, payload)
+        job.emit({"type": "status", "status": QUEUED})
+        self._write(self.store.insert, job)
+        self._active[job.id] = job
+        self._tasks[job.id] = asyncio.ensure_future(self._run(job, self._slots()))
+        return job
+
+    async def _run(self, job: Job, slots: asyncio.Semaphore) -> None:
+        try:
+            async with slots:
+                self._set_status(job, RUNNING)
+
+                def emit(event: Dict[str, Any]) -> None:
+                    self._emit(job, event)
+
+                try:
+                    job.result = await self.runner(job.payload, emit)
+                except asyncio.CancelledError:
+                    await self._finish(job, FAILED, "Cancelled")
+                    raise
+                except Exception as e:
+                    await self._finish(job, FAILED, str(e) or type(e).__name__)
+                else:
+                    await self._finish(job, DONE)
+        finally:
+            self._active.pop(job.id, None)
+            self._tasks.pop(job.id, None)
+
+    def _find_active(self, key: str) -> Optional[Job]:
+        for job in self._active.values():
+            if job.key == key and (not job.finished or self._reusable(job)):
+                return job
+        return None
+
+    def _reusable(self, job: Job) -> bool:
+        return job.status == DONE and self.reusable(job.result)
+
+    def _emit(self, job: Job, event: Dict[str, Any]) -> None:
+        job.emit(event)
+        self._write(
+            self.store.append_event,
+            job.id,
+            len(job.events) - 1,
+            event,
+            job.status,
+            job.updated_at,
+            job.error,
+        )
+
+    def _status_event(self, status: str, error: Optional[str]) -> Dict[str, Any]:
+        event: Dict[str, Any] = {"type": "status", "status": status}
+        if error:
+            event["error"] = error
+        return event
+
+    def _set_status(self, job: Job, status: str, error: Optional[str] = None) -> None:
+        job.status = status
+        job.error = error
+        self._emit(job, self._status_event(status, error))
+
+    async def _finish(self, job: Job, status: str, error: Optional[str] = None) -> None:
+        # The job only shows as finished once its result is on disk
+        event = self._status_event(status, error)
+        reusable = status == DONE and self.reusable(job.result)
+        await asyncio.shield(
+            self._write(self.store.finish, job, event, status, error, reusable)
+        )
+        job.status = status
+        job.error = error
+        job.emit(event)
+
+    async def get(self, job_id: str) -> Optional[Job]:
+        job = self._active.get(job_id)
+        if job is not None:
+            return job
+        job = await self._read(self.store.load, job_id)
+        if job is not None and not job.finished:
+            # Left unfinished by a previous server process
+            job.status = FAILED
+            job.error = "Interrupted by server restart"
+            event = self._status_event(FAILED, job.error)
+            job.emit(event)
+            await self._write(
+                self.store.append_event,
+                job.id,
+                len(job.events) - 1,
+                event,
+                job.status,
+                job.updated_at,
+                job.error,
+            )
+        return job
+
+    async def follow(
+        self, job: Job, after: int = 0, keepalive: float = KEEPALIVE_SECONDS
+    ) -> AsyncIterator[Optional[Tuple[int, Dict[str, Any]]]]:
+        """Yield (index, event) from `after` on until the job finishes.
+
+        Yields None when no event arrived for `keepalive` seconds.
+        """
+        cursor = max(0, after)
+        while True:
+            while cursor < len(job.events):
+                yield cursor, job.events[cursor]
+                cursor += 1
+            if job.finished:
+                return
+            if not await job.wait(keepalive):
+                yield None
+
+    async def close(self) -> None:
+        """Cancel jobs still queued or running (they are marked failed)."""
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        if self._last_write is not None:
+            await asyncio.gather(self._last_write, return_exceptions=True)
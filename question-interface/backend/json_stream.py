@@ -0,0 +1,115 @@
+"""
+Incremental parsing of an LLM's JSON analysis while it is being generated.
+
+The analysis reply is one JSON object with arrays of objects under
+"concepts", "relationships" and "suggested_clusters". ConceptStreamParser
+is fed the reply text chunk by chunk and returns each array element as soon
+as its closing brace arrives, so results can be shown before the model has
+finished. Text around the JSON (such as a markdown code fence) is ignored.
+"""
+
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+SECTIONS = ("concepts", "relationships", "suggested_clusters")
+
+
+class ConceptStreamParser:
+    """Scans streamed text and yields completed elements of the section arrays.
+
+    Only string, escape and bracket state is tracked; each completed element
+    is decoded with json.loads, and elements that fail to decode are skipped.
+    """
+
+    def __init__(self, sections: Tuple[str, ...] = SECTIONS):
+        self.sections = sections
+        self._text: List[str] = []
+        self._pos = 0  # absolute offset of the next character
+        self._in_string = False
+        self._escape = False
+        self._string_start = 0
+        self._last_string: Optional[str] = None
+        self._pending_key: Optional[str] = None
+        # (bracket, key it is the value of, absolute start offset)
+        self._stack: List[Tuple[str, Optional[str], int]] = []
+        self._buffer = ""
+        self._buffer_start = 0  # absolute offset of _buffer[0]
+
+    def feed(self, chunk: str) -> List[Tuple[str, Dict[str, Any]]]:
+        """Consume the next piece of text; return (section, element) pairs."""
+        found: List[Tuple[str, Dict[str, Any]]] = []
+        self._buffer += chunk
+        for ch in chunk:
+            pos = self._pos
+            self._pos += 1
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    self._last_string = self._slice(self._string_start, pos + 1)
+                continue
+            if not self._stack and ch != "{":
+                # Outside the JSON document (prose, code fences)
+                continue
+            if ch == '"':
+                self._in_string = True
+                self._string_start = pos
+            elif ch == ":":
+                self._pending_key = self._decode_key(self._last_string)
+            elif ch == ",":
+                self._pending_key = None
+            elif ch in "{[":
+                key = None
+                if self._stack and self._stack[-1][0] == "{":
+                    key = self._pending_key
+                self._stack.append((ch, key, pos))
+                self._pending_key = None
+            elif ch in "}]":
+                if not self._stack:
+                    continue
+                bracket, _, start = self._stack.pop()
+                if ch == "}" and bracket == "{" and self._is_section_element():
+                    section = self._stack[-1][1]
+                    element = self._decode(self._slice(start, pos + 1))
+                    if isinstance(element, dict):
+                        found.append((section, element))
+        self._trim()
+        return found
+
+    def _is_section_element(self) -> bool:
+        # Directly inside a section array of the top-level object
+        return (
+            len(self._stack) == 2
+            and self._stack[0][0] == "{"
+            and self._stack[1][0] == "["
+            and self._stack[1][1] in self.sections
+        )
+
+    def _slice(self, start: int, end: int) -> str:
+        return self._buffer[start - self._buffer_start : end - self._buffer_start]
+
+    def _trim(self) -> None:
+        # Keep only text that an open element or string may still need
+        keep = self._pos
+        if self._in_string:
+            keep = min(keep, self._string_start)
+        if len(self._stack) > 2:
+            keep = min(keep, self._stack[2][2])
+        if keep > self._buffer_start:
+            self._buffer = self._buffer[keep - self._buffer_start :]
+            self._buffer_start = keep
+
+    @staticmethod
+    def _decode_key(literal: Optional[str]) -> Optional[str]:
+        value = ConceptStreamParser._decode(literal) if literal else None
+        return value if isinstance(value, str) else None
+
+    @staticmethod
+    def _decode(text: str) -> Any:
+        try:
+            return json.loads(text)
+        except json.JSONDecodeError:
+            return None
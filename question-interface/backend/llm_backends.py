@@ -0,0 +1,315 @@
+"""
+Shared HTTP plumbing for calls to the local LLM servers (Ollama, LMStudio).
+
+One pooled keep-alive httpx.AsyncClient is reused across requests instead of
+opening a new client (and TCP connection) per model call.
+
+A model config's "api" selects the wire protocol: "ollama" (the default)
+uses /api/generate, "openai" uses the OpenAI-compatible /v1/chat/completions
+that LMStudio serves. generate() returns the whole reply; stream_generate()
+yields text as it is produced, from Ollama's NDJSON lines or the OpenAI
+Server-Sent Events.
+
+Both accept a CircuitBreaker for the server. After BREAKER_FAILURES
+consecutive failures (connection errors, timeouts, 5xx) the breaker opens
+and calls fail at once with CircuitOpenError; after BREAKER_COOLDOWN one
+trial call is let through (half-open) and its outcome closes or reopens it.
+The breaker also sets generate()'s timeout from the latencies it has seen:
+a multiple of their 95th percentile, within [LLM_MIN_TIMEOUT, LLM_TIMEOUT].
+"""
+
+import asyncio
+import json
+import math
+import os
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, AsyncIterator, Deque, Dict, Iterator, List, Optional, Tuple
+
+import httpx
+
+OLLAMA_BASE_URL = "http://localhost:11434"
+LMSTUDIO_BASE_URL = "http://localhost:1234"  # Default LMStudio port
+
+
+def endpoint_urls(variable: str, default: str) -> List[str]:
+    """Comma-separated server URLs from an environment variable."""
+    urls = [u.strip().rstrip("/") for u in os.environ.get(variable, "").split(",")]
+    return [u for u in urls if u] or [default]
+
+
+# Pools of servers per backend, e.g. OLLAMA_URLS=http://box1:11434,http://box2:11434
+OLLAMA_URLS = endpoint_urls("OLLAMA_URLS", OLLAMA_BASE_URL)
+LMSTUDIO_URLS = endpoint_urls("LMSTUDIO_URLS", LMSTUDIO_BASE_URL)
+
+# Per-request timeout for a generation; connecting to a dead server fails fast
+LLM_TIMEOUT = httpx.Timeout(
+    float(os.environ.get("LLM_TIMEOUT_SECONDS", "60")), connect=5.0
+)
+# Adaptive timeouts never drop below this many seconds
+LLM_MIN_TIMEOUT = float(os.environ.get("LLM_MIN_TIMEOUT_SECONDS", "10"))
+TIMEOUT_FACTOR = 3.0
+LATENCY_WINDOW = 50
+LATENCY_MIN_SAMPLES = 5
+BREAKER_FAILURES = int(os.environ.get("LLM_BREAKER_FAILURES", "3"))
+BREAKER_COOLDOWN = float(os.environ.get("LLM_BREAKER_COOLDOWN_SECONDS", "30"))
+LLM_POOL_LIMITS = httpx.Limits(
+    max_connections=int(os.environ.get("LLM_POOL_SIZE", "20")),
+    max_keepalive_connections=10,
+    keepalive_expiry=30.0,
+)
+
+_client: Optional[httpx.AsyncClient] = None
+_client_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Return the shared client, creating it for the running event loop.
+
+    Connection pools are bound to the loop that created them, so a new client
+    is made if the loop changed (e.g. between test clients).
+    """
+    global _client, _client_loop
+    loop = asyncio.get_running_loop()
+    if _client is None or _client.is_closed or _client_loop is not loop:
+        _client = httpx.AsyncClient(timeout=LLM_TIMEOUT, limits=LLM_POOL_LIMITS)
+        _client_loop = loop
+    return _client
+
+
+async def close_http_client() -> None:
+    global _client, _client_loop
+    if _client is not None:
+        await _client.aclose()
+    _client = None
+    _client_loop = None
+
+
+class LLMError(Exception):
+    """The LLM server answered with an error status."""
+
+    def __init__(self, message: str, status: Optional[int] = None):
+        super().__init__(message)
+        self.status = status
+
+
+class CircuitOpenError(LLMError):
+    """The server failed repeatedly; calls are refused until the cooldown ends."""
+
+
+class CircuitBreaker:
+    """Closed / open / half-open breaker and latency tracker for one server."""
+
+    def __init__(
+        self,
+        name: str = "",
+        failure_threshold: int = BREAKER_FAILURES,
+        cooldown: float = BREAKER_COOLDOWN,
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.state = "closed"
+        self.consecutive_failures = 0
+        self.failures = 0
+        self.successes = 0
+        self.rejected = 0
+        self._opened_at = 0.0
+        self._trial = False
+        self._latencies: Deque[float] = deque(maxlen=LATENCY_WINDOW)
+
+    def is_open(self) -> bool:
+        """Open and still cooling down, i.e. calls would be refused."""
+        return (
+            self.state == "open" and time.monotonic() - self._opened_at < self.cooldown
+        )
+
+    def allow(self) -> bool:
+        if self.state == "open":
+            if self.is_open():
+                return False
+            self.state = "half_open"
+            self._trial = False
+        if self.state == "half_open":
+            # A single trial call at a time
+            if self._trial:
+                return False
+            self._trial = True
+        return True
+
+    def success(self, latency: float) -> None:
+        self._latencies.append(latency)
+        self.successes += 1
+        self.consecutive_failures = 0
+        self.state = "closed"
+        self._trial = False
+
+    def failure(self) -> None:
+        self.failures += 1
+        self.consecutive_failures += 1
+        self._trial = False
+        if (
+            self.state == "half_open"
+            or self.consecutive_failures >= self.failure_threshold
+        ):
+            self.state = "open"
+            self._opened_at = time.monotonic()
+
+    def percentile(self, q: float) -> Optional[float]:
+        if not self._latencies:
+            return None
+        ordered = sorted(self._latencies)
+        return ordered[min(len(ordered) - 1, math.ceil(q * len(ordered)) - 1)]
+
+    def timeout(self) -> float:
+        """Seconds to allow the next call, from the observed p95 latency."""
+        default = LLM_TIMEOUT.read
+        if len(self._latencies) < LATENCY_MIN_SAMPLES:
+            return default
+        adaptive = TIMEOUT_FACTOR * self.percentile(0.95)
+        return min(default, max(LLM_MIN_TIMEOUT, adaptive))
+
+    @contextmanager
+    def guard(self) -> Iterator[None]:
+        """Wrap one call: refuse it if open, then record how it went.
+
+        Errors that don't say anything about the server's health (4xx,
+        cancellation) neither count as failures nor as successes.
+        """
+        if not self.allow():
+            self.rejected += 1
+            raise CircuitOpenError(f"Circuit open for {self.name or 'backend'}")
+        started = time.perf_counter()
+        outcome = None
+        try:
+            yield
+            outcome = True
+        except httpx.TransportError:
+            outcome = False
+            raise
+        except LLMError as e:
+            if e.status is None or e.status >= 500:
+                outcome = False
+            raise
+        finally:
+            if outcome is True:
+                self.success(time.perf_counter() - started)
+            elif outcome is False:
+                self.failure()
+            else:
+                self._trial = False
+
+    def stats(self) -> Dict[str, Any]:
+        p50, p95 = self.percentile(0.5), self.percentile(0.95)
+        return {
+            "state": "open" if self.is_open() else self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "failures": self.failures,
+            "successes": self.successes,
+            "rejected": self.rejected,
+            "p50_ms": round(p50 * 1000, 1) if p50 is not None else None,
+            "p95_ms": round(p95 * 1000, 1) if p95 is not None else None,
+            "timeout_s": round(self.timeout(), 1),
+        }
+
+
+def _request(
+    model_config: Dict[str, str], prompt: str, stream: bool
+) -> Tuple[str, Dict[str, Any]]:
+    if model_config.get("api", "ollama") == "openai":
+        return f"{model_config['url']}/v1/chat/completions", {
+            "model": model_config["model"],
+            "messages": [{"role": "user", "content": prompt}],
+            "stream": stream,
+        }
+    return f"{model_config['url']}/api/generate", {
+        "model": model_config["model"],
+        "prompt": prompt,
+        "stream": stream,
+    }
+
+
+@contextmanager
+def _guarded(breaker: Optional[CircuitBreaker]) -> Iterator[None]:
+    if breaker is None:
+        yield
+    else:
+        with breaker.guard():
+            yield
+
+
+async def generate(
+    client: httpx.AsyncClient,
+    model_config: Dict[str, str],
+    prompt: str,
+    breaker: Optional[CircuitBreaker] = None,
+) -> str:
+    """Run a prompt to completion and return the generated text."""
+    url, payload = _request(model_config, prompt, stream=False)
+    with _guarded(breaker):
+        if breaker is None:
+            response = await client.post(url, json=payload)
+        else:
+            timeout = httpx.Timeout(breaker.timeout(), connect=LLM_TIMEOUT.connect)
+            response = await client.post(url, json=payload, timeout=timeout)
+        if response.status_code != 200:
+            raise LLMError(
+                f"HTTP {response.status_code}: {response.text}", response.status_code
+            )
+    data = response.json()
+    if model_config.get("api", "ollama") == "openai":
+        return data.get("choices", [{}])[0].get("message", {}).get("content", "")
+    return data.get("response", "{}")
+
+
+async def stream_generate(
+    client: httpx.AsyncClient,
+    model_config: Dict[str, str],
+    prompt: str,
+    breaker: Optional[CircuitBreaker] = None,
+) -> AsyncIterator[str]:
+    """Yield the generated text piece by piece as the server streams it.
+
+    With a breaker the call counts as a success once the stream ends.
+    """
+    url, payload = _request(model_config, prompt, stream=True)
+    with _guarded(breaker):
+        async for text in _stream_lines(client, url, payload, model_config):
+            yield text
+
+
+async def _stream_lines(
+    client: httpx.AsyncClient,
+    url: str,
+    payload: Dict[str, Any],
+    model_config: Dict[str, str],
+) -> AsyncIterator[str]:
+    openai = model_config.get("api", "ollama") == "openai"
+    async with client.stream("POST", url, json=payload) as response:
+        if response.status_code != 200:
+            body = (await response.aread()).decode("utf-8", "replace")
+            raise LLMError(f"HTTP {response.status_code}: {body}", response.status_code)
+        async for line in response.aiter_lines():
+            if openai:
+                # SSE: "data: {...}" lines, terminated by "data: [DONE]"
+                if not line.startswith("data:"):
+                    continue
+                data = line[len("data:") :].strip()
+                if data == "[DONE]":
+                    return
+                choice = json.loads(data).get("choices", [{}])[0]
+                text = choice.get("delta", {}).get("content")
+            else:
+                if not line.strip():
+                    continue
+                event = json.loads(line)
+                if event.get("error"):
+                    raise LLMError(event["error"])
+                text = event.get("response")
+                if event.get("done"):
+                    if text:
+                        yield text
+                    return
+            if text:
+                yield text
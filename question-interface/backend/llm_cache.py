@@ -0,0 +1,142 @@
+"""
+Persistent, content-addressed cache of LLM responses.
+
+Entries are keyed by a hash of the model configuration and the rendered
+prompt, stored zlib-compressed in SQLite, and expire after a TTL. When the
+total stored size exceeds the byte budget, the least recently used entries
+are evicted.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Any, Dict, Optional
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.dirname(__file__), "cache", "llm_cache.db")
+DEFAULT_TTL = float(os.environ.get("LLM_CACHE_TTL_SECONDS", 7 * 24 * 3600))
+DEFAULT_MAX_BYTES = int(os.environ.get("LLM_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+
+
+# Model settings that don't change what the model replies
+IGNORED_SETTINGS = ("name", "urls", "context_tokens")
+
+
+def reply_settings(model_config: Dict[str, Any]) -> Dict[str, Any]:
+    """The model settings that determine its replies.
+
+    Endpoints of a pool serve the same model, so for a pooled model its
+    "url" (the first pool member) is ignored too.
+    """
+    ignored = IGNORED_SETTINGS + (("url",) if model_config.get("urls") else ())
+    return {k: v for k, v in model_config.items() if k not in ignored}
+
+
+def cache_key(model_config: Dict[str, Any], prompt: str) -> str:
+    """Key from the model's reply_settings() and the prompt hash."""
+    config = reply_settings(model_config)
+    prompt_hash = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+    material = json.dumps({"config": config, "prompt": prompt_hash}, sort_keys=True)
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+class LLMResponseCache:
+    """SQLite-backed response cache with TTL and size-bound LRU eviction."""
+
+    _SCHEMA = [
+        "CREATE TABLE IF NOT EXISTS responses ("
+        "key TEXT PRIMARY KEY, model TEXT, created_at REAL, accessed_at REAL, "
+        "size INTEGER, body BLOB)",
+        "CREATE INDEX IF NOT EXISTS idx_responses_accessed ON responses(accessed_at)",
+    ]
+
+    def __init__(
+        self,
+        path: str = DEFAULT_CACHE_PATH,
+        ttl: float = DEFAULT_TTL,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+    ):
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = sqlite3.connect(self.path)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA busy_timeout=5000")
+            with conn:
+                for statement in self._SCHEMA:
+                    conn.execute(statement)
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached response, or None if missing or expired."""
+        conn = self._connect()
+        row = conn.execute(
+            "SELECT created_at, body FROM responses WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        created_at, body = row
+        now = time.time()
+        with conn:
+            if now - created_at > self.ttl:
+                conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                return None
+            conn.execute(
+                "UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key)
+            )
+        return zlib.decompress(body).decode("utf-8")
+
+    def put(self, key: str, model: str, response: str) -> None:
+        body = zlib.compress(response.encode("utf-8"))
+        now = time.time()
+        conn = self._connect()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO responses "
+                "(key, model, created_at, accessed_at, size, body) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, model, now, now, len(body), body),
+            )
+            self._evict(conn, now)
+
+    def _evict(self, conn: sqlite3.Connection, now: float) -> None:
+        conn.execute("DELETE FROM responses WHERE created_at < ?", (now - self.ttl,))
+        (total,) = conn.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM responses"
+        ).fetchone()
+        if total <= self.max_bytes:
+            return
+        # Drop least recently used entries until back under budget
+        excess = total - self.max_bytes
+        doomed = []
+        for key, size in conn.execute(
+            "SELECT key, size FROM responses ORDER BY accessed_at"
+        ):
+            doomed.append((key,))
+            excess -= size
+            if excess <= 0:
+                break
+        conn.executemany("DELETE FROM responses WHERE key = ?", doomed)
+
+    def stats(self) -> Dict[str, Any]:
+        count, total = (
+            self._connect()
+            .execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses")
+            .fetchone()
+        )
+        return {"entries": count, "bytes": total, "max_bytes": self.max_bytes}
+
+    def clear(self) -> None:
+        conn = self._connect()
+        with conn:
+            conn.execute("DELETE FROM responses")
@@ -0,0 +1,148 @@
+"""
+Availability of the configured LLM servers, probed in parallel and cached.
+
+BackendRegistry probes every distinct server URL of the model configs at
+once (a cheap model-list request with a short timeout) and remembers the
+result for HEALTH_TTL seconds. A background task re-probes them every
+HEALTH_INTERVAL seconds, so analyses can skip a server known to be down
+without waiting for it to time out. Entries older than the TTL count as
+unknown, and unknown servers are tried as usual.
+
+The registry also holds each server's CircuitBreaker, so a server that keeps
+failing real requests counts as down while its breaker is open, even if it
+still answers probes.
+"""
+
+import asyncio
+import os
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+import httpx
+
+from llm_backends import CircuitBreaker
+
+HEALTH_TTL = float(os.environ.get("LLM_HEALTH_TTL_SECONDS", "15"))
+HEALTH_INTERVAL = float(os.environ.get("LLM_HEALTH_INTERVAL_SECONDS", "5"))
+PROBE_TIMEOUT = httpx.Timeout(float(os.environ.get("LLM_PROBE_TIMEOUT_SECONDS", "2")))
+
+
+def probe_url(model_config: Dict[str, str]) -> str:
+    if model_config.get("api", "ollama") == "openai":
+        return f"{model_config['url']}/v1/models"
+    return f"{model_config['url']}/api/tags"
+
+
+class BackendRegistry:
+    """Last probe result per server URL: up/down, latency and error."""
+
+    def __init__(self, models: List[Dict[str, str]], ttl: float = HEALTH_TTL):
+        self.models = models
+        self.ttl = ttl
+        self._status: Dict[str, Dict[str, Any]] = {}
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def _servers(self) -> Dict[str, Dict[str, str]]:
+        # One probe per server even if several models share it; pools
+        # ("urls") contribute each of their endpoints
+        return {
+            url: {**config, "url": url}
+            for config in self.models
+            for url in config.get("urls") or [config["url"]]
+        }
+
+    async def probe(
+        self, client: httpx.AsyncClient, model_config: Dict[str, str]
+    ) -> Dict[str, Any]:
+        started = time.perf_counter()
+        try:
+            response = await client.get(probe_url(model_config), timeout=PROBE_TIMEOUT)
+            up = response.status_code == 200
+            error = None if up else f"HTTP {response.status_code}"
+        except httpx.HTTPError as e:
+            up, error = False, str(e) or type(e).__name__
+        self.record(model_config["url"], up, error, time.perf_counter() - started)
+        return self._status[model_config["url"]]
+
+    def record(
+        self,
+        url: str,
+        up: bool,
+        error: Optional[str] = None,
+        latency: Optional[float] = None,
+    ) -> None:
+        self._status[url] = {
+            "url": url,
+            "up": up,
+            "error": error,
+            "latency_ms": round(latency * 1000, 1) if latency is not None else None,
+            "checked_at": time.time(),
+            "_checked": time.monotonic(),
+        }
+
+    async def refresh(self, client: httpx.AsyncClient) -> None:
+        """Probe every server concurrently."""
+        await asyncio.gather(
+            *(self.probe(client, config) for config in self._servers().values())
+        )
+
+    def state(self, url: str) -> Optional[bool]:
+        """True (up), False (down) or None (never probed or expired)."""
+        status = self._status.get(url)
+        if status is None or time.monotonic() - status["_checked"] > self.ttl:
+            return None
+        return status["up"]
+
+    def breaker(self, url: str) -> CircuitBreaker:
+        breaker = self._breakers.get(url)
+        if breaker is None:
+            breaker = self._breakers[url] = CircuitBreaker(url)
+        return breaker
+
+    def is_down(self, url: str) -> bool:
+        if url in self._breakers and self._breakers[url].is_open():
+            return True
+        return self.state(url) is False
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        """Public status of every configured server, probed or not."""
+        result = []
+        for url in self._servers():
+            status = {k: v for k, v in self._status.get(url, {}).items() if k[0] != "_"}
+            result.append(
+                {
+                    "url": url,
+                    **status,
+                    "available": self.state(url),
+                    "breaker": self.breaker(url).stats(),
+                }
+            )
+        return result
+
+    def start(
+        self,
+        get_client: Callable[[], httpx.AsyncClient],
+        interval: float = HEALTH_INTERVAL,
+    ) -> None:
+        """Re-probe in the background every `interval` seconds until stop()."""
+
+        async def loop() -> None:
+            while True:
+                try:
+                    await self.refresh(get_client())
+                except Exception:
+                    pass  # a failed round leaves the previous state to expire
+                await asyncio.sleep(interval)
+
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(loop())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
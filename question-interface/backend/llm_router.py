@@ -0,0 +1,320 @@
+"""
+Dispatch of LLM calls across a pool of servers serving the same model.
+
+A model config may list several endpoints under "urls" (its "url" is the
+first of them; neither is part of the model's cache identity). For every call
+ModelRouter picks the endpoint with the fewest requests in flight among
+those not known to be down, waits while every endpoint is at its
+concurrency cap, and on a failure retries the call on another endpoint of
+the pool. Each call goes through the endpoint's circuit breaker, so a
+struggling server is quickly taken out of rotation.
+
+With hedging on, a generate() call that has not returned within the
+primary endpoint's p90 latency is also sent to another endpoint of the pool
+with a free slot; the first reply wins and the other request is cancelled.
+Each hedged call is recorded in hedge_stats().
+"""
+
+import asyncio
+import copy
+import os
+import time
+from collections import deque
+from typing import Any, AsyncIterator, Deque, Dict, List, Optional
+
+import httpx
+
+from llm_backends import LATENCY_MIN_SAMPLES, LLMError, generate, stream_generate
+from llm_health import BackendRegistry
+
+# Requests in flight per endpoint; further calls wait for a free slot
+ENDPOINT_CONCURRENCY = int(os.environ.get("LLM_ENDPOINT_CONCURRENCY", "2"))
+# Hedge slow calls by default (LLM_HEDGING=1); callers can opt in per request
+HEDGE_REQUESTS = os.environ.get("LLM_HEDGING", "0") == "1"
+HEDGE_PERCENTILE = 0.9
+HEDGE_HISTORY = 100
+
+
+def endpoints_of(model_config: Dict[str, Any]) -> List[str]:
+    return list(model_config.get("urls") or [model_config["url"]])
+
+
+class ModelRouter:
+    """Least-outstanding-requests routing with per-endpoint caps and failover."""
+
+    def __init__(
+        self,
+        health: BackendRegistry,
+        per_endpoint: int = ENDPOINT_CONCURRENCY,
+        hedge: bool = HEDGE_REQUESTS,
+    ):
+        self.health = health
+        self.per_endpoint = max(1, per_endpoint)
+        self.hedge = hedge
+        self._outstanding: Dict[str, int] = {}
+        self._served: Dict[str, int] = {}
+        self._failovers: Dict[str, int] = {}
+        # Calls waiting for a slot, queued on every endpoint they could use
+        self._waiters: Dict[str, Deque[asyncio.Future]] = {}
+        self._hedge_counts = {
+            "calls": 0,
+            "hedged": 0,
+            "hedge_won": 0,
+            "no_history": 0,
+            "no_spare": 0,
+        }
+        self._hedges: Deque[Dict[str, Any]] = deque(maxlen=HEDGE_HISTORY)
+
+    def with_hedging(self, enabled: bool = True) -> "ModelRouter":
+        """The same router (shared slots and counters) with hedging on or off."""
+        router = copy.copy(self)
+        router.hedge = enabled
+        return router
+
+    def capacity(self, model_config: Dict[str, Any]) -> int:
+        """Calls the pool can run at once."""
+        return self.per_endpoint * len(endpoints_of(model_config))
+
+    def is_down(self, model_config: Dict[str, Any]) -> bool:
+        """True when every endpoint of the model is known to be down."""
+        return all(self.health.is_down(url) for url in endpoints_of(model_config))
+
+    def _pick(self, model_config: Dict[str, Any], tried: List[str]) -> Optional[str]:
+        """Least busy free endpoint, "" if all are busy, None if none is left."""
+        candidates = [
+            url
+            for url in endpoints_of(model_config)
+            if url not in tried and not self.health.is_down(url)
+        ]
+        if not candidates:
+            return None
+        free = [
+            url
+            for url in candidates
+            if self._outstanding.get(url, 0) < self.per_endpoint
+        ]
+        if not free:
+            return ""
+        # min() keeps the configured order among equally loaded endpoints
+        return min(free, key=lambda url: self._outstanding.get(url, 0))
+
+    async def _acquire(
+        self, model_config: Dict[str, Any], tried: List[str]
+    ) -> Optional[str]:
+        while True:
+            url = self._pick(model_config, tried)
+            if url is None:
+                return None
+            if url:
+                self._outstanding[url] = self._outstanding.get(url, 0) + 1
+                return url
+            # Only a release on one of our own endpoints wakes us; the
+            # future resolves to the freed endpoint
+            waiter = asyncio.get_running_loop().create_future()
+            joined = [url for url in endpoints_of(model_config) if url not in tried]
+            for candidate in joined:
+                self._waiters.setdefault(candidate, deque()).append(waiter)
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                if waiter.done() and not waiter.cancelled():
+                    self._wake(waiter.result())  # pass the slot on
+                raise
+            finally:
+                # Woken, cancelled or timed out: leave every queue we joined
+                for candidate in joined:
+                    waiters = self._waiters.get(candidate)
+                    if waiters is not None and waiter in waiters:
+                        waiters.remove(waiter)
+                    if not waiters:
+                        self._waiters.pop(candidate, None)
+
+    def _try_acquire(
+        self, model_config: Dict[str, Any], tried: List[str]
+    ) -> Optional[str]:
+        url = self._pick(model_config, tried)
+        if not url:
+            return None
+        self._outstanding[url] = self._outstanding.get(url, 0) + 1
+        return url
+
+    def _wake(self, url: str) -> None:
+        # Futures already woken through another endpoint are skipped
+        waiters = self._waiters.get(url)
+        while waiters:
+            waiter = waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(url)
+                return
+
+    def _release(self, url: str) -> None:
+        self._outstanding[url] -= 1
+        self._served[url] = self._served.get(url, 0) + 1
+        self._wake(url)
+
+    def _no_endpoint(self, model_config: Dict[str, Any]) -> LLMError:
+        return LLMError(f"No available endpoint for {model_config['name']}")
+
+    async def generate(
+        self, client: httpx.AsyncClient, model_config: Dict[str, Any], prompt: str
+    ) -> str:
+        """generate() on the least busy endpoint, failing over on errors."""
+        tried: List[str] = []
+        error: Optional[Exception] = None
+        while True:
+            url = await self._acquire(model_config, tried)
+            if url is None:
+                raise error or self._no_endpoint(model_config)
+            if tried:
+                self._failovers[url] = self._failovers.get(url, 0) + 1
+            tried.append(url)
+            try:
+                if self.hedge:
+                    return await self._hedged(client, model_config, prompt, url, tried)
+                return await self._call(client, model_config, prompt, url)
+            except (LLMError, httpx.HTTPError) as e:
+                error = e
+            finally:
+                self._release(url)
+
+    async def _call(
+        self,
+        client: httpx.AsyncClient,
+        model_config: Dict[str, Any],
+        prompt: str,
+        url: str,
+    ) -> str:
+        return await generate(
+            client, {**model_config, "url": url}, prompt, self.health.breaker(url)
+        )
+
+    def _hedge_delay(self, url: str) -> Optional[float]:
+        breaker = self.health.breaker(url)
+        if breaker.successes < LATENCY_MIN_SAMPLES:
+            return None
+        return breaker.percentile(HEDGE_PERCENTILE)
+
+    async def _hedged(
+        self,
+        client: httpx.AsyncClient,
+        model_config: Dict[str, Any],
+        prompt: str,
+        url: str,
+        tried: List[str],
+    ) -> str:
+        """Call `url`, adding a second endpoint once the p90 latency has passed.
+
+        The second endpoint is only used if it has a free slot right away.
+        If both requests fail, the last error is raised for failover.
+        """
+        started = time.perf_counter()
+        delay = self._hedge_delay(url)
+        record: Dict[str, Any] = {
+            "model": model_config["name"],
+            "primary": url,
+            "hedge": None,
+            "delay_ms": round(delay * 1000, 1) if delay is not None else None,
+            "winner": None,
+            "outcome": "no_history" if delay is None else "primary",
+        }
+        tasks = [asyncio.ensure_future(self._call(client, model_config, prompt, url))]
+        second = None
+        try:
+            if delay is not None:
+                done, _ = await asyncio.wait(tasks, timeout=delay)
+                if not done:
+                    second = self._try_acquire(model_config, tried)
+                    if second is None:
+                        record["outcome"] = "no_spare"
+                    else:
+                        tried.append(second)
+                        record["hedge"] = second
+                        record["outcome"] = "hedged"
+                        tasks.append(
+                            asyncio.ensure_future(
+                                self._call(client, model_config, prompt, second)
+                            )
+                        )
+            pending = set(tasks)
+            error: Optional[BaseException] = None
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    if task.exception() is None:
+                        record["winner"] = url if task is tasks[0] else second
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            # The loser (or everything, if we were cancelled) stops here
+            for task in tasks:
+                task.cancel()
+            if second is not None:
+                self._release(second)
+            record["latency_ms"] = round((time.perf_counter() - started) * 1000, 1)
+            self._record_hedge(record)
+
+    def _record_hedge(self, record: Dict[str, Any]) -> None:
+        counts = self._hedge_counts
+        counts["calls"] += 1
+        if record["outcome"] in ("no_history", "no_spare"):
+            counts[record["outcome"]] += 1
+        elif record["outcome"] == "hedged":
+            counts["hedged"] += 1
+            if record["winner"] == record["hedge"]:
+                counts["hedge_won"] += 1
+        self._hedges.append(record)
+
+    def hedge_stats(self) -> Dict[str, Any]:
+        """Counters over all hedging-mode calls and the most recent calls.
+
+        Each call records its primary and hedge endpoints, the hedge delay
+        (p90 of the primary), which endpoint answered and the latency.
+        """
+        return {**self._hedge_counts, "recent": list(self._hedges)}
+
+    async def stream(
+        self, client: httpx.AsyncClient, model_config: Dict[str, Any], prompt: str
+    ) -> AsyncIterator[str]:
+        """stream_generate() with failover until the first text arrives."""
+        tried: List[str] = []
+        error: Optional[Exception] = None
+        while True:
+            url = await self._acquire(model_config, tried)
+            if url is None:
+                raise error or self._no_endpoint(model_config)
+            if tried:
+                self._failovers[url] = self._failovers.get(url, 0) + 1
+            tried.append(url)
+            started = False
+            try:
+                async for text in stream_generate(
+                    client,
+                    {**model_config, "url": url},
+                    prompt,
+                    self.health.breaker(url),
+                ):
+                    started = True
+                    yield text
+                return
+            except (LLMError, httpx.HTTPError) as e:
+                if started:
+                    raise
+                error = e
+            finally:
+                self._release(url)
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        """The registry's status per server plus its routing counters."""
+        return [
+            {
+                **status,
+                "outstanding": self._outstanding.get(status["url"], 0),
+                "served": self._served.get(status["url"], 0),
+                "failovers": self._failovers.get(status["url"], 0),
+                "max_concurrency": self.per_endpoint,
+            }
+            for status in self.health.snapshot()
+        ]
@@ -0,0 +1,263 @@
+"""
+Concept discovery without an LLM, using TF-IDF vectors and NumPy.
+
+Each Q&A pair becomes an L2-normalised TF-IDF vector over unigrams and
+bigrams. Relationships come from cosine similarities (computed block-wise
+as matrix products), clusters from spherical k-means, and clusters are
+named after the heaviest terms of their centroid. The result has the same
+shape as an LLM ModelAnalysis and takes around a second for a few thousand
+pairs (versus minutes for the LLMs), so it serves both as a fast path and as
+the fallback when no LLM is reachable. It is CPU-bound: async callers should
+run it in a worker thread.
+"""
+
+import math
+import os
+from collections import Counter
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+from models import ModelAnalysis
+from search_index import tokenize
+
+LOCAL_MODEL_NAME = "Local TF-IDF"
+
+# Vocabulary size cap; the most widespread terms that pass the df filters win
+MAX_FEATURES = int(os.environ.get("LOCAL_CONCEPTS_MAX_FEATURES", "4096"))
+# Minimum cosine similarity for a relationship, and related pairs kept per item
+SIMILARITY_THRESHOLD = 0.2
+MAX_RELATED = 3
+CONCEPTS_PER_ITEM = 5
+# Rows of the similarity matrix computed at a time, to bound memory
+BLOCK_ROWS = 512
+
+STOPWORDS = frozenset(
+    """a about above after again all also am an and any are as at be because
+    been before being below between both but by can could did do does doing
+    down during each few for from further had has have having he her here
+    hers him his how i if in into is it its itself just like me more most my
+    no nor not now of off on once only or other our out over own same she
+    should so some such than that the their them then there these they this
+    those through to too under until up use used using very was we were what
+    when where which while who whom why will with would you your""".split()
+)
+
+
+def terms_of(text: str) -> List[str]:
+    """Unigrams and bigrams of the non-stopword tokens."""
+    tokens = [t for t in tokenize(text) if t not in STOPWORDS and len(t) > 1]
+    return tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+
+
+def build_vocabulary(
+    docs: List[List[str]], max_features: int = MAX_FEATURES
+) -> Tuple[Dict[str, int], np.ndarray]:
+    """Term -> column index and the idf per column.
+
+    With enough documents, terms found in only one document or in more than
+    half of them carry no grouping signal and are dropped.
+    """
+    n = len(docs)
+    df = Counter(term for doc in docs for term in set(doc))
+    if n >= 10:
+        df = Counter({t: c for t, c in df.items() if 1 < c <= n // 2})
+    # Most widespread first, ties broken alphabetically for determinism
+    kept = sorted(df.items(), key=lambda item: (-item[1], item[0]))[:max_features]
+    vocabulary = {term: i for i, (term, _) in enumerate(kept)}
+    idf = np.array([math.log((1 + n) / (1 + c)) + 1 for _, c in kept], np.float32)
+    return vocabulary, idf
+
+
+def tfidf_matrix(
+    docs: List[List[str]], vocabulary: Dict[str, int], idf: np.ndarray
+) -> np.ndarray:
+    """Row-normalised TF-IDF with sublinear term frequency."""
+    X = np.zeros((len(docs), len(vocabulary)), np.float32)
+    for row, doc in enumerate(docs):
+        for term, count in Counter(doc).items():
+            col = vocabulary.get(term)
+            if col is not None:
+                X[row, col] = 1 + math.log(count)
+    X *= idf
+    norms = np.linalg.norm(X, axis=1, keepdims=True)
+    np.divide(X, norms, out=X, where=norms > 0)
+    return X
+
+
+def top_terms(weights: np.ndarray, terms: np.ndarray, k: int) -> List[str]:
+    k = min(k, int(np.count_nonzero(weights > 0)))
+    if k <= 0:
+        return []
+    top = np.argpartition(-weights, k - 1)[:k]
+    return [str(terms[i]) for i in top[np.argsort(-weights[top])]]
+
+
+def similar_pairs(
+    X: np.ndarray,
+    threshold: float = SIMILARITY_THRESHOLD,
+    per_item: int = MAX_RELATED,
+) -> List[Tuple[int, int, float]]:
+    """Each row's most similar other rows above threshold, as (i, j, sim), i < j."""
+    n = X.shape[0]
+    k = min(per_item, n - 1)
+    if k <= 0:
+        return []
+    found: Dict[Tuple[int, int], float] = {}
+    for start in range(0, n, BLOCK_ROWS):
+        S = X[start : start + BLOCK_ROWS] @ X.T
+        rows = np.arange(S.shape[0])
+        S[rows, rows + start] = -1.0  # ignore self-similarity
+        best = np.argpartition(-S, k - 1, axis=1)[:, :k]
+        for r, cols in enumerate(best):
+            i = start + r
+            for j in cols:
+                sim = float(S[r, j])
+                if sim >= threshold:
+                    found[(min(i, j), max(i, j))] = sim
+    return sorted(
+        ((i, j, sim) for (i, j), sim in found.items()),
+        key=lambda t: (-t[2], t[0], t[1]),
+    )
+
+
+def similar_to(
+    qa_pairs: List[Dict[str, Any]],
+    ids: Set[str],
+    threshold: float = SIMILARITY_THRESHOLD,
+    per_item: int = MAX_RELATED,
+) -> Dict[str, List[str]]:
+    """For each pair in `ids`, its most similar pairs outside `ids`, best first."""
+    targets = [i for i, qa in enumerate(qa_pairs) if qa["id"] in ids]
+    others = [i for i, qa in enumerate(qa_pairs) if qa["id"] not in ids]
+    if not targets or not others:
+        return {}
+    docs = [terms_of(f"{qa['question']}\n{qa.get('answer', '')}") for qa in qa_pairs]
+    X = tfidf_matrix(docs, *build_vocabulary(docs))
+    k = min(per_item, len(others))
+    found: Dict[str, List[str]] = {}
+    for start in range(0, len(targets), BLOCK_ROWS):
+        block = targets[start : start + BLOCK_ROWS]
+        S = X[block] @ X[others].T
+        best = np.argpartition(-S, k - 1, axis=1)[:, :k]
+        for r, cols in enumerate(best):
+            cols = sorted(cols, key=lambda c: (-S[r, c], others[c]))
+            similar = [qa_pairs[others[c]]["id"] for c in cols if S[r, c] >= threshold]
+            if similar:
+                found[qa_pairs[block[r]]["id"]] = similar
+    return found
+
+
+def _kmeans_once(
+    X: np.ndarray, k: int, rng: np.random.Generator, iterations: int
+) -> Tuple[np.ndarray, float]:
+    n = X.shape[0]
+    # k-means++ seeding on cosine distance
+    centroids = np.empty((k, X.shape[1]), np.float32)
+    centroids[0] = X[rng.integers(n)]
+    distance = 1.0 - X @ centroids[0]
+    for c in range(1, k):
+        weights = np.clip(distance, 0, None)
+        total = weights.sum()
+        index = rng.choice(n, p=weights / total) if total > 0 else rng.integers(n)
+        centroids[c] = X[index]
+        distance = np.minimum(distance, 1.0 - X @ centroids[c])
+
+    labels = np.full(n, -1)
+    for _ in range(iterations):
+        similarity = X @ centroids.T
+        new_labels = np.argmax(similarity, axis=1)
+        if np.array_equal(new_labels, labels):
+            break
+        labels = new_labels
+        for c in range(k):
+            members = X[labels == c]
+            if len(members):
+                centroid = members.sum(axis=0)
+                norm = np.linalg.norm(centroid)
+                centroids[c] = centroid / norm if norm > 0 else centroid
+    score = float(np.max(X @ centroids.T, axis=1).sum())
+    return labels, score
+
+
+def spherical_kmeans(
+    X: np.ndarray, k: int, iterations: int = 25, restarts: int = 4, seed: int = 0
+) -> np.ndarray:
+    """Cluster label per row, using cosine similarity to unit centroids.
+
+    The best of several seeded k-means++ runs (by total similarity to the
+    assigned centroids) is kept, so results are stable between calls.
+    """
+    rng = np.random.default_rng(seed)
+    best_labels, best_score = None, -1.0
+    for _ in range(max(1, restarts)):
+        labels, score = _kmeans_once(X, k, rng, iterations)
+        if score > best_score:
+            best_labels, best_score = labels, score
+    return best_labels
+
+
+def default_cluster_count(n: int) -> int:
+    return max(1, min(20, round(math.sqrt(n / 2))))
+
+
+def local_analysis(
+    qa_pairs: List[Dict[str, Any]],
+    n_clusters: Optional[int] = None,
+    model_name: str = LOCAL_MODEL_NAME,
+) -> ModelAnalysis:
+    """Concepts, relationships and clusters for the Q&A pairs, without an LLM."""
+    if not qa_pairs:
+        return ModelAnalysis(
+            model_name=model_name, concepts=[], relationships=[], suggested_clusters=[]
+        )
+    docs = [terms_of(f"{qa['question']}\n{qa.get('answer', '')}") for qa in qa_pairs]
+    vocabulary, idf = build_vocabulary(docs)
+    terms = np.array(sorted(vocabulary, key=vocabulary.get), dtype=object)
+    X = tfidf_matrix(docs, vocabulary, idf)
+    ids = [qa["id"] for qa in qa_pairs]
+
+    concepts = [
+        {"question_id": qid, "concepts": top_terms(X[i], terms, CONCEPTS_PER_ITEM)}
+        for i, qid in enumerate(ids)
+    ]
+
+    relationships = []
+    for i, j, sim in similar_pairs(X):
+        shared = top_terms(np.minimum(X[i], X[j]), terms, 3)
+        relationships.append(
+            {
+                "question1_id": ids[i],
+                "question2_id": ids[j],
+                "relationship": "similar",
+                "strength": round(sim, 3),
+                "reasoning": f"Shared terms: {', '.join(shared)}" if shared else "",
+            }
+        )
+
+    k = min(n_clusters or default_cluster_count(len(ids)), len(ids))
+    labels = spherical_kmeans(X, k)
+    clusters = []
+    for c in range(k):
+        members = np.flatnonzero(labels == c)
+        if not len(members):
+            continue
+        themes = top_terms(X[members].sum(axis=0), terms, 5)
+        name = " / ".join(themes[:2]) if themes else "Other"
+        clusters.append(
+            {
+                "name": name,
+                "description": f"{len(members)} questions about "
+                + (", ".join(themes[:3]) if themes else "miscellaneous topics"),
+                "question_ids": [ids[i] for i in members],
+                "themes": themes,
+            }
+        )
+    clusters.sort(key=lambda cluster: -len(cluster["question_ids"]))
+
+    return ModelAnalysis(
+        model_name=model_name,
+        concepts=concepts,
+        relationships=relationships,
+        suggested_clusters=clusters,
+    )
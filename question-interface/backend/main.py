@@ -1,13 +1,71 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Query, Request, Response
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
-from typing import List, Optional, Dict, Any
-import csv
+from typing import List, Literal, Optional, Dict, Any, Union
+import asyncio
+import base64
+import binascii
+import hashlib
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
 import os
-import httpx
+import sys
+import time
 import json
+import math
+
+from answer_cache import AnswerCache
+from concept_analysis import (
+    MODELS,
+    Progress,
+    batch_budget,
+    build_prompt,
+    category_fallback,
+    expand_duplicates,
+    make_batches,
+    prepare_qa_pairs,
+    run_incremental,
+    stream_models,
+)
+from concept_store import DEFAULT_STORE_PATH, ConceptStore
+from http_cache import NotModified, check_conditional, make_etag, not_modified_response
+from jobs import DEFAULT_JOBS_PATH, JobQueue, JobStore
+from llm_backends import close_http_client, get_http_client
+from llm_cache import DEFAULT_CACHE_PATH, LLMResponseCache
+from llm_health import BackendRegistry
+from llm_router import ModelRouter
+from local_concepts import local_analysis
+from models import (
+    ConceptAnalysisRequest,
+    ConceptAnalysisResponse,
+    JobStatus,
+    ModelAnalysis,
+    Question,
+    QuestionWithAnswer,
+)
+from prompt_builder import dedupe_pairs
+from question_store import QuestionStore, Selection
+from related_index import DEFAULT_INDEX_PATH, RelatedIndex
+from search_index import CorpusIndex
+
+# Storage engines live next to the data so manager.py can share them
+METAPROJECT_DIR = os.path.join(os.path.dirname(__file__), "../../metaproject-life")
+sys.path.insert(0, os.path.abspath(METAPROJECT_DIR))
+from question_storage import open_storage  # noqa: E402
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    llm_health.start(get_http_client)
+    yield
+    # Stop background jobs and probes, then close pooled LLM connections
+    await job_queue.close()
+    await llm_health.stop()
+    await close_http_client()
 
-app = FastAPI(title="Question Tracker API")
+
+app = FastAPI(title="Question Tracker API", lifespan=lifespan)
 
 # Enable CORS for frontend
 app.add_middleware(
@@ -16,365 +74,381 @@ app.add_middleware(
     allow_credentials=False,  # Must be False when using wildcard origins
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "Last-Modified", "X-Next-Cursor", "X-Total-Count"],
 )
 
 
-# Data model for questions (now supporting both notes and tasks)
-class Question(BaseModel):
-    id: str
-    question: str
-    category: str
-    created_at: str
-    status: str
-    notes: Optional[str] = None
-    type: Optional[str] = "note"  # "note" or "task"
-    # Task-specific fields
-    repository: Optional[str] = None
-    priority: Optional[str] = None  # "low", "medium", "high", "urgent"
-    assignee: Optional[str] = None
-    due_date: Optional[str] = None
-    google_sheet_id: Optional[str] = None  # For synced items
-
-
-# Load questions from CSV
-QUESTIONS_FILE = os.path.join(
-    os.path.dirname(__file__), "../../metaproject-life/data/questions.csv"
+# Conditional GETs: endpoints raise NotModified when the client's copy is current
+@app.exception_handler(NotModified)
+def handle_not_modified(request: Request, exc: NotModified):
+    return not_modified_response(exc)
+
+
+# Load questions from CSV (or SQLite with METAPROJECT_STORAGE=sqlite)
+question_store = QuestionStore(open_storage())
+
+# Answer references in the notes column are relative to the data directory
+DATA_DIR = os.path.join(os.path.dirname(__file__), "../../metaproject-life/data")
+answer_cache = AnswerCache(DATA_DIR)
+
+# Answers directory path
+ANSWERS_DIR = os.path.join(DATA_DIR, "answers")
+
+# Full-text index over questions, data/answers and data/notes
+search_index = CorpusIndex(question_store, DATA_DIR)
+
+# Vector index for related-question lookups, persisted between restarts
+related_index = RelatedIndex(
+    question_store,
+    answer_cache,
+    os.environ.get("RELATED_INDEX_PATH", DEFAULT_INDEX_PATH),
 )
 
+# Items are returned with inlined answers when ?include=answers is passed
+QuestionList = List[Union[QuestionWithAnswer, Question]]
+
 
 def load_questions() -> List[Question]:
-    questions = []
+    return list(question_store.all())
+
+
+def parse_include(include: Optional[str]) -> bool:
+    """Validate ?include= and return whether answers should be inlined."""
+    if not include:
+        return False
+    expansions = {part.strip() for part in include.split(",") if part.strip()}
+    unknown = expansions - {"answers"}
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown include value: {', '.join(sorted(unknown))}",
+        )
+    return "answers" in expansions
+
+
+def with_answers(questions: List[Question]) -> List[QuestionWithAnswer]:
+    return [
+        QuestionWithAnswer(**q.model_dump(), answer=answer_cache.for_notes(q.notes))
+        for q in questions
+    ]
+
+
+def parse_fields(fields: Optional[str], include_answers: bool) -> Optional[set]:
+    """Validate ?fields= and return the set of fields to keep (None = all)."""
+    if not fields:
+        return None
+    requested = {part.strip() for part in fields.split(",") if part.strip()}
+    allowed = set(
+        QuestionWithAnswer.model_fields if include_answers else Question.model_fields
+    )
+    unknown = requested - allowed
+    if unknown:
+        raise HTTPException(
+            status_code=400, detail=f"Unknown field: {', '.join(sorted(unknown))}"
+        )
+    return requested
+
+
+def _version_tag(version: str) -> str:
+    return hashlib.sha1(version.encode()).hexdigest()[:12]
+
+
+def encode_cursor(selection: Selection, position: int, last_id: str) -> str:
+    """Opaque cursor: the last row served, by position and id, and the version."""
+    state = {"v": _version_tag(selection.version), "pos": position, "id": last_id}
+    raw = json.dumps(state, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: Optional[str], selection: Selection) -> Optional[int]:
+    """Position to resume after, located by id if the store changed since.
+
+    Raises 410 when the row the cursor points at no longer exists.
+    """
+    if not cursor:
+        return None
     try:
-        with open(QUESTIONS_FILE, "r", encoding="utf-8") as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                # Ensure all keys are strings
-                row = {str(k): v for k, v in row.items()}
-                questions.append(Question(**row))
-    except FileNotFoundError:
-        # Return empty list if file not found
-        pass
-    return questions
+        padded = cursor + "=" * (-len(cursor) % 4)
+        state = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        version, position, last_id = state["v"], state["pos"], state["id"]
+    except (binascii.Error, UnicodeDecodeError, ValueError, TypeError, KeyError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if not (
+        isinstance(version, str)
+        and isinstance(position, int)
+        and isinstance(last_id, str)
+    ):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if version == _version_tag(selection.version):
+        return position
+    position = selection.position_of(last_id)
+    if position is None:
+        raise HTTPException(
+            status_code=410,
+            detail="Cursor refers to a question that no longer exists; "
+            "restart from the first page",
+        )
+    return position
+
+
+def list_response(
+    questions: List[Question],
+    include: Optional[str],
+    request: Request,
+    response: Response,
+    fields: Optional[str] = None,
+):
+    """Conditional list response, optionally with answers inlined and projected."""
+    include_answers = parse_include(include)
+    keep = parse_fields(fields, include_answers)
+    version = [question_store.version]
+    last_modified = question_store.modified_at
+    if include_answers:
+        # Answer contents are part of the representation, so their hashes
+        # are part of the version
+        for q in questions:
+            entry = answer_cache.entry_for_notes(q.notes)
+            if entry is not None:
+                version.append(entry.digest)
+                last_modified = max(last_modified or 0, entry.modified_at)
+    check_conditional(request, response, *version, last_modified=last_modified)
+    items = with_answers(questions) if include_answers else questions
+    if keep is None:
+        return items
+    # Projected items no longer match the response model; returning a
+    # Response bypasses it, so carry over the headers set above
+    return JSONResponse(
+        [item.model_dump(include=keep) for item in items],
+        headers=dict(response.headers),
+    )
 
 
-@app.get("/questions", response_model=List[Question])
-def get_questions():
-    return load_questions()
+@app.get("/questions", response_model=QuestionList)
+def get_questions(
+    request: Request,
+    response: Response,
+    include: Optional[str] = None,
+    fields: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1),
+    cursor: Optional[str] = None,
+    category: Optional[str] = None,
+    status: Optional[str] = None,
+    type: Optional[str] = None,
+    priority: Optional[str] = None,
+    assignee: Optional[str] = None,
+    repository: Optional[str] = None,
+    due_from: Optional[str] = None,
+    due_to: Optional[str] = None,
+):
+    """Get questions, optionally filtered, paginated and projected.
+
+    - include=answers inlines the markdown answers
+    - fields=id,question,... returns only those fields
+    - category/status/type/priority/assignee/repository filter by exact value;
+      due_from/due_to bound due_date (inclusive, ISO dates)
+    - limit/cursor paginate; the next cursor is sent in X-Next-Cursor and the
+      number of matching items in X-Total-Count. A cursor stays valid when
+      the questions are reloaded (it resumes after the last id served) unless
+      that question was removed, which answers 410
+    """
+    criteria = {
+        "category": category,
+        "status": status,
+        "type": type,
+        "priority": priority,
+        "assignee": assignee,
+        "repository": repository,
+    }
+    selection = question_store.select(
+        due_from=due_from,
+        due_to=due_to,
+        **{field: value for field, value in criteria.items() if value is not None},
+    )
+    questions, next_after = selection.page(decode_cursor(cursor, selection), limit)
+    response.headers["X-Total-Count"] = str(len(selection))
+    if next_after is not None:
+        response.headers["X-Next-Cursor"] = encode_cursor(
+            selection, next_after, questions[-1].id
+        )
+    return list_response(questions, include, request, response, fields)
 
 
 @app.get("/questions/{question_id}", response_model=Question)
-def get_question(question_id: str):
-    questions = load_questions()
-    for q in questions:
-        if q.id == question_id:
-            return q
-    raise HTTPException(status_code=404, detail="Question not found")
+def get_question(question_id: str, request: Request, response: Response):
+    question = question_store.get(question_id)
+    if question is None:
+        raise HTTPException(status_code=404, detail="Question not found")
+    check_conditional(
+        request,
+        response,
+        question_store.version,
+        last_modified=question_store.modified_at,
+    )
+    return question
 
 
 @app.get("/categories")
-def get_categories():
-    questions = load_questions()
-    categories = {}
-    for q in questions:
-        categories[q.category] = categories.get(q.category, 0) + 1
-    return categories  # {category: count}
+def get_categories(request: Request, response: Response):
+    check_conditional(
+        request,
+        response,
+        question_store.version,
+        last_modified=question_store.modified_at,
+    )
+    return question_store.counts("category")  # {category: count}
 
 
-# Answers directory path
-ANSWERS_DIR = os.path.join(
-    os.path.dirname(__file__), "../../metaproject-life/data/answers"
-)
+@app.get("/questions/{question_id}/related")
+def get_related_questions(question_id: str, k: int = Query(10, ge=1, le=100)):
+    """The k questions most similar to this one (question, category and answer text).
+
+    Served from an approximate nearest-neighbour index that is updated as
+    questions and answers change, so no LLM call is involved.
+    """
+    started = time.perf_counter()
+    related = related_index.related(question_id, k)
+    if related is None:
+        raise HTTPException(status_code=404, detail="Question not found")
+    results = []
+    for rid, score in related:
+        q = question_store.get(rid)
+        if q is not None:
+            results.append(
+                {
+                    "id": q.id,
+                    "question": q.question,
+                    "category": q.category,
+                    "type": q.type,
+                    "score": round(score, 4),
+                }
+            )
+    return {
+        "id": question_id,
+        "related": results,
+        "took_ms": round((time.perf_counter() - started) * 1000, 3),
+    }
 
 
 @app.get("/questions/{question_id}/answer")
-def get_answer(question_id: str):
-    """Get the markdown answer for a specific question."""
+def get_answer(question_id: str, request: Request, response: Response):
+    """Get the markdown answer for a specific question.
+
+    The ETag is derived from the answer's content hash, so edits elsewhere in
+    questions.csv don't invalidate cached answers.
+    """
     # Find the question to verify it exists
-    questions = load_questions()
-    question = None
-    for q in questions:
-        if q.id == question_id:
-            question = q
-            break
+    question = question_store.get(question_id)
 
     if not question:
         raise HTTPException(status_code=404, detail="Question not found")
 
-    # Check if the question has an answer reference
-    if not question.notes or not question.notes.startswith("answer:"):
+    # Resolve the answer: reference in notes and load the markdown file
+    entry = answer_cache.entry_for_notes(question.notes)
+    if entry is None:
+        check_conditional(request, response, question_store.version, "no-answer")
         return {"has_answer": False, "answer": None}
 
-    # Extract the answer filename from notes
-    answer_filename = question.notes.replace("answer:", "").strip()
-    answer_path = os.path.join(
-        os.path.dirname(__file__), "../../metaproject-life/data", answer_filename
-    )
-
-    # Read the markdown file
-    try:
-        with open(answer_path, "r", encoding="utf-8") as f:
-            answer_content = f.read()
-        return {"has_answer": True, "answer": answer_content}
-    except FileNotFoundError:
-        return {"has_answer": False, "answer": None}
-
-
-# LLM Analysis Models
-class ConceptAnalysisRequest(BaseModel):
-    questions: List[Dict[str, Any]]  # List of {id, question, answer, category}
-
-
-class ModelAnalysis(BaseModel):
-    model_name: str
-    concepts: List[Dict[str, Any]]
-    relationships: List[Dict[str, Any]]
-    suggested_clusters: List[Dict[str, Any]]
-    raw_response: Optional[str] = None
-    error: Optional[str] = None
+    check_conditional(request, response, entry.digest, last_modified=entry.modified_at)
+    return {"has_answer": True, "answer": entry.content}
+
+
+@app.get("/search")
+def search(
+    q: str,
+    limit: int = Query(10, ge=1, le=100),
+    kind: Optional[str] = None,
+):
+    """Full-text search over questions, answers and notes (BM25 ranked).
+
+    The last query term is prefix-matched; a trailing * makes any term a
+    prefix. A prefix matches at most 64 terms (MAX_PREFIX_EXPANSIONS), those
+    occurring in the most documents. kind=question,answer,note restricts the
+    document types. Snippets
+    are HTML-escaped with matches wrapped in <mark>.
+    """
+    started = time.perf_counter()
+    kinds = [k.strip() for k in kind.split(",") if k.strip()] if kind else None
+    hits, total = search_index.search(q, limit, kinds)
+    return {
+        "query": q,
+        "total": total,
+        "results": [hit._asdict() for hit in hits],
+        "took_ms": round((time.perf_counter() - started) * 1000, 3),
+    }
 
 
-class ConceptAnalysisResponse(BaseModel):
-    analyses: List[ModelAnalysis]  # Multiple model analyses
-    fallback_used: bool = False
+# Identical analyses (same model config and prompt) are served from disk
+llm_cache = LLMResponseCache(os.environ.get("LLM_CACHE_PATH", DEFAULT_CACHE_PATH))
+# Per-question extraction results, so only changed pairs are re-analysed
+concept_store = ConceptStore(os.environ.get("CONCEPT_STORE_PATH", DEFAULT_STORE_PATH))
+# Probed in the background so analyses skip servers that are down, and
+# calls are spread over each model's pool of servers
+llm_health = BackendRegistry(MODELS)
+llm_router = ModelRouter(llm_health)
 
 
-OLLAMA_BASE_URL = "http://localhost:11434"
-LMSTUDIO_BASE_URL = "http://localhost:1234"  # Default LMStudio port
+async def fallback_analysis(qa_pairs: List[Dict[str, Any]]) -> ModelAnalysis:
+    """Local TF-IDF analysis, or plain category grouping if that fails."""
+    try:
+        return await asyncio.to_thread(local_analysis, qa_pairs)
+    except Exception as e:
+        return category_fallback(qa_pairs, error=f"Local analysis failed: {e}")
 
 
-@app.post("/analyze/concepts", response_model=ConceptAnalysisResponse)
-async def analyze_concepts(request: ConceptAnalysisRequest):
-    """Analyze questions and answers to discover concepts and relationships using multiple LLMs."""
+async def run_analysis(
+    questions: List[Dict[str, Any]],
+    refresh: bool = False,
+    on_progress: Optional[Progress] = None,
+    engine: str = "llm",
+    hedge: Optional[bool] = None,
+) -> ConceptAnalysisResponse:
     try:
         # Prepare data for LLM analysis
-        qa_pairs = []
-        for q in request.questions:
-            if q.get("answer"):
-                qa_pairs.append(
-                    {
-                        "id": q["id"],
-                        "question": q["question"][:200],  # Truncate for LLM
-                        "answer": q["answer"][:500],  # Truncate for LLM
-                        "category": q["category"],
-                    }
-                )
+        qa_pairs = prepare_qa_pairs(questions)
 
         if not qa_pairs:
             return ConceptAnalysisResponse(analyses=[], fallback_used=True)
 
-        # Define available models
-        models = [
-            {
-                "name": "Ollama (gpt-oss:20b)",
-                "url": OLLAMA_BASE_URL,
-                "model": "gpt-oss:20b",
-            },
-            {"name": "LMStudio", "url": LMSTUDIO_BASE_URL, "model": "local-model"},
-        ]
-
-        analyses = []
-
-        # Create enhanced prompt for better analysis
-        prompt = f"""Analyze these questions and answers to identify key concepts, themes, and relationships.
-Focus on finding meaningful connections between questions, even if they seem unrelated at first glance.
-
-{chr(10).join([f"Q{i+1}: {qa['question']}\\nA{i+1}: {qa['answer'][:300]}..." for i, qa in enumerate(qa_pairs[:10])])}
-
-Please provide a detailed analysis:
-1. Key concepts and themes extracted from each Q&A pair
-2. Semantic relationships between questions (similar, explains, contrasts, builds-upon, etc.)
-3. Suggested concept clusters that group related questions by theme or topic
-
-Format your response as JSON:
-{{
-  "concepts": [
-    {{"question_id": "id", "concepts": ["concept1", "concept2", "theme1"]}}
-  ],
-  "relationships": [
-    {{"question1_id": "id1", "question2_id": "id2", "relationship": "similar/explains/contrasts", "strength": 0.8, "reasoning": "brief explanation"}}
-  ],
-  "suggested_clusters": [
-    {{"name": "cluster_name", "description": "detailed description of what this cluster represents", "question_ids": ["id1", "id2"], "themes": ["theme1", "theme2"]}}
-  ]
-}}"""
-
-        # Try each model
-        for model_config in models:
-            try:
-                async with httpx.AsyncClient(timeout=60.0) as client:
-                    response = await client.post(
-                        f"{model_config['url']}/api/generate",
-                        json={
-                            "model": model_config["model"],
-                            "prompt": prompt,
-                            "stream": False,
-                        },
-                    )
-
-                    if response.status_code == 200:
-                        result = response.json()
-                        llm_response = result.get("response", "{}")
-
-                        # Try to parse JSON response
-                        try:
-                            analysis_data = json.loads(llm_response)
-                            analyses.append(
-                                ModelAnalysis(
-                                    model_name=model_config["name"],
-                                    concepts=analysis_data.get("concepts", []),
-                                    relationships=analysis_data.get(
-                                        "relationships", []
-                                    ),
-                                    suggested_clusters=analysis_data.get(
-                                        "suggested_clusters", []
-                                    ),
-                                    raw_response=llm_response,
-                                )
-                            )
-                        except json.JSONDecodeError:
-                            # Try to extract JSON from markdown
-                            import re
-
-                            json_match = re.search(
-                                r"```(?:json)?\s*\n(.*?)\n```", llm_response, re.DOTALL
-                            )
-                            if json_match:
-                                try:
-                                    analysis_data = json.loads(
-                                        json_match.group(1).strip()
-                                    )
-                                    analyses.append(
-                                        ModelAnalysis(
-                                            model_name=model_config["name"],
-                                            concepts=analysis_data.get("concepts", []),
-                                            relationships=analysis_data.get(
-                                                "relationships", []
-                                            ),
-                                            suggested_clusters=analysis_data.get(
-                                                "suggested_clusters", []
-                                            ),
-                                            raw_response=llm_response,
-                                        )
-                                    )
-                                except json.JSONDecodeError:
-                                    analyses.append(
-                                        ModelAnalysis(
-                                            model_name=model_config["name"],
-                                            concepts=[],
-                                            relationships=[],
-                                            suggested_clusters=[],
-                                            raw_response=llm_response,
-                                            error="JSON parsing failed",
-                                        )
-                                    )
-                            else:
-                                analyses.append(
-                                    ModelAnalysis(
-                                        model_name=model_config["name"],
-                                        concepts=[],
-                                        relationships=[],
-                                        suggested_clusters=[],
-                                        raw_response=llm_response,
-                                        error="No JSON found in response",
-                                    )
-                                )
-                    else:
-                        analyses.append(
-                            ModelAnalysis(
-                                model_name=model_config["name"],
-                                concepts=[],
-                                relationships=[],
-                                suggested_clusters=[],
-                                error=f"HTTP {response.status_code}: {response.text}",
-                            )
-                        )
-
-            except Exception as e:
-                analyses.append(
-                    ModelAnalysis(
-                        model_name=model_config["name"],
-                        concepts=[],
-                        relationships=[],
-                        suggested_clusters=[],
-                        error=str(e),
-                    )
-                )
+        if engine == "local":
+            # CPU-bound (about a second for a few thousand pairs): keep it
+            # off the event loop
+            analysis = await asyncio.to_thread(local_analysis, qa_pairs)
+            return ConceptAnalysisResponse(analyses=[analysis])
+
+        analyses = await run_incremental(
+            get_http_client(),
+            MODELS,
+            qa_pairs,
+            concept_store,
+            cache=llm_cache,
+            refresh=refresh,
+            on_progress=on_progress,
+            router=llm_router if hedge is None else llm_router.with_hedging(hedge),
+        )
 
         # If no analyses succeeded, provide fallback
-        if not analyses or all(
+        fallback_used = not analyses or all(
             not analysis.concepts and not analysis.suggested_clusters
             for analysis in analyses
-        ):
-            # Create basic category-based clusters as fallback
-            categories = {}
-            for qa in qa_pairs:
-                cat = qa["category"]
-                if cat not in categories:
-                    categories[cat] = []
-                categories[cat].append(qa["id"])
-
-            fallback_clusters = [
-                {
-                    "name": cat,
-                    "description": f"Questions categorized as '{cat}' - basic grouping by category",
-                    "question_ids": ids,
-                    "themes": [cat],
-                }
-                for cat, ids in categories.items()
-            ]
-
-            analyses.append(
-                ModelAnalysis(
-                    model_name="Fallback Analysis",
-                    concepts=[
-                        {"question_id": qa["id"], "concepts": [qa["category"]]}
-                        for qa in qa_pairs
-                    ],
-                    relationships=[],
-                    suggested_clusters=fallback_clusters,
-                )
-            )
-
-        return ConceptAnalysisResponse(
-            analyses=analyses,
-            fallback_used=len(analyses) == 1
-            and analyses[0].model_name == "Fallback Analysis",
         )
+        if fallback_used:
+            analyses.append(await fallback_analysis(qa_pairs))
+
+        return ConceptAnalysisResponse(analyses=analyses, fallback_used=fallback_used)
 
     except Exception as e:
         # Ultimate fallback
-        qa_pairs = []
-        for q in request.questions:
-            if q.get("answer"):
-                qa_pairs.append({"id": q["id"], "category": q["category"]})
-
-        categories = {}
-        for qa in qa_pairs:
-            cat = qa["category"]
-            if cat not in categories:
-                categories[cat] = []
-            categories[cat].append(qa["id"])
-
-        fallback_clusters = [
-            {
-                "name": cat,
-                "description": f"Questions in {cat} category",
-                "question_ids": ids,
-                "themes": [cat],
-            }
-            for cat, ids in categories.items()
+        qa_pairs = [
+            {"id": q["id"], "category": q["category"]}
+            for q in questions
+            if q.get("answer")
         ]
-
         return ConceptAnalysisResponse(
             analyses=[
-                ModelAnalysis(
+                category_fallback(
+                    qa_pairs,
                     model_name="Error Fallback",
-                    concepts=[
-                        {"question_id": qa["id"], "concepts": [qa["category"]]}
-                        for qa in qa_pairs
-                    ],
-                    relationships=[],
-                    suggested_clusters=fallback_clusters,
+                    describe="Questions in {cat} category",
                     error=str(e),
                 )
             ],
@@ -382,19 +456,269 @@ Format your response as JSON:
         )
 
 
+@app.get("/llm/backends")
+async def get_llm_backends(refresh: bool = False):
+    """Last known state, circuit breaker and routing counters of each LLM server.
+
+    "available" is true or false while the last probe is recent and null
+    once it has expired. "breaker" has the breaker state (closed, open,
+    half_open), failure/success/rejected counts, latency percentiles and
+    the current adaptive timeout. "outstanding", "served" and "failovers"
+    count the calls routed to the server. refresh=true probes all servers
+    now.
+    """
+    if refresh:
+        await llm_health.refresh(get_http_client())
+    return llm_router.snapshot()
+
+
+@app.get("/llm/hedging")
+def get_llm_hedging():
+    """Hedged-request statistics: totals and the most recent hedging-mode calls.
+
+    "hedged" calls sent a second request after the primary server's p90
+    latency, "hedge_won" of them were answered by the second server.
+    "no_history" calls had too few latency samples to hedge and "no_spare"
+    calls found no other server with a free slot.
+    """
+    return llm_router.hedge_stats()
+
+
+@app.post("/analyze/concepts", response_model=ConceptAnalysisResponse)
+async def analyze_concepts(
+    request: ConceptAnalysisRequest,
+    refresh: bool = False,
+    engine: Literal["llm", "local"] = "llm",
+    hedge: Optional[bool] = None,
+):
+    """Analyze questions and answers to discover concepts and relationships using multiple LLMs.
+
+    Only pairs that are new or changed since the last analysis are sent to
+    the models, in batches processed concurrently; the results are merged
+    into the stored concept graph. The request takes as long as the slowest
+    model, bounded by ANALYSIS_DEADLINE. refresh=true re-analyses every
+    pair and bypasses the response cache. For large inputs prefer
+    POST /jobs/analyze, which does not hold the request open.
+
+    engine=local skips the LLMs and returns the TF-IDF analysis, which is
+    also used as the fallback when no model produces a result.
+
+    hedge=true (or LLM_HEDGING=1) cuts tail latency when a model has a pool
+    of servers: a call slower than its server's p90 is also sent to another
+    server and the first reply is used. See GET /llm/hedging.
+    """
+    return await run_analysis(request.questions, refresh, engine=engine, hedge=hedge)
+
+
+@app.post("/analyze/concepts/stream")
+async def stream_concept_analysis(
+    request: ConceptAnalysisRequest, refresh: bool = False
+):
+    """Stream a fresh analysis from every model as newline-delimited JSON.
+
+    Events are {"type": "delta", "model", "batch", "text"} for generated
+    text, "concept", "relationship" and "cluster" events carrying an "item"
+    as soon as the model closes it, and a final {"type": "done", "model",
+    "analysis"} per model. The stored concept graph is not consulted.
+    Near-duplicate questions are sent once; the final analysis covers them.
+    """
+    qa_pairs, duplicates = dedupe_pairs(prepare_qa_pairs(request.questions))
+    # One set of prompts for all models, so it must fit the smallest context
+    budget = min(batch_budget(config) for config in MODELS)
+    prompts = [build_prompt(batch) for batch in make_batches(qa_pairs, budget)]
+
+    async def lines():
+        if not prompts:
+            return
+        async for event in stream_models(
+            get_http_client(),
+            MODELS,
+            prompts,
+            cache=llm_cache,
+            refresh=refresh,
+            router=llm_router,
+        ):
+            if event["type"] == "done":
+                analysis = ModelAnalysis(**event["analysis"])
+                event["analysis"] = expand_duplicates(analysis, duplicates).model_dump()
+            yield json.dumps(event) + "\n"
+
+    return StreamingResponse(
+        lines(),
+        media_type="application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+async def analysis_job(payload: Dict[str, Any], emit: Progress) -> Dict[str, Any]:
+    response = await run_analysis(
+        payload["questions"],
+        payload["refresh"],
+        emit,
+        payload.get("engine", "llm"),
+        payload.get("hedge"),
+    )
+    return response.model_dump()
+
+
+def complete_analysis(result: Dict[str, Any]) -> bool:
+    """False for degraded results (fallback or model errors), which are redone."""
+    return not result["fallback_used"] and not any(
+        analysis["error"] for analysis in result["analyses"]
+    )
+
+
+# Analyses submitted as jobs run in the background and are kept on disk
+job_queue = JobQueue(
+    analysis_job,
+    JobStore(os.environ.get("JOBS_PATH", DEFAULT_JOBS_PATH)),
+    reusable=complete_analysis,
+)
+
+
+async def get_job_or_404(job_id: str):
+    job = await job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+@app.post("/jobs/analyze", response_model=JobStatus, status_code=202)
+async def submit_analysis_job(
+    request: ConceptAnalysisRequest,
+    refresh: bool = False,
+    engine: Literal["llm", "local"] = "llm",
+    hedge: Optional[bool] = None,
+):
+    """Queue a concept analysis and return its job id immediately.
+
+    Submitting the same questions again returns the pending or finished job
+    rather than starting another one, unless refresh=true. engine and hedge
+    are as for POST /analyze/concepts.
+    """
+    payload = {"questions": request.questions, "refresh": refresh, "engine": engine}
+    if hedge is not None:
+        # Only when given, so jobs submitted without it keep their keys
+        payload["hedge"] = hedge
+    job = await job_queue.submit(payload, reuse=not refresh)
+    return job.to_dict(include_result=False)
+
+
+@app.get("/jobs/{job_id}", response_model=JobStatus)
+async def get_analysis_job(job_id: str):
+    """Job status, per-model progress and, once done, the analysis result."""
+    return (await get_job_or_404(job_id)).to_dict()
+
+
+@app.get("/jobs/{job_id}/events")
+async def stream_job_events(request: Request, job_id: str):
+    """Server-Sent Events with the job's progress, ending when it finishes.
+
+    Every event carries its index as the SSE id, so a reconnecting client
+    sending Last-Event-ID only receives what it missed.
+    """
+    job = await get_job_or_404(job_id)
+    try:
+        after = int(request.headers.get("last-event-id", "-1")) + 1
+    except ValueError:
+        after = 0
+
+    async def events():
+        async for item in job_queue.follow(job, after):
+            if item is None:
+                yield ": keepalive\n\n"
+                continue
+            index, event = item
+            yield f"id: {index}\nevent: {event['type']}\ndata: {json.dumps(event)}\n\n"
+        if job.status == "done":
+            yield f"event: result\ndata: {json.dumps(job.result)}\n\n"
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 # New endpoints for notes/tasks separation
-@app.get("/notes", response_model=List[Question])
-def get_notes():
+@app.get("/notes", response_model=QuestionList)
+def get_notes(request: Request, response: Response, include: Optional[str] = None):
     """Get all items of type 'note'."""
-    questions = load_questions()
-    return [q for q in questions if q.type == "note"]
+    return list_response(question_store.filter(type="note"), include, request, response)
 
 
-@app.get("/tasks", response_model=List[Question])
-def get_tasks():
+@app.get("/tasks", response_model=QuestionList)
+def get_tasks(request: Request, response: Response, include: Optional[str] = None):
     """Get all items of type 'task'."""
-    questions = load_questions()
-    return [q for q in questions if q.type == "task"]
+    return list_response(question_store.filter(type="task"), include, request, response)
+
+
+def parse_timestamp(value: str) -> float:
+    """Parse an ISO 8601 timestamp (trailing Z allowed) or epoch seconds.
+
+    Raises ValueError for anything else, including nan, inf and dates whose
+    epoch seconds overflow.
+    """
+    try:
+        seconds = float(value)
+    except ValueError:
+        pass
+    else:
+        if not math.isfinite(seconds):
+            raise ValueError(f"Not a finite timestamp: {value!r}")
+        return seconds
+    parsed = datetime.fromisoformat(value.strip().replace("Z", "+00:00"))
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    try:
+        return parsed.timestamp()
+    except OverflowError as e:
+        raise ValueError(f"Timestamp out of range: {value!r}") from e
+
+
+def export_lines(questions: List[Question], since: Optional[float]):
+    """Yield one NDJSON line per question, with its answer inlined.
+
+    An item is exported when it was created after `since` or its answer file
+    was modified after `since`. Rows whose created_at can't be parsed are
+    always exported.
+    """
+    for q in questions:
+        entry = answer_cache.entry_for_notes(q.notes)
+        if since is not None:
+            try:
+                changed = parse_timestamp(q.created_at) > since
+            except ValueError:
+                # Undatable rows are always exported rather than silently lost
+                changed = True
+            if entry is not None and entry.modified_at > since:
+                changed = True
+            if not changed:
+                continue
+        item = q.model_dump()
+        item["answer"] = entry.content if entry is not None else None
+        # ASCII-escaped so U+2028/U+2029 in answers can't split a line
+        yield json.dumps(item) + "\n"
+
+
+@app.get("/export.ndjson")
+def export_ndjson(since: Optional[str] = None):
+    """Stream every question and its answer as newline-delimited JSON.
+
+    Pass since=<ISO timestamp or epoch seconds> to export only items created,
+    or whose answer changed, after that time.
+    """
+    since_ts = None
+    if since:
+        try:
+            since_ts = parse_timestamp(since)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid since timestamp")
+    # The snapshot list is immutable, so a concurrent reload can't affect it
+    return StreamingResponse(
+        export_lines(question_store.all(), since_ts),
+        media_type="application/x-ndjson",
+    )
 
 
 # Repository management
@@ -404,33 +728,38 @@ class Repository(BaseModel):
     description: Optional[str] = None
 
 
+# This would ideally come from a database or GitHub API
+# For now, returning a static list
+REPOSITORIES = [
+    {
+        "name": "metaproject",
+        "url": "https://github.com/company/metaproject",
+        "description": "Main metaproject repository",
+    },
+    {
+        "name": "question-interface",
+        "url": "https://github.com/company/question-interface",
+        "description": "Question tracking interface",
+    },
+    {
+        "name": "backend-api",
+        "url": "https://github.com/company/backend-api",
+        "description": "Backend API services",
+    },
+    {
+        "name": "frontend-app",
+        "url": "https://github.com/company/frontend-app",
+        "description": "Frontend application",
+    },
+]
+REPOSITORIES_VERSION = make_etag(REPOSITORIES)
+
+
 @app.get("/repositories")
-def get_repositories():
+def get_repositories(request: Request, response: Response):
     """Get list of available repositories in company's software surface."""
-    # This would ideally come from a database or GitHub API
-    # For now, returning a static list
-    return [
-        {
-            "name": "metaproject",
-            "url": "https://github.com/company/metaproject",
-            "description": "Main metaproject repository",
-        },
-        {
-            "name": "question-interface",
-            "url": "https://github.com/company/question-interface",
-            "description": "Question tracking interface",
-        },
-        {
-            "name": "backend-api",
-            "url": "https://github.com/company/backend-api",
-            "description": "Backend API services",
-        },
-        {
-            "name": "frontend-app",
-            "url": "https://github.com/company/frontend-app",
-            "description": "Frontend application",
-        },
-    ]
+    check_conditional(request, response, REPOSITORIES_VERSION)
+    return REPOSITORIES
 
 
 # Google Drive/Sheets Integration
@@ -468,21 +797,26 @@ async def google_auth(request: GoogleAuthRequest):
     }
 
 
+# This would use Google Drive API to list sheets
+GOOGLE_SHEETS = {
+    "sheets": [
+        {
+            "id": "example-sheet-id-1",
+            "name": "Q1 2024 Tasks",
+            "url": "https://docs.google.com/spreadsheets/d/example-sheet-id-1",
+        },
+        {
+            "id": "example-sheet-id-2",
+            "name": "Development Backlog",
+            "url": "https://docs.google.com/spreadsheets/d/example-sheet-id-2",
+        },
+    ]
+}
+GOOGLE_SHEETS_VERSION = make_etag(GOOGLE_SHEETS)
+
+
 @app.get("/google/sheets/list")
-async def list_google_sheets():
+async def list_google_sheets(request: Request, response: Response):
     """List available Google Sheets."""
-    # This would use Google Drive API to list sheets
-    return {
-        "sheets": [
-            {
-                "id": "example-sheet-id-1",
-                "name": "Q1 2024 Tasks",
-                "url": "https://docs.google.com/spreadsheets/d/example-sheet-id-1",
-            },
-            {
-                "id": "example-sheet-id-2",
-                "name": "Development Backlog",
-                "url": "https://docs.google.com/spreadsheets/d/example-sheet-id-2",
-            },
-        ]
-    }
+    check_conditional(request, response, GOOGLE_SHEETS_VERSION)
+    return GOOGLE_SHEETS
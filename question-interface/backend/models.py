@@ -0,0 +1,55 @@
+from pydantic import BaseModel
+from typing import Any, Dict, List, Optional
+
+
+# Data model for questions (now supporting both notes and tasks)
+class Question(BaseModel):
+    id: str
+    question: str
+    category: str
+    created_at: str
+    status: str
+    notes: Optional[str] = None
+    type: Optional[str] = "note"  # "note" or "task"
+    # Task-specific fields
+    repository: Optional[str] = None
+    priority: Optional[str] = None  # "low", "medium", "high", "urgent"
+    assignee: Optional[str] = None
+    due_date: Optional[str] = None
+    google_sheet_id: Optional[str] = None  # For synced items
+
+
+# Question with its markdown answer inlined (?include=answers)
+class QuestionWithAnswer(Question):
+    answer: Optional[str] = None
+
+
+# LLM Analysis Models
+class ConceptAnalysisRequest(BaseModel):
+    questions: List[Dict[str, Any]]  # List of {id, question, answer, category}
+
+
+class ModelAnalysis(BaseModel):
+    model_name: str
+    concepts: List[Dict[str, Any]]
+    relationships: List[Dict[str, Any]]
+    suggested_clusters: List[Dict[str, Any]]
+    raw_response: Optional[str] = None
+    error: Optional[str] = None
+    cached: bool = False  # served from the LLM response cache
+
+
+class ConceptAnalysisResponse(BaseModel):
+    analyses: List[ModelAnalysis]  # Multiple model analyses
+    fallback_used: bool = False
+
+
+# Background analysis jobs (/jobs)
+class JobStatus(BaseModel):
+    id: str
+    status: str  # "queued", "running", "done" or "failed"
+    created_at: float
+    updated_at: float
+    progress: Dict[str, Dict[str, Any]] = {}  # per model: status, batches done/total
+    error: Optional[str] = None
+    result: Optional[ConceptAnalysisResponse] = None
@@ -0,0 +1,168 @@
+"""
+Compact, deterministic text for the concept-analysis prompt.
+
+Answers are markdown notes: code blocks, tables, links and formatting cost
+prompt tokens without telling the model much about the concepts involved.
+clean_text() reduces them to plain prose, truncate_tokens() cuts at a word
+boundary within a token budget (rather than at an arbitrary character), and
+dedupe_pairs() folds near-identical Q&A pairs into one so the model sees
+each only once. count_tokens() approximates a BPE tokenizer locally: about
+one token per four characters of a word and one per punctuation mark.
+
+The same input always produces the same text, so prompts (and their cache
+keys) are stable between runs.
+"""
+
+import math
+import os
+import re
+from collections import Counter
+from typing import Any, Dict, List, Set, Tuple
+
+from search_index import tokenize
+
+# Per-pair limits for the text sent to the model
+QUESTION_TOKENS = int(os.environ.get("ANALYSIS_QUESTION_TOKENS", "64"))
+ANSWER_TOKENS = int(os.environ.get("ANALYSIS_ANSWER_TOKENS", "160"))
+# Pairs whose question and answer word sets both overlap this much are duplicates
+DUPLICATE_SIMILARITY = 0.85
+
+_FENCE = re.compile(r"```.*?(?:```|\Z)|~~~.*?(?:~~~|\Z)", re.S)
+_IMAGE = re.compile(r"!\[([^\]]*)\]\([^)]*\)")
+_LINK = re.compile(r"\[([^\]]+)\]\([^)]*\)")
+_REFERENCE = re.compile(r"^\s*\[[^\]]+\]:\s*\S+.*$", re.M)
+_URL = re.compile(r"<?https?://[^\s>)]+>?")
+_HTML = re.compile(r"</?[a-zA-Z][^>]*>")
+_INLINE_CODE = re.compile(r"`([^`]*)`")
+_HEADING = re.compile(r"^\s{0,3}#{1,6}\s*", re.M)
+_QUOTE = re.compile(r"^\s*>\s?", re.M)
+_LIST = re.compile(r"^\s*(?:[-*+]|\d+[.)])\s+", re.M)
+_TABLE_RULE = re.compile(r"^\s*\|?\s*:?-{3,}:?\s*(?:\|\s*:?-{3,}:?\s*)*\|?\s*$", re.M)
+_HRULE = re.compile(r"^\s*(?:[-*_]\s*){3,}$", re.M)
+# Markers only count at word boundaries, so my_var_name and 2*3*4 survive
+_EMPHASIS = re.compile(r"(?<!\w)(\*\*|__|~~|\*|_)(?=\S)(.+?)(?<=\S)\1(?!\w)")
+_WORD = re.compile(r"\w+")
+_SPACE = re.compile(r"\s+")
+
+_TOKEN = re.compile(r"\w+|[^\w\s]")
+
+
+def clean_text(text: str) -> str:
+    """Markdown reduced to plain single-line prose."""
+    text = _FENCE.sub(" ", text)
+    text = _IMAGE.sub(r"\1", text)
+    text = _LINK.sub(r"\1", text)
+    text = _REFERENCE.sub("", text)
+    text = _URL.sub("", text)
+    text = _HTML.sub(" ", text)
+    text = _TABLE_RULE.sub("", text)
+    text = _HRULE.sub("", text)
+    text = _HEADING.sub("", text)
+    text = _QUOTE.sub("", text)
+    text = _LIST.sub("", text)
+    # Table rows become "cell; cell"
+    lines = [line.strip().strip("|").replace("|", ";") for line in text.split("\n")]
+    text = "\n".join(lines)
+    # Code spans keep their text verbatim, only the backticks go
+    parts = _INLINE_CODE.split(text)
+    parts[::2] = [_strip_emphasis(part) for part in parts[::2]]
+    return _SPACE.sub(" ", "".join(parts)).strip()
+
+
+def _strip_emphasis(text: str) -> str:
+    # Repeat for nested markers, e.g. **bold _and_ italic**
+    while True:
+        stripped = _EMPHASIS.sub(_unemphasize, text)
+        if stripped == text:
+            return text
+        text = stripped
+
+
+def _unemphasize(match: "re.Match[str]") -> str:
+    marker, inner = match.groups()
+    # __init__ and the like are names, not bold text
+    if marker == "__" and _WORD.fullmatch(inner):
+        return match.group()
+    return inner
+
+
+def _token_cost(token: str) -> int:
+    if token[0].isalnum() or token[0] == "_":
+        return math.ceil(len(token) / 4)
+    return 1
+
+
+def count_tokens(text: str) -> int:
+    """Approximate tokenizer count of the text."""
+    return sum(_token_cost(m.group()) for m in _TOKEN.finditer(text))
+
+
+def truncate_tokens(text: str, limit: int) -> str:
+    """The longest prefix within `limit` tokens that ends on a token, plus "…"."""
+    used = 0
+    for m in _TOKEN.finditer(text):
+        used += _token_cost(m.group())
+        if used > limit:
+            return text[: m.start()].rstrip() + "…"
+    return text
+
+
+def compact_pair(question: Dict[str, Any]) -> Dict[str, Any]:
+    """Cleaned, token-limited question and answer text of one Q&A pair."""
+    return {
+        "id": question["id"],
+        "question": truncate_tokens(clean_text(question["question"]), QUESTION_TOKENS),
+        "answer": truncate_tokens(clean_text(question["answer"]), ANSWER_TOKENS),
+        "category": question["category"],
+    }
+
+
+def _similar(a: Set[str], b: Set[str], threshold: float) -> bool:
+    return len(a & b) >= threshold * len(a | b)
+
+
+def dedupe_pairs(
+    qa_pairs: List[Dict[str, Any]], threshold: float = DUPLICATE_SIMILARITY
+) -> Tuple[List[Dict[str, Any]], Dict[str, List[str]]]:
+    """Drop pairs whose question and answer nearly repeat an earlier pair.
+
+    Returns the kept pairs (in input order) and, per kept id, the ids folded
+    into it. Similarity is the Jaccard index of the word sets, which must
+    reach the threshold for both the questions and the answers, so the same
+    question answered differently is kept. Candidates are found with prefix
+    filtering on the question words (every pair above the threshold shares
+    one of its rarest words), so this stays near-linear.
+    """
+    words = [sorted(set(tokenize(qa["question"]))) for qa in qa_pairs]
+    answers = [set(tokenize(qa["answer"])) for qa in qa_pairs]
+    df = Counter(w for ws in words for w in ws)
+    index: Dict[str, List[int]] = {}
+    kept: List[int] = []
+    duplicates: Dict[str, List[str]] = {}
+    for i, ws in enumerate(words):
+        if not ws:
+            kept.append(i)
+            continue
+        ordered = sorted(ws, key=lambda w: (df[w], w))
+        prefix = ordered[: len(ordered) - math.ceil(threshold * len(ordered)) + 1]
+        match = None
+        seen = set()
+        for w in prefix:
+            for j in index.get(w, ()):
+                if j in seen:
+                    continue
+                seen.add(j)
+                if _similar(set(ws), set(words[j]), threshold) and _similar(
+                    answers[i], answers[j], threshold
+                ):
+                    match = j
+                    break
+            if match is not None:
+                break
+        if match is None:
+            kept.append(i)
+            for w in prefix:
+                index.setdefault(w, []).append(i)
+        else:
+            duplicates.setdefault(qa_pairs[match]["id"], []).append(qa_pairs[i]["id"])
+    return [qa_pairs[i] for i in kept], duplicates
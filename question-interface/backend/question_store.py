@@ -0,0 +1,201 @@
+"""
+Resident in-memory store for the question list.
+
+Rows are read from a storage engine (see metaproject-life/question_storage.py)
+and validated once, then served from memory until the engine's change
+signature moves (file mtime/size/inode for CSV, a version counter for
+SQLite). Each load also
+builds a hash index by id and posting lists for the common filter fields,
+so lookups and filtered listings never scan the full set.
+"""
+
+import threading
+from bisect import bisect_left, bisect_right
+from typing import Dict, List, Optional, Tuple
+
+from models import Question
+
+# Fields with a posting list (value -> row positions in CSV order)
+INDEXED_FIELDS = ("category", "type", "status", "repository", "priority", "assignee")
+
+
+class _Snapshot:
+    """Immutable view of one load of the CSV plus its indexes."""
+
+    def __init__(self, questions: List[Question], signature, modified_at=None):
+        self.signature = signature
+        self.modified_at = modified_at
+        self.questions = questions
+        self.by_id: Dict[str, Question] = {q.id: q for q in questions}
+        self.position_of: Dict[str, int] = {
+            q.id: pos for pos, q in enumerate(questions)
+        }
+        self.indexes: Dict[str, Dict[Optional[str], List[int]]] = {
+            field: {} for field in INDEXED_FIELDS
+        }
+        for pos, q in enumerate(questions):
+            for field in INDEXED_FIELDS:
+                self.indexes[field].setdefault(getattr(q, field), []).append(pos)
+        # Sorted (due_date, position) pairs for range queries
+        self.due_dates: List[Tuple[str, int]] = sorted(
+            (q.due_date, pos) for pos, q in enumerate(questions) if q.due_date
+        )
+
+    @property
+    def version(self) -> str:
+        return repr(self.signature)
+
+    def due_range(self, start: Optional[str], end: Optional[str]) -> List[int]:
+        """Positions with start <= due_date <= end, in CSV order."""
+        lo = 0 if start is None else bisect_left(self.due_dates, (start, -1))
+        hi = (
+            len(self.due_dates)
+            if end is None
+            else bisect_right(self.due_dates, (end, len(self.questions)))
+        )
+        return sorted(pos for _, pos in self.due_dates[lo:hi])
+
+
+class Selection:
+    """Result of a store query: row positions within one snapshot."""
+
+    def __init__(self, snapshot: _Snapshot, positions: List[int]):
+        self._snapshot = snapshot
+        self._questions = snapshot.questions
+        self.positions = positions
+
+    @property
+    def version(self) -> str:
+        """Version of the store snapshot the positions refer to."""
+        return self._snapshot.version
+
+    def position_of(self, question_id: str) -> Optional[int]:
+        """Row position of a question in this snapshot (matching or not)."""
+        return self._snapshot.position_of.get(question_id)
+
+    def __len__(self) -> int:
+        return len(self.positions)
+
+    def questions(self) -> List[Question]:
+        return [self._questions[pos] for pos in self.positions]
+
+    def page(
+        self, after: Optional[int] = None, limit: Optional[int] = None
+    ) -> Tuple[List[Question], Optional[int]]:
+        """Rows after position `after`, at most `limit` of them.
+
+        Returns the rows and the position to resume after, or None when this
+        is the last page.
+        """
+        start = 0 if after is None else bisect_right(self.positions, after)
+        end = len(self.positions) if limit is None else start + limit
+        page = self.positions[start:end]
+        next_after = page[-1] if page and end < len(self.positions) else None
+        return [self._questions[pos] for pos in page], next_after
+
+
+class QuestionStore:
+    """Caches validated Question objects and reloads when the storage changes."""
+
+    def __init__(self, storage):
+        self.storage = storage
+        self._lock = threading.Lock()
+        self._snapshot: Optional[_Snapshot] = None
+
+    def _parse(self) -> List[Question]:
+        return [Question(**row) for row in self.storage.read_rows()]
+
+    def _current(self) -> _Snapshot:
+        """Return the current snapshot, reloading if the storage signature changed."""
+        snapshot = self._snapshot
+        signature = self.storage.signature()
+        if snapshot is not None and signature == snapshot.signature:
+            return snapshot
+        with self._lock:
+            # Another thread may have reloaded while we waited for the lock
+            snapshot = self._snapshot
+            signature = self.storage.signature()
+            if snapshot is None or signature != snapshot.signature:
+                snapshot = _Snapshot(
+                    self._parse(), signature, self.storage.modified_at()
+                )
+                self._snapshot = snapshot
+            return snapshot
+
+    def invalidate(self) -> None:
+        """Force a reload on the next access."""
+        with self._lock:
+            self._snapshot = None
+
+    @property
+    def version(self) -> str:
+        """Opaque token that changes whenever the stored questions change."""
+        return self._current().version
+
+    @property
+    def modified_at(self) -> Optional[float]:
+        """Modification time of the storage at the last load (epoch seconds)."""
+        return self._current().modified_at
+
+    def all(self) -> List[Question]:
+        return self._current().questions
+
+    def get(self, question_id: str) -> Optional[Question]:
+        return self._current().by_id.get(question_id)
+
+    def select(
+        self,
+        due_from: Optional[str] = None,
+        due_to: Optional[str] = None,
+        **criteria: Optional[str],
+    ) -> Selection:
+        """Questions matching every criterion, in CSV order.
+
+        Equality criteria must be INDEXED_FIELDS; due_from/due_to bound
+        due_date inclusively. The smallest candidate list (a posting list or
+        the due_date range) is scanned and the remaining criteria are checked
+        against it.
+        """
+        unknown = set(criteria) - set(INDEXED_FIELDS)
+        if unknown:
+            raise ValueError(f"Not an indexed field: {', '.join(sorted(unknown))}")
+        snapshot = self._current()
+        candidates = [
+            snapshot.indexes[field].get(value, []) for field, value in criteria.items()
+        ]
+        ranged = due_from is not None or due_to is not None
+        if ranged:
+            candidates.append(snapshot.due_range(due_from, due_to))
+        if not candidates:
+            return Selection(snapshot, list(range(len(snapshot.questions))))
+        smallest = min(candidates, key=len)
+        if len(candidates) == 1:
+            return Selection(snapshot, smallest)
+
+        def matches(q: Question) -> bool:
+            if any(getattr(q, f) != v for f, v in criteria.items()):
+                return False
+            if ranged:
+                if not q.due_date:
+                    return False
+                if due_from is not None and q.due_date < due_from:
+                    return False
+                if due_to is not None and q.due_date > due_to:
+                    return False
+            return True
+
+        questions = snapshot.questions
+        return Selection(snapshot, [pos for pos in smallest if matches(questions[pos])])
+
+    def filter(self, **criteria: Optional[str]) -> List[Question]:
+        """Return questions matching every field=value criterion, in CSV order."""
+        if not criteria:
+            return self.all()
+        return self.select(**criteria).questions()
+
+    def counts(self, field: str) -> Dict[Optional[str], int]:
+        """Number of questions per value of an indexed field."""
+        if field not in INDEXED_FIELDS:
+            raise ValueError(f"Not an indexed field: {field}")
+        index = self._current().indexes[field]
+        return {value: len(items) for value, items in index.items()}
@@ -0,0 +1,314 @@
+"""
+Approximate nearest-neighbour index of questions for "related" lookups.
+
+Every question (with its category and answer text) is embedded as a hashed
+bag of unigrams and bigrams: a fixed-size, L2-normalised vector that needs
+no corpus-wide vocabulary, so items can be added or replaced one at a time.
+VectorIndex buckets the vectors with random-hyperplane LSH over several
+tables; a query probes its own buckets (and their one-bit neighbours when
+those are too sparse) and ranks the candidates by exact cosine similarity.
+
+RelatedIndex keeps a VectorIndex in sync with the question store and the
+answer files, re-embedding only items whose text changed, and persists it
+to disk so a restart doesn't rebuild it from scratch. A sync is skipped
+when neither the store version nor any answer file's (mtime, size) changed.
+"""
+
+import hashlib
+import math
+import os
+import threading
+import time
+import zlib
+from collections import Counter
+from typing import Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+from answer_cache import answer_reference
+from local_concepts import terms_of
+
+DEFAULT_INDEX_PATH = os.path.join(
+    os.path.dirname(__file__), "cache", "related_index.npz"
+)
+
+DIM = 1024
+TABLES = 8
+BITS = 12
+
+
+def embed(text: str, dim: int = DIM) -> np.ndarray:
+    """Signed feature-hashed term vector with sublinear tf, unit length."""
+    vector = np.zeros(dim, np.float32)
+    for term, count in Counter(terms_of(text)).items():
+        h = zlib.crc32(term.encode("utf-8"))
+        sign = 1.0 if h & 0x80000000 else -1.0
+        vector[h % dim] += sign * (1 + math.log(count))
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm > 0 else vector
+
+
+class VectorIndex:
+    """Random-projection LSH over unit vectors with exact re-ranking."""
+
+    def __init__(
+        self, dim: int = DIM, tables: int = TABLES, bits: int = BITS, seed: int = 0
+    ):
+        self.dim = dim
+        self.tables = tables
+        self.bits = bits
+        self.seed = seed
+        rng = np.random.default_rng(seed)
+        self._planes = rng.standard_normal((tables * bits, dim)).astype(np.float32)
+        self._weights = 1 << np.arange(bits, dtype=np.int64)
+        self._keys: List[str] = []
+        self._rows: Dict[str, int] = {}
+        self._vectors = np.zeros((0, dim), np.float32)
+        self._codes = np.zeros((0, tables), np.int64)
+        self._buckets: List[Dict[int, Set[int]]] = [{} for _ in range(tables)]
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._rows
+
+    def vector(self, key: str) -> Optional[np.ndarray]:
+        row = self._rows.get(key)
+        return self._vectors[row] if row is not None else None
+
+    def _hash(self, vectors: np.ndarray) -> np.ndarray:
+        signs = (vectors @ self._planes.T) > 0
+        return signs.reshape(-1, self.tables, self.bits) @ self._weights
+
+    def _bucket(self, row: int) -> None:
+        for table, code in enumerate(self._codes[row]):
+            self._buckets[table].setdefault(int(code), set()).add(row)
+
+    def _unbucket(self, row: int) -> None:
+        for table, code in enumerate(self._codes[row]):
+            bucket = self._buckets[table][int(code)]
+            bucket.discard(row)
+            if not bucket:
+                del self._buckets[table][int(code)]
+
+    def add(self, key: str, vector: np.ndarray) -> None:
+        """Insert or replace the vector stored under key."""
+        code = self._hash(vector[None, :])[0]
+        row = self._rows.get(key)
+        if row is not None:
+            self._unbucket(row)
+        else:
+            row = len(self._keys)
+            if row == len(self._vectors):
+                # Grow storage geometrically
+                capacity = max(16, 2 * row)
+                self._vectors = np.resize(self._vectors, (capacity, self.dim))
+                self._codes = np.resize(self._codes, (capacity, self.tables))
+            self._keys.append(key)
+            self._rows[key] = row
+        self._vectors[row] = vector
+        self._codes[row] = code
+        self._bucket(row)
+
+    def remove(self, key: str) -> None:
+        row = self._rows.pop(key, None)
+        if row is None:
+            return
+        self._unbucket(row)
+        last = len(self._keys) - 1
+        if row != last:
+            # Move the last item into the freed row
+            moved = self._keys[last]
+            self._unbucket(last)
+            self._vectors[row] = self._vectors[last]
+            self._codes[row] = self._codes[last]
+            self._keys[row] = moved
+            self._rows[moved] = row
+            self._bucket(row)
+        self._keys.pop()
+
+    def _candidates(self, code: np.ndarray, wanted: int) -> Set[int]:
+        found: Set[int] = set()
+        for table, c in enumerate(code):
+            found |= self._buckets[table].get(int(c), set())
+        if len(found) < wanted:
+            # Multi-probe: buckets one bit away
+            for table, c in enumerate(code):
+                for bit in range(self.bits):
+                    found |= self._buckets[table].get(int(c) ^ (1 << bit), set())
+        return found
+
+    def query(
+        self, vector: np.ndarray, k: int = 10, exclude: Optional[str] = None
+    ) -> List[Tuple[str, float]]:
+        """Up to k (key, cosine similarity) pairs, most similar first."""
+        n = len(self._keys)
+        if n == 0 or k <= 0:
+            return []
+        skip = self._rows.get(exclude) if exclude is not None else None
+        candidates = self._candidates(self._hash(vector[None, :])[0], 4 * k)
+        candidates.discard(skip)
+        if len(candidates) < k:
+            # Too few collisions: rank everything
+            rows = np.array([r for r in range(n) if r != skip], dtype=np.int64)
+        else:
+            rows = np.fromiter(candidates, dtype=np.int64, count=len(candidates))
+        if not len(rows):
+            return []
+        scores = self._vectors[rows] @ vector
+        k = min(k, len(rows))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [(self._keys[rows[i]], float(scores[i])) for i in top if scores[i] > 0]
+
+    def save(self, path: str, signatures: Dict[str, str]) -> None:
+        """Write vectors and per-key content signatures atomically."""
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        n = len(self._keys)
+        tmp = f"{path}.tmp.npz"
+        np.savez(
+            tmp,
+            params=np.array([self.dim, self.tables, self.bits, self.seed]),
+            keys=np.array(self._keys, dtype=str),
+            signatures=np.array([signatures.get(k, "") for k in self._keys], dtype=str),
+            vectors=self._vectors[:n],
+        )
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str, **params) -> Tuple["VectorIndex", Dict[str, str]]:
+        """Restore an index; raises ValueError if saved with other parameters."""
+        index = cls(**params)
+        with np.load(path) as data:
+            saved = tuple(int(v) for v in data["params"])
+            if saved != (index.dim, index.tables, index.bits, index.seed):
+                raise ValueError("index parameters changed")
+            keys = [str(k) for k in data["keys"]]
+            signatures = dict(zip(keys, (str(s) for s in data["signatures"])))
+            vectors = data["vectors"].astype(np.float32)
+        index._keys = keys
+        index._rows = {key: row for row, key in enumerate(keys)}
+        index._vectors = vectors
+        index._codes = index._hash(vectors) if len(keys) else index._codes
+        for row in range(len(keys)):
+            index._bucket(row)
+        return index, signatures
+
+
+class RelatedIndex:
+    """Keeps a VectorIndex of questions (and answers) in sync with the store.
+
+    Sync checks are throttled to one per `refresh_interval` seconds; the index
+    is saved to `path` whenever a sync changed it.
+    """
+
+    def __init__(
+        self,
+        store,
+        answer_cache,
+        path: Optional[str] = DEFAULT_INDEX_PATH,
+        refresh_interval: float = 2.0,
+    ):
+        self.store = store
+        self.answer_cache = answer_cache
+        self.path = path
+        self.refresh_interval = refresh_interval
+        self._lock = threading.Lock()
+        self._last_refresh = float("-inf")
+        self.index = VectorIndex()
+        self._signatures: Dict[str, str] = {}
+        # What each question's text was built from at the last sync: question,
+        # category, notes and the answer file's (mtime_ns, size)
+        self._inputs: Dict[str, tuple] = {}
+        self._answer_paths: Dict[str, str] = {}  # question id -> answer file
+        self._file_signatures: Dict[str, Optional[Tuple[int, int]]] = {}
+        self._store_version: Optional[str] = None
+        if path and os.path.exists(path):
+            try:
+                self.index, self._signatures = VectorIndex.load(path)
+            except (OSError, ValueError, KeyError):
+                pass  # rebuilt on first sync
+
+    def _text(self, question) -> str:
+        answer = self.answer_cache.for_notes(question.notes) or ""
+        return f"{question.question}\n{question.category}\n{answer}"
+
+    def _answer_path(self, notes: Optional[str]) -> Optional[str]:
+        base_dir = getattr(self.answer_cache, "base_dir", None)
+        reference = answer_reference(notes)
+        if base_dir is None or reference is None:
+            return None
+        return os.path.normpath(os.path.join(base_dir, reference))
+
+    @staticmethod
+    def _stat_files(paths: Set[str]) -> Dict[str, Optional[Tuple[int, int]]]:
+        """(mtime_ns, size) per file, listing each directory once."""
+        found: Dict[str, Tuple[int, int]] = {}
+        for directory in {os.path.dirname(path) for path in paths}:
+            try:
+                entries = list(os.scandir(directory))
+            except FileNotFoundError:
+                continue
+            for entry in entries:
+                path = os.path.normpath(entry.path)
+                if path in paths and entry.is_file():
+                    st = entry.stat()
+                    found[path] = (st.st_mtime_ns, st.st_size)
+        return {path: found.get(path) for path in paths}
+
+    def _sync(self) -> bool:
+        version = getattr(self.store, "version", None)
+        if version is not None and version == self._store_version:
+            files = self._stat_files(set(self._answer_paths.values()))
+            if files == self._file_signatures:
+                return False
+        questions = self.store.all()
+        paths = {q.id: self._answer_path(q.notes) for q in questions}
+        files = self._stat_files({path for path in paths.values() if path})
+        changed = False
+        seen = set()
+        for q in questions:
+            seen.add(q.id)
+            path = paths[q.id]
+            inputs = (q.question, q.category, q.notes, files.get(path))
+            if self._inputs.get(q.id) == inputs and q.id in self.index:
+                continue
+            self._inputs[q.id] = inputs
+            text = self._text(q)
+            signature = hashlib.sha1(text.encode("utf-8")).hexdigest()
+            if self._signatures.get(q.id) == signature and q.id in self.index:
+                continue
+            self.index.add(q.id, embed(text))
+            self._signatures[q.id] = signature
+            changed = True
+        for qid in set(self._signatures) - seen:
+            self.index.remove(qid)
+            del self._signatures[qid]
+            changed = True
+        for qid in set(self._inputs) - seen:
+            del self._inputs[qid]
+        self._answer_paths = {qid: path for qid, path in paths.items() if path}
+        self._file_signatures = files
+        self._store_version = version
+        return changed
+
+    def refresh(self, force: bool = False) -> None:
+        now = time.monotonic()
+        if not force and now - self._last_refresh < self.refresh_interval:
+            return
+        with self._lock:
+            if self._sync() and self.path:
+                self.index.save(self.path, self._signatures)
+            self._last_refresh = now
+
+    def related(
+        self, question_id: str, k: int = 10
+    ) -> Optional[List[Tuple[str, float]]]:
+        """Most similar other questions, or None if the id is unknown."""
+        self.refresh()
+        with self._lock:
+            vector = self.index.vector(question_id)
+            if vector is None:
+                return None
+            return self.index.query(vector, k, exclude=question_id)
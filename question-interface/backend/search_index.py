@@ -0,0 +1,340 @@
+"""
+Full-text search over questions, answers and notes.
+
+SearchIndex is an in-memory inverted index (term -> {doc: term frequency})
+ranked with BM25. A sorted vocabulary gives prefix matching by bisection,
+and documents can be added, replaced or removed one at a time.
+
+CorpusIndex keeps a SearchIndex in sync with the question store and the
+markdown files under data/answers and data/notes, re-indexing only the
+questions and files whose content or mtime changed.
+"""
+
+import heapq
+import html
+import heapq
+import math
+import os
+import re
+import threading
+import time
+from bisect import bisect_left, insort
+from collections import Counter
+from typing import Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+TOKEN_RE = re.compile(r"[^\W_]+", re.UNICODE)
+
+# Upper bound on vocabulary terms a single prefix may expand to (the ones in
+# the most documents are kept)
+MAX_PREFIX_EXPANSIONS = 64
+# Prefix expansions count less than the exact term so exact hits rank first
+PREFIX_WEIGHT = 0.5
+
+
+def tokenize(text: str) -> List[str]:
+    return [m.group().lower() for m in TOKEN_RE.finditer(text)]
+
+
+class _Doc(NamedTuple):
+    kind: str
+    title: str
+    text: str
+    question_id: Optional[str]
+    terms: Counter
+    length: int
+
+
+class SearchHit(NamedTuple):
+    key: str
+    kind: str
+    title: str
+    question_id: Optional[str]
+    score: float
+    snippet: str
+
+
+def parse_query(query: str) -> List[Tuple[str, bool]]:
+    """Split a query into (term, prefix) pairs.
+
+    A trailing ``*`` marks a prefix term; the last term is always matched as a
+    prefix too, so partially typed words find results.
+    """
+    terms: List[Tuple[str, bool]] = []
+    for chunk in query.split():
+        tokens = tokenize(chunk)
+        for i, token in enumerate(tokens):
+            terms.append((token, i == len(tokens) - 1 and chunk.endswith("*")))
+    if terms and not query[-1:].isspace():
+        terms[-1] = (terms[-1][0], True)
+    return terms
+
+
+def make_snippet(text: str, terms: Set[str], width: int = 160) -> str:
+    """HTML-escaped excerpt around the first matching term, hits in <mark>."""
+    spans = [
+        (m.start(), m.end())
+        for m in TOKEN_RE.finditer(text)
+        if m.group().lower() in terms
+    ]
+    if spans:
+        start = max(0, spans[0][0] - width // 3)
+        # Start on a word boundary
+        if start > 0:
+            space = text.find(" ", start)
+            if space != -1 and space < spans[0][0]:
+                start = space + 1
+    else:
+        start = 0
+    end = min(len(text), start + width)
+    parts = ["…" if start > 0 else ""]
+    cursor = start
+    for s, e in spans:
+        if s < start:
+            continue
+        if e > end:
+            break
+        parts.append(html.escape(text[cursor:s]))
+        parts.append(f"<mark>{html.escape(text[s:e])}</mark>")
+        cursor = e
+    parts.append(html.escape(text[cursor:end]))
+    if end < len(text):
+        parts.append("…")
+    return " ".join("".join(parts).split())
+
+
+class SearchIndex:
+    """Inverted index with BM25 ranking and incremental updates."""
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self._docs: Dict[str, _Doc] = {}
+        self._postings: Dict[str, Dict[str, int]] = {}
+        self._vocab: List[str] = []  # sorted, for prefix lookups
+        self._total_length = 0
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._docs
+
+    def upsert(
+        self,
+        key: str,
+        kind: str,
+        title: str,
+        text: str,
+        question_id: Optional[str] = None,
+    ) -> None:
+        """Add a document, replacing any previous version with the same key.
+
+        Only `text` is indexed; `title` is returned with hits for display.
+        """
+        self.remove(key)
+        terms = Counter(tokenize(text))
+        length = sum(terms.values())
+        self._docs[key] = _Doc(kind, title, text, question_id, terms, length)
+        self._total_length += length
+        for term, tf in terms.items():
+            posting = self._postings.get(term)
+            if posting is None:
+                posting = self._postings[term] = {}
+                insort(self._vocab, term)
+            posting[key] = tf
+
+    def remove(self, key: str) -> None:
+        doc = self._docs.pop(key, None)
+        if doc is None:
+            return
+        self._total_length -= doc.length
+        for term in doc.terms:
+            posting = self._postings[term]
+            del posting[key]
+            if not posting:
+                del self._postings[term]
+                del self._vocab[bisect_left(self._vocab, term)]
+
+    def expand(self, prefix: str) -> List[str]:
+        """Vocabulary terms starting with prefix, the most common first (capped).
+
+        Past MAX_PREFIX_EXPANSIONS the rarest terms are dropped rather than
+        the alphabetically last ones.
+        """
+        i = bisect_left(self._vocab, prefix)
+        matches = []
+        while i < len(self._vocab) and self._vocab[i].startswith(prefix):
+            matches.append(self._vocab[i])
+            i += 1
+        return heapq.nlargest(
+            MAX_PREFIX_EXPANSIONS, matches, key=lambda term: len(self._postings[term])
+        )
+
+    def search(
+        self,
+        query: str,
+        limit: int = 10,
+        kinds: Optional[Iterable[str]] = None,
+    ) -> Tuple[List[SearchHit], int]:
+        """Return the top `limit` hits and the total number of matches."""
+        if not self._docs:
+            return [], 0
+        kinds = set(kinds) if kinds else None
+        n = len(self._docs)
+        avgdl = self._total_length / n
+        scores: Dict[str, float] = {}
+        matched_terms: Set[str] = set()
+
+        weighted: Dict[str, float] = {}
+        for term, prefix in parse_query(query):
+            if term in self._postings:
+                weighted[term] = max(weighted.get(term, 0.0), 1.0)
+            if prefix:
+                for expansion in self.expand(term):
+                    if expansion != term:
+                        weighted.setdefault(expansion, PREFIX_WEIGHT)
+
+        # BM25 length normalisation: k1 * (1 - b + b * len / avgdl)
+        base = self.k1 * (1 - self.b)
+        per_token = self.k1 * self.b / avgdl
+        docs = self._docs
+        for term, weight in weighted.items():
+            posting = self._postings[term]
+            df = len(posting)
+            boost = weight * (self.k1 + 1) * math.log(1 + (n - df + 0.5) / (df + 0.5))
+            matched_terms.add(term)
+            for key, tf in posting.items():
+                doc = docs[key]
+                if kinds is not None and doc.kind not in kinds:
+                    continue
+                score = boost * tf / (tf + base + per_token * doc.length)
+                scores[key] = scores.get(key, 0.0) + score
+
+        top = heapq.nlargest(limit, scores.items(), key=lambda item: (item[1], item[0]))
+        hits = []
+        for key, score in top:
+            doc = self._docs[key]
+            hits.append(
+                SearchHit(
+                    key=key,
+                    kind=doc.kind,
+                    title=doc.title,
+                    question_id=doc.question_id,
+                    score=round(score, 4),
+                    snippet=make_snippet(doc.text, matched_terms),
+                )
+            )
+        return hits, len(scores)
+
+
+def _markdown_title(text: str, fallback: str) -> str:
+    for line in text.splitlines():
+        line = line.strip().lstrip("#").strip()
+        if line:
+            return line[len("Title:") :].strip() if line.startswith("Title:") else line
+    return fallback
+
+
+class CorpusIndex:
+    """Keeps a SearchIndex in sync with the question store and markdown files.
+
+    Sync checks are throttled to one per `refresh_interval` seconds so
+    searches don't pay for a directory scan each time.
+    """
+
+    def __init__(
+        self,
+        store,
+        data_dir: str,
+        subdirs: Optional[Dict[str, str]] = None,
+        refresh_interval: float = 2.0,
+    ):
+        self.store = store
+        self.data_dir = data_dir
+        # Directory under data_dir -> document kind
+        self.subdirs = subdirs or {"answers": "answer", "notes": "note"}
+        self.refresh_interval = refresh_interval
+        self.index = SearchIndex()
+        self._lock = threading.Lock()
+        self._questions_version: Optional[str] = None
+        self._question_texts: Dict[str, str] = {}
+        self._file_signatures: Dict[str, Optional[Tuple[int, int]]] = {}
+        self._reference_owner: Dict[str, str] = {}  # "answers/x.md" -> question id
+        self._last_refresh = float("-inf")
+
+    def _sync_questions(self) -> None:
+        version = self.store.version
+        if version == self._questions_version:
+            return
+        seen = set()
+        owners = {}
+        for q in self.store.all():
+            key = f"question:{q.id}"
+            seen.add(key)
+            text = f"{q.question}\n{q.category}"
+            if self._question_texts.get(key) != text:
+                self.index.upsert(key, "question", q.question, text, q.id)
+                self._question_texts[key] = text
+            # notes hold "answer:answers/x.md" or "note:notes/x.md"
+            if q.notes and ":" in q.notes:
+                reference = q.notes.split(":", 1)[1].strip()
+                owners[reference] = q.id
+        for key in set(self._question_texts) - seen:
+            self.index.remove(key)
+            del self._question_texts[key]
+        if owners != self._reference_owner:
+            self._reference_owner = owners
+            # Owner links changed; re-read every file on the next scan
+            self._file_signatures = dict.fromkeys(self._file_signatures)
+        self._questions_version = version
+
+    def _sync_files(self) -> None:
+        seen = set()
+        for subdir, kind in self.subdirs.items():
+            directory = os.path.join(self.data_dir, subdir)
+            try:
+                entries = list(os.scandir(directory))
+            except FileNotFoundError:
+                continue
+            for entry in entries:
+                if not entry.name.endswith(".md") or not entry.is_file():
+                    continue
+                reference = f"{subdir}/{entry.name}"
+                seen.add(reference)
+                st = entry.stat()
+                signature = (st.st_mtime_ns, st.st_size)
+                if self._file_signatures.get(reference) == signature:
+                    continue
+                try:
+                    with open(entry.path, "r", encoding="utf-8") as f:
+                        text = f.read()
+                except (FileNotFoundError, UnicodeDecodeError):
+                    continue
+                self.index.upsert(
+                    f"{kind}:{reference}",
+                    kind,
+                    _markdown_title(text, entry.name),
+                    text,
+                    self._reference_owner.get(reference),
+                )
+                self._file_signatures[reference] = signature
+        for reference in set(self._file_signatures) - seen:
+            kind = self.subdirs[reference.split("/", 1)[0]]
+            self.index.remove(f"{kind}:{reference}")
+            del self._file_signatures[reference]
+
+    def refresh(self, force: bool = False) -> None:
+        now = time.monotonic()
+        if not force and now - self._last_refresh < self.refresh_interval:
+            return
+        with self._lock:
+            self._sync_questions()
+            self._sync_files()
+            self._last_refresh = now
+
+    def search(
+        self, query: str, limit: int = 10, kinds: Optional[Iterable[str]] = None
+    ) -> Tuple[List[SearchHit], int]:
+        self.refresh()
+        with self._lock:
+            return self.index.search(query, limit, kinds)
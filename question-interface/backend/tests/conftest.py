@@ -0,0 +1,10 @@
+import os
+import sys
+
+# Make the shared storage engines importable without importing main
+sys.path.insert(
+    0,
+    os.path.abspath(
+        os.path.join(os.path.dirname(__file__), "../../../metaproject-life")
+    ),
+)
@@ -0,0 +1,55 @@
+import hashlib
+import os
+
+from answer_cache import AnswerCache, answer_reference
+
+
+def write(path, text):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(text, encoding="utf-8")
+
+
+def test_answer_reference():
+    assert answer_reference("answer:answers/1.md") == "answers/1.md"
+    assert answer_reference("plain note") is None
+    assert answer_reference(None) is None
+
+
+def test_entry_hash_and_reload_on_change(tmp_path):
+    write(tmp_path / "answers" / "1.md", "# One")
+    cache = AnswerCache(str(tmp_path))
+
+    entry = cache.get_entry("answers/1.md")
+    assert entry.content == "# One"
+    assert entry.digest == hashlib.sha256(b"# One").hexdigest()
+    assert cache.get_entry("answers/1.md") is entry
+
+    write(tmp_path / "answers" / "1.md", "# One, edited")
+    path = tmp_path / "answers" / "1.md"
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000))
+    assert cache.get("answers/1.md") == "# One, edited"
+    assert cache.get("answers/missing.md") is None
+
+
+def test_lru_eviction_respects_budget(tmp_path):
+    for name in ("a", "b", "c"):
+        write(tmp_path / f"{name}.md", name * 10)
+    cache = AnswerCache(str(tmp_path), max_bytes=25)
+
+    cache.get("a.md")
+    cache.get("b.md")
+    cache.get("a.md")  # a is now most recently used
+    cache.get("c.md")  # evicts b
+
+    assert len(cache) == 2
+    assert cache.total_bytes == 20
+    first = cache.get_entry("a.md")
+    assert cache.get_entry("a.md") is first
+
+
+def test_oversized_files_are_served_but_not_kept(tmp_path):
+    write(tmp_path / "big.md", "x" * 100)
+    cache = AnswerCache(str(tmp_path), max_bytes=10)
+    assert cache.get("big.md") == "x" * 100
+    assert len(cache) == 0
@@ -1,3 +1,6 @@
+import asyncio
+import json
+
 import pytest
 from fastapi.testclient import TestClient
 from main import app, load_questions
@@ -89,3 +92,315 @@ def test_get_specific_question():
 
     # Should match the first question
     assert specific_question == first_question
+
+
+def test_get_questions_with_answers_inlined():
+    """include=answers returns every item with its markdown answer in one call"""
+    response = client.get("/questions", params={"include": "answers"})
+    assert response.status_code == 200
+    questions = response.json()
+    assert len(questions) == len(client.get("/questions").json())
+
+    for q in questions:
+        assert "answer" in q
+        expected = client.get(f"/questions/{q['id']}/answer").json()
+        assert q["answer"] == expected["answer"]
+    assert any(q["answer"] for q in questions)
+
+
+def test_notes_and_tasks_accept_include():
+    for path in ("/notes", "/tasks"):
+        response = client.get(path, params={"include": "answers"})
+        assert response.status_code == 200
+        assert all("answer" in item for item in response.json())
+    # Without include the plain shape is unchanged
+    assert all("answer" not in item for item in client.get("/tasks").json())
+
+
+def test_unknown_include_is_rejected():
+    response = client.get("/questions", params={"include": "bogus"})
+    assert response.status_code == 400
+
+
+def test_answer_etag_revalidation():
+    questions = client.get("/questions", params={"include": "answers"}).json()
+    answered = next(q for q in questions if q["answer"])
+
+    response = client.get(f"/questions/{answered['id']}/answer")
+    etag = response.headers["etag"]
+
+    response = client.get(
+        f"/questions/{answered['id']}/answer", headers={"If-None-Match": etag}
+    )
+    assert response.status_code == 304
+    assert response.content == b""
+
+
+@pytest.mark.parametrize(
+    "path",
+    [
+        "/questions",
+        "/questions?include=answers",
+        "/categories",
+        "/notes",
+        "/tasks",
+        "/repositories",
+        "/google/sheets/list",
+    ],
+)
+def test_get_endpoints_revalidate_with_etag(path):
+    response = client.get(path)
+    assert response.status_code == 200
+    etag = response.headers["etag"]
+
+    response = client.get(path, headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["etag"] == etag
+
+    response = client.get(path, headers={"If-None-Match": '"stale"'})
+    assert response.status_code == 200
+
+
+def test_list_variants_have_distinct_etags():
+    plain = client.get("/questions").headers["etag"]
+    with_answers = client.get("/questions?include=answers").headers["etag"]
+    assert plain != with_answers
+
+
+def test_last_modified_revalidation():
+    response = client.get("/categories")
+    last_modified = response.headers["last-modified"]
+
+    response = client.get("/categories", headers={"If-Modified-Since": last_modified})
+    assert response.status_code == 304
+
+
+def test_questions_cursor_pagination_covers_all_items():
+    everything = client.get("/questions").json()
+    seen = []
+    cursor = None
+    while True:
+        params = {"limit": 5}
+        if cursor:
+            params["cursor"] = cursor
+        response = client.get("/questions", params=params)
+        assert response.status_code == 200
+        assert int(response.headers["x-total-count"]) == len(everything)
+        page = response.json()
+        assert len(page) <= 5
+        seen.extend(page)
+        cursor = response.headers.get("x-next-cursor")
+        if not cursor:
+            break
+    assert seen == everything
+
+
+def test_questions_field_projection():
+    response = client.get("/questions", params={"fields": "id,question,category"})
+    assert response.status_code == 200
+    assert "etag" in response.headers
+    for item in response.json():
+        assert set(item) == {"id", "question", "category"}
+
+    response = client.get(
+        "/questions", params={"fields": "id,answer", "include": "answers"}
+    )
+    assert all(set(item) == {"id", "answer"} for item in response.json())
+
+    assert client.get("/questions", params={"fields": "bogus"}).status_code == 400
+    assert client.get("/questions", params={"fields": "answer"}).status_code == 400
+
+
+def test_questions_server_side_filters():
+    everything = client.get("/questions").json()
+    category = everything[0]["category"]
+    response = client.get("/questions", params={"category": category, "type": "task"})
+    expected = [
+        q for q in everything if q["category"] == category and q["type"] == "task"
+    ]
+    assert response.json() == expected
+
+    due = [q for q in everything if q["due_date"]]
+    if due:
+        date = min(q["due_date"] for q in due)
+        response = client.get("/questions", params={"due_from": date, "due_to": date})
+        assert {q["id"] for q in response.json()} == {
+            q["id"] for q in due if q["due_date"] == date
+        }
+
+
+def test_questions_invalid_cursor():
+    response = client.get("/questions", params={"cursor": "not-a-cursor!"})
+    assert response.status_code == 400
+
+
+def test_cursor_survives_reloads_and_rejects_removed_rows(monkeypatch, tmp_path):
+    import os
+
+    import main
+    from question_storage import CsvStorage
+    from question_store import QuestionStore
+
+    path = tmp_path / "questions.csv"
+
+    def write(ids):
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("id,question,category,created_at,status,notes,type\n")
+            for qid in ids:
+                f.write(f"{qid},Q{qid}?,c,2025-01-01T00:00:00Z,open,,note\n")
+        st = os.stat(path)
+        os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+
+    def page(cursor=None):
+        params = {"limit": 2, **({"cursor": cursor} if cursor else {})}
+        response = client.get("/questions", params=params)
+        ids = [q["id"] for q in response.json()] if response.status_code == 200 else []
+        return response.status_code, ids, response.headers.get("x-next-cursor")
+
+    write(["1", "2", "3", "4", "5"])
+    monkeypatch.setattr(main, "question_store", QuestionStore(CsvStorage(str(path))))
+    _, first, cursor = page()
+    assert first == ["1", "2"]
+
+    # Rows inserted and deleted before the cursor don't shift the next page
+    write(["0", "2", "3", "4", "5"])
+    status, second, cursor = page(cursor)
+    assert (status, second) == (200, ["3", "4"])
+
+    write(["0", "2", "5"])
+    assert page(cursor)[0] == 410
+
+
+def test_export_ndjson_streams_questions_with_answers():
+    response = client.get("/export.ndjson")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+
+    lines = response.text.splitlines()
+    items = [json.loads(line) for line in lines]
+    questions = client.get("/questions", params={"include": "answers"}).json()
+    assert items == questions
+
+
+def test_export_ndjson_since():
+    questions = client.get("/questions").json()
+
+    # Only items created after the cutoff, or whose answer file changed after it
+    response = client.get("/export.ndjson", params={"since": "2100-01-01T00:00:00Z"})
+    for line in response.text.splitlines():
+        # Only rows without a parseable created_at slip through a future cutoff
+        assert not json.loads(line)["created_at"].startswith("20")
+
+    response = client.get("/export.ndjson", params={"since": "0"})
+    assert len(response.text.splitlines()) == len(questions)
+
+    assert (
+        client.get("/export.ndjson", params={"since": "yesterday"}).status_code == 400
+    )
+    for since in ("nan", "inf", "-Infinity", "1e400"):
+        assert (
+            client.get("/export.ndjson", params={"since": since}).status_code == 400
+        )
+
+
+def test_search_endpoint():
+    first = client.get("/questions").json()[0]
+    word = max(first["question"].split(), key=len).strip("?.,")
+
+    response = client.get("/search", params={"q": word})
+    assert response.status_code == 200
+    data = response.json()
+    assert data["total"] > 0
+    assert any(hit["question_id"] == first["id"] for hit in data["results"])
+    for hit in data["results"]:
+        assert {"key", "kind", "title", "score", "snippet"} <= set(hit)
+
+    response = client.get("/search", params={"q": word, "kind": "note"})
+    assert all(hit["kind"] == "note" for hit in response.json()["results"])
+
+
+def test_analysis_job_endpoints(monkeypatch, tmp_path):
+    import main
+    from jobs import JobStore
+
+    async def runner(payload, emit):
+        emit({"type": "batch", "model": "m", "done": 1, "total": 1})
+        return {"analyses": [], "fallback_used": False}
+
+    monkeypatch.setattr(main.job_queue, "runner", runner)
+    monkeypatch.setattr(main.job_queue, "store", JobStore(str(tmp_path / "j.db")))
+    body = {"questions": [{"id": "1", "question": "q", "answer": "a"}]}
+    with TestClient(app) as c:
+        submitted = c.post("/jobs/analyze", json=body)
+        assert submitted.status_code == 202
+        job_id = submitted.json()["id"]
+
+        with c.stream("GET", f"/jobs/{job_id}/events") as stream:
+            text = "".join(stream.iter_text())
+        assert "event: batch" in text
+        assert "event: result" in text
+
+        job = c.get(f"/jobs/{job_id}").json()
+        assert job["status"] == "done"
+        assert job["progress"]["m"]["batches_done"] == 1
+        assert job["result"]["fallback_used"] is False
+        assert c.post("/jobs/analyze", json=body).json()["id"] == job_id
+        assert c.get("/jobs/missing").status_code == 404
+
+
+def test_jobs_forward_hedge_to_the_analysis(monkeypatch):
+    import main
+    from models import ConceptAnalysisResponse
+
+    calls = []
+
+    async def run_analysis(questions, refresh, emit, engine, hedge):
+        calls.append(hedge)
+        return ConceptAnalysisResponse(analyses=[])
+
+    monkeypatch.setattr(main, "run_analysis", run_analysis)
+    payload = {"questions": [], "refresh": False, "engine": "llm"}
+    asyncio.run(main.analysis_job({**payload, "hedge": True}, lambda event: None))
+    asyncio.run(main.analysis_job(payload, lambda event: None))
+    assert calls == [True, None]
+
+
+def test_local_engine_skips_llms():
+    body = {
+        "questions": [
+            {
+                "id": "1",
+                "question": "docker volumes",
+                "answer": "mount",
+                "category": "c",
+            },
+            {
+                "id": "2",
+                "question": "docker images",
+                "answer": "build",
+                "category": "c",
+            },
+        ]
+    }
+    response = client.post("/analyze/concepts?engine=local", json=body)
+    assert response.status_code == 200
+    (analysis,) = response.json()["analyses"]
+    assert analysis["model_name"] == "Local TF-IDF"
+    assert response.json()["fallback_used"] is False
+    assert client.post("/analyze/concepts?engine=gpt", json=body).status_code == 422
+
+
+def test_related_questions(monkeypatch, tmp_path):
+    import main
+
+    monkeypatch.setattr(main.related_index, "path", str(tmp_path / "related.npz"))
+    question_id = client.get("/questions").json()[0]["id"]
+    response = client.get(f"/questions/{question_id}/related?k=3")
+    assert response.status_code == 200
+    related = response.json()["related"]
+    assert len(related) <= 3
+    assert question_id not in [r["id"] for r in related]
+    assert all(r["score"] > 0 for r in related)
+    assert client.get("/questions/missing/related").status_code == 404
+    assert client.get(f"/questions/{question_id}/related?k=0").status_code == 422
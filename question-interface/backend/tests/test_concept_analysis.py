@@ -0,0 +1,344 @@
+import asyncio
+import json
+import re
+import time
+
+import httpx
+
+from concept_analysis import (
+    make_batches,
+    merge_analyses,
+    parse_model_response,
+    run_incremental,
+    run_models,
+)
+from concept_store import ConceptStore
+from models import ModelAnalysis
+
+MODELS = [
+    {"name": "fast", "url": "http://fast", "model": "m"},
+    {"name": "slow", "url": "http://slow", "model": "m"},
+]
+
+REPLY = {"concepts": [{"question_id": "1", "concepts": ["x"]}]}
+
+
+def mock_client(delays):
+    async def handler(request):
+        await asyncio.sleep(delays[request.url.host])
+        return httpx.Response(200, json={"response": json.dumps(REPLY)})
+
+    return httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+
+def test_models_run_concurrently():
+    async def run():
+        async with mock_client({"fast": 0.2, "slow": 0.2}) as client:
+            started = time.perf_counter()
+            analyses = await run_models(client, MODELS, ["prompt"], deadline=5)
+            return analyses, time.perf_counter() - started
+
+    analyses, elapsed = asyncio.run(run())
+    assert [a.model_name for a in analyses] == ["fast", "slow"]
+    assert all(a.concepts == REPLY["concepts"] for a in analyses)
+    assert elapsed < 0.35
+
+
+def test_deadline_cancels_slow_models():
+    async def run():
+        async with mock_client({"fast": 0.0, "slow": 5.0}) as client:
+            return await run_models(client, MODELS, ["prompt"], deadline=0.2)
+
+    fast, slow = asyncio.run(run())
+    assert fast.error is None
+    assert slow.error == "Timed out after 0.2s"
+
+
+def test_cancelling_the_caller_cancels_model_calls():
+    cancelled = []
+
+    async def handler(request):
+        try:
+            await asyncio.sleep(5)
+        except asyncio.CancelledError:
+            cancelled.append(request.url.host)
+            raise
+        return httpx.Response(200, json={"response": json.dumps(REPLY)})
+
+    async def run():
+        transport = httpx.MockTransport(handler)
+        async with httpx.AsyncClient(transport=transport) as client:
+            task = asyncio.ensure_future(run_models(client, MODELS, ["prompt"]))
+            await asyncio.sleep(0.05)
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+            await asyncio.sleep(0.01)
+            # Before asyncio.run() would cancel any leftover tasks
+            return sorted(cancelled)
+
+    assert asyncio.run(run()) == ["fast", "slow"]
+
+
+def test_parse_fenced_json():
+    analysis = parse_model_response("m", 'Sure:\n```json\n{"concepts": []}\n```')
+    assert analysis.error is None
+    assert parse_model_response("m", "no json").error == "No JSON found in response"
+
+
+def test_cached_responses_skip_the_model(tmp_path):
+    from llm_cache import LLMResponseCache
+
+    cache = LLMResponseCache(str(tmp_path / "c.db"))
+    calls = []
+
+    async def handler(request):
+        calls.append(request.url.host)
+        return httpx.Response(200, json={"response": json.dumps(REPLY)})
+
+    async def run(refresh=False):
+        transport = httpx.MockTransport(handler)
+        async with httpx.AsyncClient(transport=transport) as client:
+            return await run_models(
+                client, MODELS, ["prompt"], cache=cache, refresh=refresh
+            )
+
+    first = asyncio.run(run())
+    assert not any(a.cached for a in first)
+    second = asyncio.run(run())
+    assert all(a.cached for a in second)
+    assert second[0].concepts == REPLY["concepts"]
+    assert len(calls) == 2
+
+    asyncio.run(run(refresh=True))
+    assert len(calls) == 4
+
+
+def test_make_batches_respects_budget_and_covers_everything():
+    pairs = [
+        {"id": str(i), "question": "q" * 40, "answer": "a" * 360, "category": "c"}
+        for i in range(25)
+    ]
+    batches = make_batches(pairs, budget=500)
+    assert [qa["id"] for batch in batches for qa in batch] == [qa["id"] for qa in pairs]
+    assert len(batches) > 1
+    assert all(len(batch) <= 5 for batch in batches)
+
+
+def test_merge_analyses_unions_batches():
+    part1 = ModelAnalysis(
+        model_name="m",
+        concepts=[{"question_id": "1", "concepts": ["etl"]}],
+        relationships=[
+            {
+                "question1_id": "1",
+                "question2_id": "2",
+                "relationship": "similar",
+                "strength": 0.4,
+            }
+        ],
+        suggested_clusters=[{"name": "Data", "question_ids": ["1"], "themes": ["etl"]}],
+    )
+    part2 = ModelAnalysis(
+        model_name="m",
+        concepts=[
+            {"question_id": "1", "concepts": ["etl", "sql"]},
+            {"question_id": "3", "concepts": ["docker"]},
+        ],
+        relationships=[
+            {
+                "question1_id": "2",
+                "question2_id": "1",
+                "relationship": "similar",
+                "strength": 0.9,
+            }
+        ],
+        suggested_clusters=[
+            {"name": "data ", "question_ids": ["3"], "themes": ["ops"]}
+        ],
+    )
+    merged = merge_analyses("m", [part1, part2])
+    assert merged.concepts == [
+        {"question_id": "1", "concepts": ["etl", "sql"]},
+        {"question_id": "3", "concepts": ["docker"]},
+    ]
+    assert [r["strength"] for r in merged.relationships] == [0.9]
+    assert merged.suggested_clusters == [
+        {"name": "Data", "question_ids": ["1", "3"], "themes": ["etl", "ops"]}
+    ]
+    assert merged.error is None
+
+
+def test_batches_run_under_concurrency_limit():
+    in_flight = []
+    peak = []
+
+    async def handler(request):
+        in_flight.append(1)
+        peak.append(len(in_flight))
+        await asyncio.sleep(0.05)
+        in_flight.pop()
+        return httpx.Response(200, json={"response": json.dumps(REPLY)})
+
+    async def run():
+        transport = httpx.MockTransport(handler)
+        async with httpx.AsyncClient(transport=transport) as client:
+            return await run_models(
+                client, MODELS[:1], ["p1", "p2", "p3", "p4", "p5"], concurrency=2
+            )
+
+    (analysis,) = asyncio.run(run())
+    assert analysis.error is None
+    assert max(peak) == 2
+    assert len(peak) == 5
+
+
+def test_incremental_analysis_only_sends_changed_pairs(tmp_path):
+    store = ConceptStore(str(tmp_path / "concepts.db"))
+    prompts = []
+
+    async def handler(request):
+        prompt = json.loads(request.content)["prompt"]
+        prompts.append(prompt)
+        ids = re.findall(r"^Q\d+ \(id: (\w+)\)", prompt, re.MULTILINE)
+        reply = {
+            "concepts": [{"question_id": qid, "concepts": [f"c{qid}"]} for qid in ids],
+            "relationships": [
+                {"question1_id": "1", "question2_id": "2", "relationship": "similar"}
+            ],
+            "suggested_clusters": [{"name": "All", "question_ids": ids}],
+        }
+        return httpx.Response(200, json={"response": json.dumps(reply)})
+
+    def pairs(answer2="b"):
+        return [
+            {"id": "1", "question": "q1", "answer": "a", "category": "c"},
+            {"id": "2", "question": "q2", "answer": answer2, "category": "c"},
+            {"id": "3", "question": "q3", "answer": "c", "category": "c"},
+        ]
+
+    async def run(qa_pairs):
+        transport = httpx.MockTransport(handler)
+        async with httpx.AsyncClient(transport=transport) as client:
+            (analysis,) = await run_incremental(client, MODELS[:1], qa_pairs, store)
+            return analysis
+
+    first = asyncio.run(run(pairs()))
+    assert len(prompts) == 1 and not first.cached
+    assert [c["question_id"] for c in first.concepts] == ["1", "2", "3"]
+
+    second = asyncio.run(run(pairs()))
+    assert len(prompts) == 1 and second.cached
+    assert second.concepts == first.concepts
+    assert second.relationships == first.relationships
+
+    third = asyncio.run(run(pairs(answer2="changed")))
+    assert len(prompts) == 2 and not third.cached
+    # Only the changed pair is sent, with its stored neighbour as context
+    assert re.findall(r"\(id: (\w+)\)", prompts[1]) == ["2"]
+    assert "- id 1: c1" in prompts[1]
+    assert [c["question_id"] for c in third.concepts] == ["1", "2", "3"]
+    assert len(third.relationships) == 1
+    assert sorted(third.suggested_clusters[0]["question_ids"]) == ["1", "2", "3"]
+
+
+def test_new_pairs_get_similar_context_and_omitted_pairs_are_dropped(tmp_path):
+    store = ConceptStore(str(tmp_path / "concepts.db"))
+    prompts = []
+    skip = set()
+
+    async def handler(request):
+        prompt = json.loads(request.content)["prompt"]
+        prompts.append(prompt)
+        ids = re.findall(r"^Q\d+ \(id: (\w+)\)", prompt, re.MULTILINE)
+        reply = {
+            "concepts": [
+                {"question_id": qid, "concepts": [f"c{qid}"]}
+                for qid in ids
+                if qid not in skip
+            ],
+            "relationships": [],
+            "suggested_clusters": [],
+        }
+        return httpx.Response(200, json={"response": json.dumps(reply)})
+
+    existing = [
+        {
+            "id": "docker",
+            "question": "How do docker volumes persist data?",
+            "answer": "Mount a named volume into the container.",
+            "category": "c",
+        },
+        {
+            "id": "budget",
+            "question": "How do I plan a monthly budget?",
+            "answer": "Track income and expenses each month.",
+            "category": "c",
+        },
+    ]
+
+    async def run(qa_pairs):
+        transport = httpx.MockTransport(handler)
+        async with httpx.AsyncClient(transport=transport) as client:
+            (analysis,) = await run_incremental(client, MODELS[:1], qa_pairs, store)
+            return analysis
+
+    asyncio.run(run(existing))
+    added = {
+        "id": "bind",
+        "question": "Docker volumes or bind mounts?",
+        "answer": "A named volume is managed by docker.",
+        "category": "c",
+    }
+    asyncio.run(run(existing + [added]))
+    # The new question has no stored edges, but its content peer is listed
+    assert "- id docker: cdocker" in prompts[1]
+    assert "- id budget" not in prompts[1]
+
+    skip.add("docker")
+    changed = [dict(existing[0], answer="Volumes outlive the container.")]
+    analysis = asyncio.run(run(changed + existing[1:] + [added]))
+    # The model left the changed pair out: its old concepts are not served
+    assert [c["question_id"] for c in analysis.concepts] == ["budget", "bind"]
+    skip.clear()
+    analysis = asyncio.run(run(changed + existing[1:] + [added]))
+    assert re.findall(r"^Q\d+ \(id: (\w+)\)", prompts[-1], re.MULTILINE) == ["docker"]
+    assert [c["question_id"] for c in analysis.concepts] == ["docker", "budget", "bind"]
+
+
+def test_stream_models_yields_items_before_done():
+    from concept_analysis import stream_models
+
+    reply = json.dumps(REPLY)
+
+    async def handler(request):
+        if request.url.path == "/v1/chat/completions":
+            body = "".join(
+                f"data: {json.dumps({'choices': [{'delta': {'content': reply[i:i + 8]}}]})}\n\n"
+                for i in range(0, len(reply), 8)
+            )
+            return httpx.Response(200, text=body + "data: [DONE]\n\n")
+        lines = [
+            json.dumps({"response": reply[i : i + 8], "done": False})
+            for i in range(0, len(reply), 8)
+        ]
+        lines.append(json.dumps({"response": "", "done": True}))
+        return httpx.Response(200, text="\n".join(lines))
+
+    models = [
+        {"name": "ollama", "url": "http://o", "model": "m"},
+        {"name": "lmstudio", "url": "http://l", "model": "m", "api": "openai"},
+    ]
+
+    async def run():
+        transport = httpx.MockTransport(handler)
+        async with httpx.AsyncClient(transport=transport) as client:
+            return [event async for event in stream_models(client, models, ["p"])]
+
+    events = asyncio.run(run())
+    for name in ("ollama", "lmstudio"):
+        mine = [e for e in events if e["model"] == name]
+        types = [e["type"] for e in mine]
+        assert types[-1] == "done"
+        assert types.index("concept") < len(types) - 1
+        assert "".join(e["text"] for e in mine if e["type"] == "delta") == reply
+        assert mine[-1]["analysis"]["concepts"] == REPLY["concepts"]
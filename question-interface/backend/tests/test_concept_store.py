@@ -0,0 +1,47 @@
+from concept_store import ConceptStore, model_key
+
+
+def rel(q1, q2, kind="similar"):
+    return {"question1_id": q1, "question2_id": q2, "relationship": kind}
+
+
+def test_apply_replaces_only_the_updated_neighbourhood(tmp_path):
+    store = ConceptStore(str(tmp_path / "concepts.db"))
+    store.apply(
+        "m",
+        {"1": "h1", "2": "h2", "3": "h3"},
+        [{"question_id": q, "concepts": [f"c{q}"]} for q in ("1", "2", "3")],
+        [rel("1", "2"), rel("2", "3")],
+        [
+            {"name": "A", "question_ids": ["1", "2"]},
+            {"name": "B", "question_ids": ["3"]},
+        ],
+    )
+
+    updated = store.apply(
+        "m",
+        {"2": "h2b", "4": "h4"},
+        [{"question_id": "2", "concepts": ["new"]}],  # nothing back for 4
+        [rel("2", "3", "contrasts"), rel("1", "3")],
+        [{"name": "b", "question_ids": ["2"]}],
+    )
+    assert updated == {"2"}
+
+    graph = store.load("m")
+    assert graph.hashes == {"1": "h1", "2": "h2b", "3": "h3"}
+    assert graph.concepts["2"] == ["new"]
+    # Relationships of 2 replaced; ones between unchanged questions ignored
+    assert [r["relationship"] for r in graph.relationships] == ["contrasts"]
+    assert graph.clusters == [
+        {"name": "A", "question_ids": ["1"]},
+        {"name": "B", "question_ids": ["3", "2"]},
+    ]
+    assert graph.neighbors(["3"]) == {"2"}
+    assert graph.restrict(["1", "2"]).relationships == []
+    assert store.load("other").concepts == {}
+
+
+def test_model_key_ignores_display_name():
+    config = {"name": "x", "url": "http://h", "model": "m"}
+    assert model_key(config) == model_key(dict(config, name="y"))
+    assert model_key(config) != model_key(dict(config, model="n"))
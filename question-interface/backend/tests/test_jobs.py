@@ -0,0 +1,147 @@
+import asyncio
+
+from jobs import DONE, FAILED, Job, JobQueue, JobStore
+
+
+def make_runner(calls):
+    async def runner(payload, emit):
+        calls.append(payload)
+        for done in range(1, 3):
+            await asyncio.sleep(0.01)
+            emit({"type": "batch", "model": "m", "done": done, "total": 2})
+        emit({"type": "model", "model": "m", "status": "done", "error": None})
+        return {"answer": payload["n"] * 2}
+
+    return runner
+
+
+async def collect(queue, job, after=0):
+    return [item for item in [x async for x in queue.follow(job, after)] if item]
+
+
+def test_job_runs_in_background_and_reports_progress(tmp_path):
+    calls = []
+    queue = JobQueue(make_runner(calls), JobStore(str(tmp_path / "jobs.db")))
+
+    async def run():
+        job = await queue.submit({"n": 21})
+        assert job.status == "queued"
+        events = await collect(queue, job)
+        return job, events
+
+    job, events = asyncio.run(run())
+    assert job.status == DONE
+    assert job.result == {"answer": 42}
+    assert [e["status"] for _, e in events if e["type"] == "status"] == [
+        "queued",
+        "running",
+        "done",
+    ]
+    assert job.progress() == {"m": {"status": "done", "batches_done": 2, "batches": 2}}
+    # Reconnecting after an event index only replays what came later
+    later = asyncio.run(collect(queue, job, after=len(events) - 1))
+    assert later == events[-1:]
+
+
+def test_identical_submissions_reuse_the_job(tmp_path):
+    calls = []
+    path = str(tmp_path / "jobs.db")
+    queue = JobQueue(make_runner(calls), JobStore(path))
+
+    async def run():
+        first = await queue.submit({"n": 1})
+        second = await queue.submit({"n": 1})
+        assert second is first
+        # Concurrent submissions also share one job
+        third, fourth = await asyncio.gather(
+            queue.submit({"n": 1}), queue.submit({"n": 1})
+        )
+        assert third is fourth is first
+        await collect(queue, first)
+        return first
+
+    first = asyncio.run(run())
+    assert len(calls) == 1
+
+    # A fresh process serves the persisted result instead of recomputing
+    restarted = JobQueue(make_runner(calls), JobStore(path))
+    stored = asyncio.run(restarted.get(first.id))
+    assert stored.status == DONE and stored.result == {"answer": 2}
+    assert stored.events == first.events
+
+    async def resubmit():
+        same = await restarted.submit({"n": 1})
+        fresh = await restarted.submit({"n": 1}, reuse=False)
+        await collect(restarted, fresh)
+        return same, fresh
+
+    same, fresh = asyncio.run(resubmit())
+    assert same.id == first.id
+    assert fresh.id != first.id and fresh.status == DONE
+    assert len(calls) == 2
+
+
+def test_concurrency_is_bounded_and_failures_are_recorded(tmp_path):
+    running = []
+    peak = []
+
+    async def runner(payload, emit):
+        running.append(1)
+        peak.append(len(running))
+        await asyncio.sleep(0.02)
+        running.pop()
+        if payload["n"] == 0:
+            raise ValueError("bad input")
+        return {}
+
+    queue = JobQueue(runner, JobStore(str(tmp_path / "jobs.db")), concurrency=2)
+
+    async def run():
+        jobs = [await queue.submit({"n": n}) for n in range(5)]
+        for job in jobs:
+            await collect(queue, job)
+        return jobs
+
+    jobs = asyncio.run(run())
+    assert max(peak) == 2
+    assert jobs[0].status == FAILED and jobs[0].error == "bad input"
+    assert all(job.status == DONE for job in jobs[1:])
+
+
+def test_unfinished_jobs_are_failed_after_restart(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.db"))
+    store.insert(Job("abc", "k", {"n": 1}))
+    job = asyncio.run(JobQueue(make_runner([]), store).get("abc"))
+    assert job.status == FAILED
+    assert job.error == "Interrupted by server restart"
+    # The failure is persisted along with the job's other writes
+    assert store.load("abc").status == FAILED
+    assert asyncio.run(JobQueue(make_runner([]), store).get("missing")) is None
+
+
+def test_unreusable_results_are_recomputed(tmp_path):
+    calls = []
+
+    async def runner(payload, emit):
+        calls.append(payload)
+        return {"fallback_used": len(calls) == 1}
+
+    queue = JobQueue(
+        runner,
+        JobStore(str(tmp_path / "jobs.db")),
+        reusable=lambda result: not result["fallback_used"],
+    )
+
+    async def run():
+        jobs = []
+        for _ in range(3):
+            job = await queue.submit({"n": 1})
+            await collect(queue, job)
+            jobs.append(job)
+        return jobs
+
+    degraded, recomputed, reused = asyncio.run(run())
+    assert len(calls) == 2
+    assert degraded.result == {"fallback_used": True}
+    assert recomputed.id != degraded.id
+    assert reused.id == recomputed.id
@@ -0,0 +1,40 @@
+import json
+
+from json_stream import ConceptStreamParser
+
+REPLY = {
+    "concepts": [
+        {"question_id": "1", "concepts": ["a {brace}", 'quote "x"']},
+        {"question_id": "2", "concepts": ["b"]},
+    ],
+    "relationships": [
+        {"question1_id": "1", "question2_id": "2", "relationship": "similar"}
+    ],
+    "suggested_clusters": [{"name": "c", "question_ids": ["1", "2"]}],
+}
+
+
+def test_elements_surface_as_soon_as_they_close():
+    text = "Here you go:\n```json\n" + json.dumps(REPLY, indent=2) + "\n```"
+    parser = ConceptStreamParser()
+    seen = []
+    first_at = None
+    for i in range(0, len(text), 3):
+        found = parser.feed(text[i : i + 3])
+        if found and first_at is None:
+            first_at = i
+        seen.extend(found)
+    assert seen == [
+        ("concepts", REPLY["concepts"][0]),
+        ("concepts", REPLY["concepts"][1]),
+        ("relationships", REPLY["relationships"][0]),
+        ("suggested_clusters", REPLY["suggested_clusters"][0]),
+    ]
+    # The first concept is reported long before the reply is complete
+    assert first_at < len(text) // 3
+
+
+def test_nested_objects_and_other_keys_are_not_reported():
+    parser = ConceptStreamParser()
+    reply = {"meta": [{"x": 1}], "concepts": [{"question_id": "1", "extra": {"y": 2}}]}
+    assert parser.feed(json.dumps(reply)) == [("concepts", reply["concepts"][0])]
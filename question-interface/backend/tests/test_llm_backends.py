@@ -0,0 +1,91 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from llm_backends import (
+    LLM_MIN_TIMEOUT,
+    LLM_TIMEOUT,
+    CircuitBreaker,
+    CircuitOpenError,
+    LLMError,
+    generate,
+)
+
+CONFIG = {"name": "m", "url": "http://llm", "model": "m"}
+
+
+def client_for(statuses):
+    """Mock server answering with the given status codes in turn."""
+    replies = iter(statuses)
+
+    async def handler(request):
+        status = next(replies)
+        if status is None:
+            raise httpx.ConnectError("refused", request=request)
+        return httpx.Response(status, json={"response": json.dumps({"ok": 1})})
+
+    return httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+
+def run_calls(breaker, statuses, calls):
+    async def run():
+        outcomes = []
+        async with client_for(statuses) as client:
+            for _ in range(calls):
+                try:
+                    await generate(client, CONFIG, "prompt", breaker)
+                    outcomes.append("ok")
+                except CircuitOpenError:
+                    outcomes.append("rejected")
+                except (LLMError, httpx.HTTPError):
+                    outcomes.append("error")
+        return outcomes
+
+    return asyncio.run(run())
+
+
+def test_breaker_opens_after_consecutive_failures():
+    breaker = CircuitBreaker("llm", failure_threshold=2, cooldown=60)
+    outcomes = run_calls(breaker, [500, None], 4)
+    assert outcomes == ["error", "error", "rejected", "rejected"]
+    stats = breaker.stats()
+    assert stats["state"] == "open"
+    assert (stats["failures"], stats["rejected"]) == (2, 2)
+
+
+def test_client_errors_do_not_trip_the_breaker():
+    breaker = CircuitBreaker("llm", failure_threshold=1)
+    assert run_calls(breaker, [404, 404], 2) == ["error", "error"]
+    assert breaker.state == "closed"
+    assert breaker.failures == 0
+
+
+def test_half_open_trial_closes_or_reopens():
+    breaker = CircuitBreaker("llm", failure_threshold=1, cooldown=0)
+    assert run_calls(breaker, [503, 503], 2) == ["error", "error"]
+    assert breaker.state == "open"
+    assert run_calls(breaker, [200], 1) == ["ok"]
+    assert breaker.state == "closed"
+    assert breaker.consecutive_failures == 0
+
+
+def test_half_open_allows_a_single_trial():
+    breaker = CircuitBreaker("llm", failure_threshold=1, cooldown=0)
+    breaker.failure()
+    assert breaker.allow()
+    assert breaker.state == "half_open"
+    assert not breaker.allow()
+
+
+def test_timeout_adapts_to_observed_latency():
+    breaker = CircuitBreaker("llm")
+    assert breaker.timeout() == LLM_TIMEOUT.read
+    for _ in range(10):
+        breaker.success(0.5)
+    assert breaker.timeout() == pytest.approx(LLM_MIN_TIMEOUT)
+    for _ in range(50):
+        breaker.success(8.0)
+    assert breaker.percentile(0.95) == 8.0
+    assert breaker.timeout() == min(LLM_TIMEOUT.read, 24.0)
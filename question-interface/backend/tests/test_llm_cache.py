@@ -0,0 +1,46 @@
+import time
+
+from llm_cache import LLMResponseCache, cache_key
+
+CONFIG = {"name": "Ollama", "url": "http://localhost:11434", "model": "m"}
+
+
+def test_key_ignores_display_name_but_not_model_or_prompt():
+    renamed = dict(CONFIG, name="Other label")
+    assert cache_key(CONFIG, "p") == cache_key(renamed, "p")
+    assert cache_key(CONFIG, "p") != cache_key(CONFIG, "q")
+    assert cache_key(CONFIG, "p") != cache_key(dict(CONFIG, model="n"), "p")
+
+
+def test_key_does_not_depend_on_pool_members():
+    pool = dict(CONFIG, urls=["http://a", "http://b"], url="http://a")
+    reordered = dict(pool, urls=["http://b", "http://a", "http://c"], url="http://b")
+    assert cache_key(pool, "p") == cache_key(reordered, "p")
+    assert cache_key(CONFIG, "p") != cache_key(dict(CONFIG, url="http://b"), "p")
+
+
+def test_roundtrip_and_ttl(tmp_path):
+    cache = LLMResponseCache(str(tmp_path / "c.db"), ttl=60)
+    cache.put("k", "m", '{"concepts": []}')
+    assert cache.get("k") == '{"concepts": []}'
+    assert cache.get("missing") is None
+
+    expired = LLMResponseCache(str(tmp_path / "c.db"), ttl=0)
+    time.sleep(0.01)
+    assert expired.get("k") is None
+    assert cache.get("k") is None
+
+
+def test_size_bound_evicts_least_recently_used(tmp_path):
+    cache = LLMResponseCache(str(tmp_path / "c.db"), ttl=60, max_bytes=10**9)
+    for key in ("a", "b", "c"):
+        cache.put(key, "m", key * 1000)
+        time.sleep(0.01)
+    cache.get("a")  # a is now more recent than b
+    entry_size = cache.stats()["bytes"] // 3
+
+    cache.max_bytes = entry_size * 3
+    cache.put("d", "m", "d" * 1000)
+    assert cache.get("b") is None
+    assert cache.get("a") == "a" * 1000
+    assert cache.get("d") == "d" * 1000
@@ -0,0 +1,97 @@
+import asyncio
+import json
+import time
+
+import httpx
+
+from concept_analysis import run_models, stream_models
+from llm_health import BackendRegistry
+from llm_router import ModelRouter
+
+MODELS = [
+    {"name": "up", "url": "http://up", "model": "m"},
+    {"name": "down", "url": "http://down", "model": "m", "api": "openai"},
+]
+
+REPLY = {"concepts": [{"question_id": "1", "concepts": ["x"]}]}
+
+
+def mock_client(calls):
+    async def handler(request):
+        calls.append((request.url.host, request.url.path))
+        if request.url.host == "down":
+            await asyncio.sleep(0.2)
+            raise httpx.ConnectError("refused", request=request)
+        if request.url.path == "/api/tags":
+            await asyncio.sleep(0.2)
+            return httpx.Response(200, json={"models": []})
+        return httpx.Response(200, json={"response": json.dumps(REPLY)})
+
+    return httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+
+def test_probes_run_in_parallel_and_are_cached():
+    health = BackendRegistry(MODELS, ttl=60)
+    calls = []
+
+    async def run():
+        async with mock_client(calls) as client:
+            started = time.perf_counter()
+            await health.refresh(client)
+            return time.perf_counter() - started
+
+    assert asyncio.run(run()) < 0.35
+    assert sorted(calls) == [("down", "/v1/models"), ("up", "/api/tags")]
+    assert health.state("http://up") is True
+    assert health.is_down("http://down")
+    by_url = {status["url"]: status for status in health.snapshot()}
+    assert by_url["http://down"]["available"] is False
+    assert "refused" in by_url["http://down"]["error"]
+
+
+def test_expired_state_is_unknown():
+    health = BackendRegistry(MODELS, ttl=0)
+    health.record("http://down", False, "refused")
+    time.sleep(0.01)
+    assert health.state("http://down") is None
+    assert not health.is_down("http://down")
+
+
+def test_known_down_models_are_skipped():
+    health = BackendRegistry(MODELS, ttl=60)
+    health.record("http://down", False, "refused")
+    router = ModelRouter(health)
+    calls, events = [], []
+
+    async def run():
+        async with mock_client(calls) as client:
+            analyses = await run_models(
+                client, MODELS, ["prompt"], on_progress=events.append, router=router
+            )
+            streamed = [
+                e async for e in stream_models(client, MODELS, ["p"], router=router)
+            ]
+            return analyses, streamed
+
+    (up, down), streamed = asyncio.run(run())
+    assert up.concepts == REPLY["concepts"]
+    assert down.error == "Backend unavailable: http://down"
+    assert all(host == "up" for host, _ in calls)
+    assert {e["model"]: e["status"] for e in events if e["type"] == "model"} == {
+        "up": "done",
+        "down": "skipped",
+    }
+    done = {e["model"]: e for e in streamed if e["type"] == "done"}
+    assert done["down"]["analysis"]["error"] == "Backend unavailable: http://down"
+
+
+def test_open_breaker_counts_as_down():
+    health = BackendRegistry(MODELS, ttl=60)
+    health.record("http://up", True)
+    breaker = health.breaker("http://up")
+    for _ in range(breaker.failure_threshold):
+        breaker.failure()
+    assert health.is_down("http://up")
+    by_url = {status["url"]: status for status in health.snapshot()}
+    assert by_url["http://up"]["breaker"]["state"] == "open"
+    assert by_url["http://up"]["breaker"]["failures"] == breaker.failure_threshold
@@ -0,0 +1,233 @@
+import asyncio
+import json
+import time
+
+import httpx
+import pytest
+
+from llm_backends import LLMError
+from llm_health import BackendRegistry
+from llm_router import ModelRouter
+
+POOL = {
+    "name": "pool",
+    "url": "http://a",
+    "urls": ["http://a", "http://b", "http://c"],
+    "model": "m",
+}
+
+
+def pool_client(in_flight, peak, failing=()):
+    async def handler(request):
+        host = request.url.host
+        if host in failing:
+            raise httpx.ConnectError("refused", request=request)
+        in_flight[host] = in_flight.get(host, 0) + 1
+        peak[host] = max(peak.get(host, 0), in_flight[host])
+        await asyncio.sleep(0.05)
+        in_flight[host] -= 1
+        if json.loads(request.content)["stream"]:
+            lines = [json.dumps({"response": host}), json.dumps({"done": True})]
+            return httpx.Response(200, text="\n".join(lines))
+        return httpx.Response(200, json={"response": host})
+
+    return httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+
+def test_calls_spread_over_the_pool_within_caps():
+    router = ModelRouter(BackendRegistry([POOL]), per_endpoint=2)
+    in_flight, peak = {}, {}
+
+    async def run():
+        async with pool_client(in_flight, peak) as client:
+            return await asyncio.gather(
+                *(router.generate(client, POOL, "p") for _ in range(12))
+            )
+
+    served_by = asyncio.run(run())
+    assert sorted(set(served_by)) == ["a", "b", "c"]
+    assert max(peak.values()) <= 2
+    assert router.capacity(POOL) == 6
+    counts = {s["url"]: s["served"] for s in router.snapshot()}
+    assert counts == {"http://a": 4, "http://b": 4, "http://c": 4}
+
+
+def test_saturated_pool_does_not_hold_up_another():
+    slow = {"name": "slow", "url": "http://a", "model": "m"}
+    fast = {"name": "fast", "url": "http://b", "model": "m"}
+    router = ModelRouter(BackendRegistry([slow, fast]), per_endpoint=1)
+    finished = {}
+
+    async def call(client, config, key, started):
+        await router.generate(client, config, "p")
+        finished[key] = time.perf_counter() - started
+
+    async def run():
+        async with delayed_client({"a": 0.3, "b": 0.05}) as client:
+            started = time.perf_counter()
+            await asyncio.gather(
+                *(
+                    call(client, config, f"{config['name']}{i}", started)
+                    for i in range(4)
+                    for config in (slow, fast)
+                )
+            )
+
+    asyncio.run(run())
+    # The fast pool's slot is handed to its own queued calls, not parked
+    # behind waiters of the busy slow pool
+    assert finished["fast3"] < 0.3
+    assert finished["slow3"] >= 1.2
+
+
+def test_failover_to_another_endpoint():
+    health = BackendRegistry([POOL])
+    router = ModelRouter(health, per_endpoint=1)
+
+    async def run():
+        async with pool_client({}, {}, failing={"a"}) as client:
+            reply = await router.generate(client, POOL, "p")
+            streamed = [t async for t in router.stream(client, POOL, "p")]
+            return reply, streamed
+
+    reply, streamed = asyncio.run(run())
+    assert reply == "b"
+    assert streamed == ["b"]
+    assert health.breaker("http://a").failures == 2
+    assert {s["url"]: s["failovers"] for s in router.snapshot()}["http://b"] == 2
+
+
+def test_down_endpoints_are_skipped_and_exhaustion_raises():
+    health = BackendRegistry([POOL])
+    router = ModelRouter(health)
+    for url in ("http://a", "http://b"):
+        health.record(url, False, "refused")
+    assert not router.is_down(POOL)
+
+    async def run(failing):
+        async with pool_client({}, {}, failing=failing) as client:
+            return await router.generate(client, POOL, "p")
+
+    assert asyncio.run(run(())) == "c"
+    with pytest.raises(httpx.ConnectError):
+        asyncio.run(run({"c"}))
+    health.record("http://c", False, "refused")
+    assert router.is_down(POOL)
+    with pytest.raises(LLMError, match="No available endpoint"):
+        asyncio.run(run(()))
+
+
+def delayed_client(delays, failing=()):
+    async def handler(request):
+        host = request.url.host
+        await asyncio.sleep(delays[host])
+        if host in failing:
+            return httpx.Response(500, text="boom")
+        return httpx.Response(200, json={"response": host})
+
+    return httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+
+def warmed_router(latency=0.05):
+    health = BackendRegistry([POOL])
+    for _ in range(10):
+        health.breaker("http://a").success(latency)
+    return ModelRouter(health, per_endpoint=1, hedge=True)
+
+
+def test_slow_primary_is_hedged_and_loser_cancelled():
+    router = warmed_router()
+    cancelled = []
+
+    async def handler(request):
+        host = request.url.host
+        try:
+            await asyncio.sleep({"a": 1.0, "b": 0.01, "c": 1.0}[host])
+        except asyncio.CancelledError:
+            cancelled.append(host)
+            raise
+        return httpx.Response(200, json={"response": host})
+
+    async def run():
+        transport = httpx.MockTransport(handler)
+        async with httpx.AsyncClient(transport=transport) as client:
+            started = time.perf_counter()
+            reply = await router.generate(client, POOL, "p")
+            await asyncio.sleep(0.01)
+            return reply, time.perf_counter() - started
+
+    reply, elapsed = asyncio.run(run())
+    assert reply == "b"
+    assert elapsed < 0.5
+    assert cancelled == ["a"]
+    stats = router.hedge_stats()
+    assert (stats["calls"], stats["hedged"], stats["hedge_won"]) == (1, 1, 1)
+    (record,) = stats["recent"]
+    assert record["primary"] == "http://a"
+    assert record["hedge"] == record["winner"] == "http://b"
+    assert record["delay_ms"] == 50.0
+    assert router.health.breaker("http://a").failures == 0
+
+
+def test_fast_primary_is_not_hedged():
+    router = warmed_router()
+
+    async def run():
+        async with delayed_client({"a": 0.0, "b": 0.0, "c": 0.0}) as client:
+            return await router.generate(client, POOL, "p")
+
+    assert asyncio.run(run()) == "a"
+    stats = router.hedge_stats()
+    assert (stats["calls"], stats["hedged"]) == (1, 0)
+    assert stats["recent"][0]["winner"] == "http://a"
+
+
+def test_hedging_needs_latency_history_and_opt_in():
+    router = ModelRouter(BackendRegistry([POOL]), per_endpoint=1)
+
+    async def run(r):
+        async with delayed_client({"a": 0.0, "b": 0.0, "c": 0.0}) as client:
+            return await r.generate(client, POOL, "p")
+
+    assert asyncio.run(run(router)) == "a"
+    assert router.hedge_stats()["calls"] == 0
+    hedging = router.with_hedging()
+    assert asyncio.run(run(hedging)) == "a"
+    assert router.hedge_stats()["no_history"] == 1
+    assert not router.hedge
+
+
+def test_failed_primary_waits_for_the_hedge():
+    router = warmed_router(latency=0.02)
+
+    async def run():
+        async with delayed_client(
+            {"a": 0.1, "b": 0.2, "c": 0.0}, failing={"a"}
+        ) as client:
+            return await router.generate(client, POOL, "p")
+
+    assert asyncio.run(run()) == "b"
+    assert router.hedge_stats()["hedge_won"] == 1
+
+
+def test_waiters_leave_every_queue_when_done_or_cancelled():
+    router = ModelRouter(BackendRegistry([POOL]), per_endpoint=1)
+
+    async def run():
+        async with delayed_client({"a": 0.1, "b": 0.1, "c": 0.1}) as client:
+            busy = [
+                asyncio.ensure_future(router.generate(client, POOL, "p"))
+                for _ in range(3)
+            ]
+            await asyncio.sleep(0.01)
+            # Pool full: these two queue on all three endpoints
+            with pytest.raises(asyncio.TimeoutError):
+                await asyncio.wait_for(router.generate(client, POOL, "p"), 0.02)
+            queued = asyncio.ensure_future(router.generate(client, POOL, "p"))
+            await asyncio.sleep(0.01)
+            queues = {url: len(waiters) for url, waiters in router._waiters.items()}
+            await asyncio.gather(*busy, queued)
+            return queues
+
+    assert asyncio.run(run()) == {"http://a": 1, "http://b": 1, "http://c": 1}
+    assert router._waiters == {}
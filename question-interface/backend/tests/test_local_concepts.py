@@ -0,0 +1,63 @@
+import time
+
+from local_concepts import local_analysis
+
+TOPICS = {
+    "docker": "docker container image registry compose volume",
+    "python": "python pandas dataframe numpy pip virtualenv",
+    "finance": "budget savings mortgage interest retirement account",
+}
+
+
+def make_pairs(per_topic):
+    pairs = []
+    for topic, words in TOPICS.items():
+        vocab = words.split()
+        for i in range(per_topic):
+            picked = [vocab[(i + k) % len(vocab)] for k in range(4)]
+            pairs.append(
+                {
+                    "id": f"{topic}-{i}",
+                    "question": f"How do I use {picked[0]} with {picked[1]}?",
+                    "answer": f"Use {picked[2]} and {picked[3]} for {topic}.",
+                    "category": "misc",
+                }
+            )
+    return pairs
+
+
+def test_clusters_follow_topics_and_are_named_from_terms():
+    analysis = local_analysis(make_pairs(8), n_clusters=3)
+    assert analysis.error is None
+    groups = {
+        frozenset(qid.split("-")[0] for qid in cluster["question_ids"])
+        for cluster in analysis.suggested_clusters
+    }
+    assert groups == {frozenset([topic]) for topic in TOPICS}
+    for cluster in analysis.suggested_clusters:
+        topic = cluster["question_ids"][0].split("-")[0]
+        assert set(cluster["themes"]) & set(TOPICS[topic].split() + [topic])
+
+
+def test_relationships_link_similar_questions_only():
+    analysis = local_analysis(make_pairs(6))
+    assert analysis.relationships
+    for rel in analysis.relationships:
+        assert rel["question1_id"].split("-")[0] == rel["question2_id"].split("-")[0]
+        assert 0.2 <= rel["strength"] <= 1.0
+    concepts = {c["question_id"]: c["concepts"] for c in analysis.concepts}
+    assert len(concepts["docker-0"]) == 5
+
+
+def test_thousands_of_items_in_under_a_second():
+    pairs = make_pairs(1000)
+    started = time.perf_counter()
+    analysis = local_analysis(pairs)
+    assert time.perf_counter() - started < 1.0
+    assert len(analysis.concepts) == 3000
+
+
+def test_small_inputs():
+    assert local_analysis([]).suggested_clusters == []
+    (only,) = local_analysis(make_pairs(1)[:1]).suggested_clusters
+    assert only["question_ids"] == ["docker-0"]
@@ -0,0 +1,123 @@
+from concept_analysis import (
+    PROMPT_TEMPLATE,
+    batch_budget,
+    build_prompt,
+    expand_duplicates,
+    prepare_qa_pairs,
+)
+from models import ModelAnalysis
+from prompt_builder import clean_text, count_tokens, dedupe_pairs, truncate_tokens
+
+NOTE = """# Caching
+
+Use **Redis** for [session data](https://redis.io/docs) and `TTL`s.
+
+```python
+cache.set("k", "v", ex=60)
+```
+
+| Store | Latency |
+|-------|---------|
+| Redis | 1 ms |
+
+- Evict with *LRU*
+<br>See https://example.com/more
+"""
+
+
+def test_clean_text_strips_markdown_noise():
+    assert clean_text(NOTE) == (
+        "Caching Use Redis for session data and TTLs. "
+        "Store ; Latency Redis ; 1 ms Evict with LRU See"
+    )
+
+
+def test_clean_text_keeps_identifiers_and_code():
+    assert clean_text("Set my_var_name and call __init__") == (
+        "Set my_var_name and call __init__"
+    )
+    assert clean_text("2*3*4 = 24, and a * b * c") == "2*3*4 = 24, and a * b * c"
+    assert clean_text("Use `**kwargs` or `_x_`, *not* __this__ one") == (
+        "Use **kwargs or _x_, not __this__ one"
+    )
+    assert clean_text("**bold _and_ italic** ~~gone~~") == "bold and italic gone"
+
+
+def test_count_and_truncate_tokens():
+    assert count_tokens("") == 0
+    assert count_tokens("a bc, defgh!") == 6  # a, bc, ",", defg+h, "!"
+    text = "one two three four five"
+    assert truncate_tokens(text, 10) == text
+    assert truncate_tokens(text, 4) == "one two three…"  # "three" is 2 tokens
+    assert truncate_tokens(text, 3) == "one two…"
+    assert count_tokens(truncate_tokens(NOTE * 20, 50)) <= 51
+
+
+def test_prepare_qa_pairs_is_compact_and_deterministic():
+    questions = [
+        {
+            "id": "1",
+            "question": "What is **caching**?",
+            "answer": NOTE,
+            "category": "c",
+        },
+        {"id": "2", "question": "Unanswered?", "answer": "", "category": "c"},
+    ]
+    first = prepare_qa_pairs(questions)
+    assert first == prepare_qa_pairs(questions)
+    assert [qa["id"] for qa in first] == ["1"]
+    assert first[0]["question"] == "What is caching?"
+    assert "```" not in first[0]["answer"] and "https" not in first[0]["answer"]
+
+
+def test_dedupe_folds_near_identical_questions():
+    answer = "Resolvers walk from the root to the authoritative server."
+    pairs = [
+        {"id": "a", "question": "How does DNS resolution work?", "answer": answer},
+        {"id": "b", "question": "What is a CDN?", "answer": "Edge caches."},
+        {"id": "c", "question": "How does DNS resolution work", "answer": answer},
+        {"id": "d", "question": "how does dns resolution WORK?!", "answer": answer},
+        {"id": "e", "question": "How does DNS caching work?", "answer": answer},
+    ]
+    kept, duplicates = dedupe_pairs(pairs)
+    assert [qa["id"] for qa in kept] == ["a", "b", "e"]
+    assert duplicates == {"a": ["c", "d"]}
+
+
+def test_dedupe_keeps_same_question_with_different_answers():
+    pairs = [
+        {"id": "a", "question": "What is a pointer?", "answer": "A memory address."},
+        {"id": "b", "question": "What is a pointer?", "answer": "A mouse cursor."},
+        {"id": "c", "question": "What is a pointer?", "answer": "A memory address"},
+    ]
+    kept, duplicates = dedupe_pairs(pairs)
+    assert [qa["id"] for qa in kept] == ["a", "b"]
+    assert duplicates == {"a": ["c"]}
+
+
+def test_expand_duplicates_covers_folded_ids():
+    analysis = ModelAnalysis(
+        model_name="m",
+        concepts=[{"question_id": "a", "concepts": ["dns"]}],
+        relationships=[],
+        suggested_clusters=[{"name": "net", "question_ids": ["a", "b"]}],
+    )
+    expanded = expand_duplicates(analysis, {"a": ["c"]})
+    assert {c["question_id"] for c in expanded.concepts} == {"a", "c"}
+    assert expanded.relationships[0]["relationship"] == "duplicate"
+    assert expanded.suggested_clusters[0]["question_ids"] == ["a", "b", "c"]
+
+
+def test_batches_fit_the_model_context():
+    small = batch_budget({"context_tokens": 4096})
+    template = count_tokens(PROMPT_TEMPLATE.format(pairs="", context=""))
+    assert template + small + 500 + 1500 <= 4096
+    assert batch_budget({"context_tokens": 100000}) == batch_budget({})
+
+
+def test_build_prompt_orders_and_caps_context():
+    pairs = [{"id": "1", "question": "q", "answer": "a"}]
+    context = {str(i): ["concept"] * 3 for i in range(200, 0, -1)}
+    prompt = build_prompt(pairs, context)
+    assert prompt == build_prompt(pairs, dict(reversed(list(context.items()))))
+    assert "- id 1:" in prompt and "- id 99:" not in prompt
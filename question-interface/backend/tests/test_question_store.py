@@ -0,0 +1,150 @@
+import os
+
+import pytest
+
+from question_storage import CsvStorage, SqliteStorage, export_csv, import_csv
+from question_store import QuestionStore
+
+HEADER = "id,question,category,created_at,status,notes,type\n"
+
+
+def write_csv(path, rows):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(HEADER)
+        for row in rows:
+            f.write(row + "\n")
+
+
+def test_missing_file_is_empty(tmp_path):
+    store = QuestionStore(CsvStorage(str(tmp_path / "missing.csv")))
+    assert store.all() == []
+    assert store.get("1") is None
+
+
+def test_serves_cached_objects_until_file_changes(tmp_path):
+    path = tmp_path / "questions.csv"
+    write_csv(path, ["1,First?,learning,2025-01-01T00:00:00Z,open,,note"])
+    store = QuestionStore(CsvStorage(str(path)))
+
+    first = store.all()
+    assert [q.id for q in first] == ["1"]
+    # Unchanged file: same list object, no reparse
+    assert store.all() is first
+    assert store.get("1") is first[0]
+
+    write_csv(
+        path,
+        [
+            "1,First?,learning,2025-01-01T00:00:00Z,open,,note",
+            "2,Second?,todo,2025-01-02T00:00:00Z,open,,task",
+        ],
+    )
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000))
+
+    assert [q.id for q in store.all()] == ["1", "2"]
+    assert store.get("2").type == "task"
+
+
+def test_invalidate_forces_reload(tmp_path):
+    path = tmp_path / "questions.csv"
+    write_csv(path, ["1,First?,learning,2025-01-01T00:00:00Z,open,,note"])
+    store = QuestionStore(CsvStorage(str(path)))
+    first = store.all()
+    store.invalidate()
+    assert store.all() is not first
+
+
+def test_indexes_filter_and_count(tmp_path):
+    path = tmp_path / "questions.csv"
+    write_csv(
+        path,
+        [
+            "1,First?,learning,2025-01-01T00:00:00Z,open,,note",
+            "2,Second?,todo,2025-01-02T00:00:00Z,open,,task",
+            "3,Third?,todo,2025-01-03T00:00:00Z,done,,task",
+            "4,Fourth?,learning,2025-01-04T00:00:00Z,open,,note",
+        ],
+    )
+    store = QuestionStore(CsvStorage(str(path)))
+
+    assert [q.id for q in store.filter(type="task")] == ["2", "3"]
+    assert [q.id for q in store.filter(type="task", status="open")] == ["2"]
+    assert store.filter(category="nope") == []
+    assert store.counts("category") == {"learning": 2, "todo": 2}
+
+
+def test_filter_rejects_unindexed_field(tmp_path):
+    store = QuestionStore(CsvStorage(str(tmp_path / "missing.csv")))
+    with pytest.raises(ValueError):
+        store.filter(question="x")
+
+
+def test_sqlite_roundtrip_matches_csv(tmp_path):
+    csv_path = tmp_path / "questions.csv"
+    db_path = str(tmp_path / "questions.db")
+    write_csv(
+        csv_path,
+        [
+            "1,First?,learning,2025-01-01T00:00:00Z,open,answer:answers/1.md,note",
+            '2,"Second, with comma?",todo,2025-01-02T00:00:00Z,open,,task',
+        ],
+    )
+    assert import_csv(str(csv_path), db_path) == 2
+
+    csv_store = QuestionStore(CsvStorage(str(csv_path)))
+    db_store = QuestionStore(SqliteStorage(db_path))
+    assert db_store.all() == csv_store.all()
+    assert db_store.storage.get_row("2")["question"] == "Second, with comma?"
+
+    out_path = str(tmp_path / "exported.csv")
+    assert export_csv(db_path, out_path) == 2
+    exported = QuestionStore(CsvStorage(out_path)).all()
+    # Export always writes the full schema; columns absent from the input are blank
+    assert [(q.id, q.question, q.notes, q.type) for q in exported] == [
+        (q.id, q.question, q.notes, q.type) for q in csv_store.all()
+    ]
+    assert exported[0].due_date == ""
+
+
+def test_sqlite_store_reloads_after_append(tmp_path):
+    storage = SqliteStorage(str(tmp_path / "questions.db"))
+    storage.ensure()
+    store = QuestionStore(storage)
+    assert store.all() == []
+
+    storage.append_row(
+        {
+            "id": "1",
+            "question": "First?",
+            "category": "learning",
+            "created_at": "2025-01-01T00:00:00Z",
+            "status": "open",
+            "type": "note",
+        }
+    )
+    assert [q.id for q in store.all()] == ["1"]
+    assert store.filter(category="learning")[0].question == "First?"
+
+
+def test_select_due_range_and_pages(tmp_path):
+    path = tmp_path / "questions.csv"
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("id,question,category,created_at,status,notes,type,due_date\n")
+        f.write("1,A?,todo,2025-01-01T00:00:00Z,open,,task,2025-03-01\n")
+        f.write("2,B?,todo,2025-01-02T00:00:00Z,open,,task,\n")
+        f.write("3,C?,todo,2025-01-03T00:00:00Z,done,,task,2025-01-15\n")
+        f.write("4,D?,todo,2025-01-04T00:00:00Z,open,,task,2025-02-01\n")
+    store = QuestionStore(CsvStorage(str(path)))
+
+    in_range = store.select(due_from="2025-01-15", due_to="2025-02-01")
+    assert [q.id for q in in_range.questions()] == ["3", "4"]
+    open_in_range = store.select(status="open", due_from="2025-01-15")
+    assert [q.id for q in open_in_range.questions()] == ["1", "4"]
+
+    selection = store.select(category="todo")
+    page, after = selection.page(limit=3)
+    assert [q.id for q in page] == ["1", "2", "3"]
+    page, after = selection.page(after, limit=3)
+    assert [q.id for q in page] == ["4"]
+    assert after is None
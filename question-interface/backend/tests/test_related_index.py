@@ -0,0 +1,136 @@
+import time
+
+import numpy as np
+
+from answer_cache import AnswerCache
+from related_index import RelatedIndex, VectorIndex, embed
+
+
+class FakeQuestion:
+    def __init__(self, id, question, category="c", notes=None):
+        self.id = id
+        self.question = question
+        self.category = category
+        self.notes = notes
+
+
+class FakeStore:
+    def __init__(self, questions):
+        self.questions = questions
+
+    def all(self):
+        return list(self.questions)
+
+
+class NoAnswers:
+    def for_notes(self, notes):
+        return None
+
+
+def test_embedding_similarity_reflects_shared_terms():
+    a = embed("docker container volume mount")
+    b = embed("mount a docker volume")
+    c = embed("mortgage interest savings")
+    assert float(a @ b) > 0.5 > float(a @ c)
+
+
+def test_query_finds_nearest_and_supports_updates():
+    rng = np.random.default_rng(1)
+    index = VectorIndex(dim=64, tables=6, bits=8)
+    base = rng.standard_normal((500, 64)).astype(np.float32)
+    base /= np.linalg.norm(base, axis=1, keepdims=True)
+    for i, v in enumerate(base):
+        index.add(str(i), v)
+    probe = base[42] + 0.05 * rng.standard_normal(64).astype(np.float32)
+    probe /= np.linalg.norm(probe)
+    assert index.query(probe, k=1)[0][0] == "42"
+    assert all(key != "42" for key, _ in index.query(base[42], 5, exclude="42"))
+
+    index.remove("42")
+    assert "42" not in index and len(index) == 499
+    assert index.query(probe, k=1)[0][0] != "42"
+    index.add("7", base[42])  # replace in place
+    assert index.query(probe, k=1)[0][0] == "7"
+
+
+def test_related_index_syncs_incrementally_and_persists(tmp_path):
+    path = str(tmp_path / "related.npz")
+    questions = [
+        FakeQuestion("1", "How do docker volumes work?"),
+        FakeQuestion("2", "Mounting a docker volume in compose"),
+        FakeQuestion("3", "Best mortgage interest rates"),
+    ]
+    store = FakeStore(questions)
+    related = RelatedIndex(store, NoAnswers(), path, refresh_interval=0)
+    assert related.related("1", 1)[0][0] == "2"
+    assert related.related("missing") is None
+
+    questions.append(FakeQuestion("4", "docker volume backup"))
+    assert "4" in [qid for qid, _ in related.related("1", 3)]
+
+    reloaded = RelatedIndex(store, NoAnswers(), path, refresh_interval=0)
+    assert len(reloaded.index) == 4
+    assert reloaded.related("1", 3) == related.related("1", 3)
+
+
+class VersionedStore(FakeStore):
+    def __init__(self, questions):
+        super().__init__(questions)
+        self.version = "1"
+        self.scans = 0
+
+    def all(self):
+        self.scans += 1
+        return super().all()
+
+
+class CountingAnswers(AnswerCache):
+    reads = 0
+
+    def for_notes(self, notes):
+        self.reads += 1
+        return super().for_notes(notes)
+
+
+def test_unchanged_store_and_answers_skip_the_scan(tmp_path):
+    (tmp_path / "answers").mkdir()
+    answer = tmp_path / "answers" / "a.md"
+    answer.write_text("docker volume mount")
+    store = VersionedStore(
+        [
+            FakeQuestion("1", "Where does data live?", notes="answer:answers/a.md"),
+            FakeQuestion("2", "docker volume backup"),
+            FakeQuestion("3", "mortgage rates"),
+        ]
+    )
+    answers = CountingAnswers(str(tmp_path))
+    related = RelatedIndex(store, answers, None, refresh_interval=0)
+    assert related.related("1", 1)[0][0] == "2"
+    assert (store.scans, answers.reads) == (1, 3)
+
+    related.related("1", 1)
+    assert (store.scans, answers.reads) == (1, 3)
+
+    # An edited answer re-embeds only its question
+    answer.write_text("mortgage interest rates")
+    related.related("1", 1)
+    assert (store.scans, answers.reads) == (2, 4)
+    assert related.related("1", 1)[0][0] == "3"
+
+    store.questions.append(FakeQuestion("4", "fixed mortgage rates"))
+    store.version = "2"
+    related.related("1", 1)
+    assert (store.scans, answers.reads) == (3, 5)
+
+
+def test_lookups_are_fast():
+    index = VectorIndex()
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((5000, index.dim)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    for i, v in enumerate(vectors):
+        index.add(str(i), v)
+    started = time.perf_counter()
+    for i in range(100):
+        index.query(vectors[i], 10, exclude=str(i))
+    assert (time.perf_counter() - started) / 100 < 0.005
@@ -0,0 +1,92 @@
+import os
+
+import search_index
+from question_storage import CsvStorage
+from question_store import QuestionStore
+from search_index import CorpusIndex, SearchIndex, make_snippet, parse_query
+
+
+def test_parse_query_prefixes():
+    assert parse_query("docker comp") == [("docker", False), ("comp", True)]
+    assert parse_query("dock* compose ") == [("dock", True), ("compose", False)]
+
+
+def test_bm25_ranks_denser_matches_first():
+    index = SearchIndex()
+    index.upsert("a", "note", "A", "python packaging with poetry")
+    index.upsert("b", "note", "B", "python python python imports")
+    index.upsert("c", "note", "C", "rust crates")
+
+    hits, total = index.search("python ")
+    assert total == 2
+    assert [h.key for h in hits] == ["b", "a"]
+
+
+def test_prefix_matching_and_kind_filter():
+    index = SearchIndex()
+    index.upsert("q", "question", "Q", "How do workspaces work?")
+    index.upsert("n", "note", "N", "workspace folders in VSCode")
+
+    hits, _ = index.search("worksp")
+    assert {h.key for h in hits} == {"q", "n"}
+    hits, _ = index.search("worksp", kinds=["note"])
+    assert [h.key for h in hits] == ["n"]
+
+
+def test_incremental_update_and_remove():
+    index = SearchIndex()
+    index.upsert("a", "note", "A", "alpha beta")
+    index.upsert("a", "note", "A", "gamma")
+    assert index.search("alpha ")[1] == 0
+    assert index.search("gamma ")[1] == 1
+    index.remove("a")
+    assert len(index) == 0
+    assert index.expand("g") == []
+
+
+def test_prefix_keeps_the_most_common_expansions(monkeypatch):
+    monkeypatch.setattr(search_index, "MAX_PREFIX_EXPANSIONS", 2)
+    index = SearchIndex()
+    index.upsert("1", "note", "", "taa tab")
+    index.upsert("2", "note", "", "tzz tab")
+    index.upsert("3", "note", "", "tzz tab")
+    # "taa" sorts first but is the rarest
+    assert index.expand("t") == ["tab", "tzz"]
+    assert index.search("t")[1] == 3
+
+
+def test_snippet_highlights_and_escapes():
+    snippet = make_snippet("Use <b>ruff</b> and Ruff again", {"ruff"})
+    assert snippet == (
+        "Use &lt;b&gt;<mark>ruff</mark>&lt;/b&gt; and <mark>Ruff</mark> again"
+    )
+
+
+def test_corpus_index_tracks_file_changes(tmp_path):
+    (tmp_path / "answers").mkdir()
+    (tmp_path / "notes").mkdir()
+    csv_path = tmp_path / "questions.csv"
+    csv_path.write_text(
+        "id,question,category,created_at,status,notes,type\n"
+        "1,What is ELT?,learning,2025-01-01T00:00:00Z,open,answer:answers/1.md,note\n",
+        encoding="utf-8",
+    )
+    answer = tmp_path / "answers" / "1.md"
+    answer.write_text("# ELT\nExtract, load, then transform.", encoding="utf-8")
+    (tmp_path / "notes" / "lint.md").write_text("Title: Zero lint\nUse ruff.")
+
+    corpus = CorpusIndex(
+        QuestionStore(CsvStorage(str(csv_path))), str(tmp_path), refresh_interval=0
+    )
+    hits, _ = corpus.search("transform")
+    assert [(h.kind, h.question_id, h.title) for h in hits] == [("answer", "1", "ELT")]
+    assert corpus.search("ruff")[0][0].title == "Zero lint"
+
+    answer.write_text("# ELT\nExtract, load, then reshape.", encoding="utf-8")
+    st = os.stat(answer)
+    os.utime(answer, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000))
+    assert corpus.search("transform ")[1] == 0
+    assert corpus.search("reshape")[1] == 1
+
+    (tmp_path / "notes" / "lint.md").unlink()
+    assert corpus.search("ruff")[1] == 0
@@ -30,68 +30,18 @@ function App() {
   }, []);
 
   const loadData = () => {
-    // Load all questions
-    axios.get(`${baseUrl}/questions`).then(res => {
-      const questionsData = res.data;
-      setQuestions(questionsData);
-
-      // Load answers for all questions
-      questionsData.forEach(question => {
-        axios.get(`${baseUrl}/questions/${question.id}/answer`)
-          .then(answerRes => {
-            if (answerRes.data.has_answer) {
-              // Update the question with its answer
-              setQuestions(prev => prev.map(q =>
-                q.id === question.id
-                  ? { ...q, answer: answerRes.data.answer }
-                  : q
-              ));
-            }
-          })
-          .catch(err => console.error(`Failed to load answer for ${question.id}:`, err));
-      });
+    // Load questions, notes and tasks with their answers inlined
+    // (one request per list instead of one per item)
+    axios.get(`${baseUrl}/questions?include=answers`).then(res => {
+      setQuestions(res.data);
     });
 
-    // Load notes
-    axios.get(`${baseUrl}/notes`).then(res => {
-      const notesData = res.data;
-      setNotes(notesData);
-
-      // Load answers for notes
-      notesData.forEach(note => {
-        axios.get(`${baseUrl}/questions/${note.id}/answer`)
-          .then(answerRes => {
-            if (answerRes.data.has_answer) {
-              setNotes(prev => prev.map(n =>
-                n.id === note.id
-                  ? { ...n, answer: answerRes.data.answer }
-                  : n
-              ));
-            }
-          })
-          .catch(err => console.error(`Failed to load answer for ${note.id}:`, err));
-      });
+    axios.get(`${baseUrl}/notes?include=answers`).then(res => {
+      setNotes(res.data);
     });
 
-    // Load tasks
-    axios.get(`${baseUrl}/tasks`).then(res => {
-      const tasksData = res.data;
-      setTasks(tasksData);
-
-      // Load answers for tasks
-      tasksData.forEach(task => {
-        axios.get(`${baseUrl}/questions/${task.id}/answer`)
-          .then(answerRes => {
-            if (answerRes.data.has_answer) {
-              setTasks(prev => prev.map(t =>
-                t.id === task.id
-                  ? { ...t, answer: answerRes.data.answer }
-                  : t
-              ));
-            }
-          })
-          .catch(err => console.error(`Failed to load answer for ${task.id}:`, err));
-      });
+    axios.get(`${baseUrl}/tasks?include=answers`).then(res => {
+      setTasks(res.data);
     });
 
     // Load repositories
@@ -51,7 +51,7 @@ describe('App', () => {
 
     // Mock the API calls
     mockedAxios.get.mockImplementation((url) => {
-      if (url === 'http://localhost:8000/questions') {
+      if (url === 'http://localhost:8000/questions?include=answers') {
         return Promise.resolve({ data: mockQuestions });
       } else if (url === 'http://localhost:8000/categories') {
         return Promise.resolve({ data: mockCategories });
@@ -84,7 +84,7 @@ describe('App', () => {
       expect(mockedAxios.get).toHaveBeenCalledWith('http://localhost:8000/categories');
     });
 
-    expect(mockedAxios.get).toHaveBeenCalledWith('http://localhost:8000/questions');
+    expect(mockedAxios.get).toHaveBeenCalledWith('http://localhost:8000/questions?include=answers');
   });
 
   test('makes correct API calls on mount', async () => {
@@ -94,7 +94,7 @@ describe('App', () => {
       expect(mockedAxios.get).toHaveBeenCalledTimes(2);
     });
 
-    expect(mockedAxios.get).toHaveBeenCalledWith('http://localhost:8000/questions');
+    expect(mockedAxios.get).toHaveBeenCalledWith('http://localhost:8000/questions?include=answers');
     expect(mockedAxios.get).toHaveBeenCalledWith('http://localhost:8000/categories');
   });
 });
\ No newline at end of file
@@ -0,0 +1,338 @@
+#!/usr/bin/env python3
+"""
+Tests for llm_client against stub Ollama servers on localhost.
+"""
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+import llm_client
+from llm_client import AsyncLocalLLMClient, LocalLLMClient
+
+
+def start_server(name, delay=0.0, status=200, echo=False, models=None,
+                 probe_delay=0.0):
+    """A stub Ollama server answering generate requests with its name
+
+    With echo it answers with the prompt instead; delay may be a function of
+    the prompt. The server counts requests, the peak number in flight and the
+    client ports they came from. Connections are kept alive. With a list of
+    models it also serves discovery and metadata, logged in server.lookups,
+    and answers 404 for any other model. Discovery (which availability probes
+    use) takes probe_delay and answers with server.probe_status.
+    """
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            server.lookups.append(self.path)
+            time.sleep(probe_delay)
+            models = [{"name": m} for m in server.models or []]
+            self.reply(server.probe_status, {"models": models})
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            payload = json.loads(self.rfile.read(length))
+            known = server.models is None or payload.get("model") in server.models
+            if self.path == "/api/show":
+                server.lookups.append(f"{self.path} {payload['model']}")
+                if not known:
+                    return self.reply(404, {"error": "model not found"})
+                info = {"model_info": {"llama.context_length": 4096}, "details": {}}
+                return self.reply(200, info)
+            if not known:
+                return self.reply(404, {"error": "model not found"})
+            prompt = payload.get("prompt", "")
+            with server.lock:
+                server.prompts.append(prompt)
+                server.ports.add(self.client_address[1])
+                server.in_flight += 1
+                server.peak = max(server.peak, server.in_flight)
+            try:
+                time.sleep(delay(prompt) if callable(delay) else delay)
+            finally:
+                with server.lock:
+                    server.in_flight -= 1
+            self.reply(status, {"response": prompt if echo else name})
+
+        def reply(self, status, data):
+            body = json.dumps(data).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    # Cancelled and timed-out clients hang up before the reply is written
+    server.handle_error = lambda request, address: None
+    server.lock = threading.Lock()
+    server.prompts = []
+    server.models = models
+    server.lookups = []
+    server.probe_status = 200
+    server.ports = set()
+    server.in_flight = server.peak = 0
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+@pytest.fixture
+def servers():
+    started = []
+
+    def start(name, **kwargs):
+        server, url = start_server(name, **kwargs)
+        started.append(server)
+        return url, server
+
+    yield start
+    for server in started:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.fixture(autouse=True)
+def fresh_state(monkeypatch):
+    monkeypatch.setattr(llm_client, "health", llm_client.HealthRegistry())
+    monkeypatch.setattr(llm_client, "hedge_stats", llm_client.HedgeStats())
+    monkeypatch.setattr(llm_client, "_catalogs", {})
+    monkeypatch.setattr(llm_client, "_clients", {})
+    yield
+    llm_client.close_clients()
+
+
+def query_both(primary_url, backup_url):
+    """(sync reply, sync seconds, async reply, async seconds)"""
+    primary = LocalLLMClient("ollama", primary_url)
+    backup = LocalLLMClient("ollama", backup_url)
+    started = time.perf_counter()
+    reply = primary.query("p", model="m", hedge=backup)
+    elapsed = time.perf_counter() - started
+
+    async def run():
+        async with AsyncLocalLLMClient("ollama", primary_url) as a, \
+                AsyncLocalLLMClient("ollama", backup_url) as b:
+            started = time.perf_counter()
+            reply = await a.query("p", model="m", hedge=b)
+            return reply, time.perf_counter() - started
+
+    return (reply, elapsed, *asyncio.run(run()))
+
+
+def test_failing_primary_is_hedged_at_once(servers):
+    primary, _ = servers("primary", status=500)
+    backup, _ = servers("backup", delay=0.05)
+    reply, elapsed, async_reply, async_elapsed = query_both(primary, backup)
+    assert reply == async_reply == "backup"
+    # Well before the (no history) hedge delay
+    assert elapsed < 1 and async_elapsed < 1
+    stats = llm_client.hedge_stats.snapshot()
+    assert stats["failover"] == stats["hedge_won"] == 2
+
+
+def test_down_primary_goes_straight_to_the_hedge(servers):
+    backup, _ = servers("backup")
+    down = "http://127.0.0.1:9"
+    llm_client.health.record(down, False, "refused")
+    reply, _, async_reply, _ = query_both(down, backup)
+    assert reply == async_reply == "backup"
+    assert llm_client.hedge_stats.snapshot()["failover"] == 2
+
+
+def test_slow_primary_without_history_uses_default_delay(servers, monkeypatch):
+    monkeypatch.setattr(llm_client, "HEDGE_DELAY", 0.1)
+    primary, _ = servers("primary", delay=1.5)
+    backup, _ = servers("backup")
+    reply, elapsed, async_reply, async_elapsed = query_both(primary, backup)
+    assert reply == async_reply == "backup"
+    assert elapsed < 1 and async_elapsed < 1
+    stats = llm_client.hedge_stats.snapshot()
+    assert stats["no_history"] == stats["hedged"] == 2
+    assert stats["failover"] == 0
+    assert stats["recent"][0]["delay_ms"] == 100.0
+
+
+def run_many(url, prompts, **kwargs):
+    """[(index, reply)] from query_many, and the seconds it took"""
+
+    async def run():
+        async with AsyncLocalLLMClient("ollama", url) as client:
+            started = time.perf_counter()
+            results = [r async for r in client.query_many(prompts, "m", **kwargs)]
+            return results, time.perf_counter() - started
+
+    return asyncio.run(run())
+
+
+def test_query_many_orders_results_or_yields_as_completed(servers):
+    url, _ = servers("llm", echo=True, delay=float)
+    prompts = ["0.3", "0.0", "0.15"]
+    ordered, _ = run_many(url, prompts)
+    assert ordered == [(0, "0.3"), (1, "0.0"), (2, "0.15")]
+    completed, elapsed = run_many(url, prompts, ordered=False)
+    assert completed == [(1, "0.0"), (2, "0.15"), (0, "0.3")]
+    assert elapsed < 0.6
+
+
+def test_query_many_bounds_concurrency(servers):
+    url, server = servers("llm", echo=True, delay=0.05)
+    results, _ = run_many(url, (str(i) for i in range(10)), concurrency=3)
+    assert [reply for _, reply in results] == [str(i) for i in range(10)]
+    assert server.peak == 3
+
+
+def test_query_many_times_out_each_call(servers):
+    url, _ = servers("llm", echo=True, delay=float)
+    results, elapsed = run_many(url, ["1.0", "0.0"], timeout=0.2)
+    assert results == [(0, None), (1, "0.0")]
+    assert elapsed < 0.8
+
+
+def test_breaking_out_of_query_many_cancels_the_rest(servers):
+    url, server = servers("llm", echo=True, delay=float)
+    pulled = []
+
+    def prompts():
+        for prompt in ["0.0", "0.5", "0.5", "0.5"]:
+            pulled.append(prompt)
+            yield prompt
+
+    async def run():
+        async with AsyncLocalLLMClient("ollama", url) as client:
+            results = client.query_many(prompts(), "m", concurrency=2)
+            async for first in results:
+                break
+            await results.aclose()
+            await asyncio.sleep(0.01)
+            others = asyncio.all_tasks() - {asyncio.current_task()}
+            return first, others
+
+    first, others = asyncio.run(run())
+    assert first == (0, "0.0")
+    # Prompts are pulled lazily, and nothing is left running
+    assert len(pulled) == 2 and not others
+    time.sleep(0.1)
+    assert len(server.prompts) == 2
+
+
+def test_sync_client_reuses_and_closes_its_session(servers, monkeypatch):
+    url, server = servers("llm")
+    closed = []
+    close = requests.Session.close
+
+    def spy(session):
+        closed.append(session)
+        close(session)
+
+    monkeypatch.setattr(requests.Session, "close", spy)
+
+    client = LocalLLMClient("ollama", url)
+    session = client.session
+    assert [client.query(str(i), model="m") for i in range(3)] == ["llm"] * 3
+    assert client.session is session
+    # One keep-alive connection served every call
+    assert len(server.prompts) == 3 and len(server.ports) == 1
+    client.close()
+    assert closed == [session]
+
+    with LocalLLMClient("ollama", url) as client:
+        client.query("p", model="m")
+    assert closed == [session, client.session]
+
+
+def fake_clock(catalog, monkeypatch):
+    now = [0.0]
+    monkeypatch.setattr(catalog, "clock", lambda: now[0])
+    return now
+
+
+def test_model_catalog_expires_after_its_ttl(servers, monkeypatch):
+    url, server = servers("llm", models=["m"])
+    client = LocalLLMClient("ollama", url)
+    now = fake_clock(client.catalog, monkeypatch)
+    assert client.list_models() == client.list_models() == ["m"]
+    assert client.model_info("m")["context_length"] == 4096
+    client.model_info("m")
+    assert server.lookups == ["/api/tags", "/api/show m"]
+
+    now[0] += client.catalog.ttl + 1
+    client.list_models()
+    client.model_info("m")
+    assert server.lookups == ["/api/tags", "/api/show m"] * 2
+
+
+def test_model_catalog_is_shared_per_base_url(servers):
+    url_a, server_a = servers("a", models=["a"])
+    url_b, server_b = servers("b", models=["b"])
+    assert LocalLLMClient("ollama", url_a).list_models() == ["a"]
+    assert LocalLLMClient("ollama", url_b).list_models() == ["b"]
+
+    async def discover():
+        async with AsyncLocalLLMClient("ollama", url_a + "/") as client:
+            return await client.list_models()
+
+    # Other clients for the same server, sync or async, reuse its discovery
+    assert LocalLLMClient("ollama", url_a).list_models() == ["a"]
+    assert asyncio.run(discover()) == ["a"]
+    assert server_a.lookups == server_b.lookups == ["/api/tags"]
+
+
+def test_unknown_model_invalidates_the_catalog(servers):
+    url, server = servers("llm", models=["old"])
+    client = LocalLLMClient("ollama", url)
+    assert client.default_model() == "old"
+    server.models = ["new"]
+    # The cached default model has gone: the 404 drops the stale list
+    assert client.query("p") is None
+    assert client.catalog.get_models() is None
+    assert client.query("p") == "llm"
+    assert server.lookups == ["/api/tags", "/api/tags"]
+
+    async def query(model):
+        async with AsyncLocalLLMClient("ollama", url) as async_client:
+            return await async_client.query("p", model=model)
+
+    assert client.list_models() == ["new"]
+    assert asyncio.run(query("old")) is None
+    assert client.catalog.get_models() is None
+
+
+def test_services_are_probed_in_parallel(servers, monkeypatch):
+    ollama, _ = servers("ollama", probe_delay=0.3)
+    lmstudio, _ = servers("lmstudio", probe_delay=0.3)
+    urls = {"ollama": ollama, "lmstudio": lmstudio}
+    monkeypatch.setattr(llm_client, "DEFAULT_URLS", urls)
+    started = time.perf_counter()
+    assert llm_client.get_available_services() == {"ollama": True, "lmstudio": True}
+    assert time.perf_counter() - started < 0.5
+
+
+def test_down_server_is_skipped_until_it_recovers(servers):
+    url, server = servers("llm")
+    server.probe_status = 503
+    client = llm_client.get_client("ollama", url)
+    assert not client.is_available()
+    assert client.query("p", model="m") is None
+    assert server.prompts == []
+
+    server.probe_status = 200
+    stop = llm_client.watch_services(interval=0.05)
+    try:
+        deadline = time.monotonic() + 2
+        while not llm_client.health.get(url) and time.monotonic() < deadline:
+            time.sleep(0.01)
+    finally:
+        stop.set()
+    assert client.query("p", model="m") == "llm"
+    assert server.prompts == ["p"]